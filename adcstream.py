@@ -0,0 +1,206 @@
+"""
+adcstream.py
+Continuous sampling of analog pins. The AVR converts a list of ADC channels in turn at a fixed rate, triggered by
+Timer1, and sends the samples in blocks on ADC_PIPE, so the sample rate isn't limited by the round trip of analogRead().
+The samples are collected in a preallocated NumPy ring buffer as they arrive.
+
+While it runs, streaming takes over Timer1 (PWM on pins 9 and 10 of the Leonardo) and the ADC. Timer1 is left stopped.
+Needs firmware version 4 or later, and the numpy package.
+
+    with ard.analogStream([ard.A0, ard.A1], 1000) as stream:
+        samples = stream.read(500)      # 500 x 2 array of uint16, one row per scan of the pins
+
+Samuel Brian
+"""
+
+from threading import Condition
+from avr import AVR
+
+# Timer1 clock select (CS1 field) and prescaler, smallest first
+TIMER1_PRESCALERS = ((1, 1), (2, 8), (3, 64), (4, 256), (5, 1024))
+# ADC clock select (ADPS field) and division factor, most accurate first
+ADC_PRESCALERS = ((7, 128), (6, 64), (5, 32), (4, 16))
+ADC_CYCLES = 13.5           # ADC clock cycles of an auto triggered conversion
+TRIGGER_TIMER1_COMPB = 5    # ADTS field value that triggers conversions on Timer1 compare match B
+
+MAX_CHANNELS = 16           # ADC_MAX_CHANNELS in the firmware
+BLOCK_MAX = 64              # ADC_BLOCK_MAX in the firmware, samples per block
+BLOCK_PERIOD = 0.05         # seconds of samples in a block, if fewer than BLOCK_MAX, so slow streams arrive promptly
+
+
+class ADCStream:
+
+    ## Construct an ADCStream. Start it with start(), or use it in a with block.
+    # @param arduino A connected Arduino (or Leonardo).
+    # @param pins Analog pins (e.g. A0) or ADC channels, in the order they are scanned.
+    # @param sample_rate [float] Scans of all the pins per second. The nearest rate the timer can do is used, and is in
+    #                    sample_rate once started.
+    # @param buffer_seconds [float] How many seconds of samples are kept for read(). Older samples are dropped.
+    def __init__(self, arduino, pins, sample_rate, buffer_seconds=1.0):
+        try:
+            import numpy
+        except ImportError:
+            raise Exception("ADCStream needs the numpy package.")
+        if not 0 < len(pins) <= MAX_CHANNELS:
+            raise Exception("An ADCStream scans between 1 and {0} pins.".format(MAX_CHANNELS))
+
+        self.arduino = arduino
+        self.avr = arduino.avr
+        self.channels = [self._channel(pin) for pin in pins]
+        self.sample_rate = sample_rate
+        self.running = False
+
+        # Counters, reset by start()
+        self.blocks = 0         # blocks received
+        self.scans = 0          # scans received
+        self.overruns = 0       # samples the AVR dropped because the link couldn't keep up
+        self.lost_blocks = 0    # blocks missing from the sequence, e.g. corrupted on the link
+        self.dropped = 0        # scans dropped from the buffer because they weren't read in time
+
+        self._numpy = numpy
+        self._requested_rate = sample_rate
+        self._buffer = numpy.empty((max(int(sample_rate * buffer_seconds), 2 * BLOCK_MAX), len(self.channels)),
+                                   dtype=numpy.uint16)
+        self._start = 0         # index of the oldest scan in the buffer
+        self._count = 0         # number of scans in the buffer
+        self._sequence = None   # sequence number of the last block
+        self._condition = Condition()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    ## Set up Timer1 and the ADC and start sampling.
+    def start(self):
+        avr = self.avr
+        if avr.firmware_version is None or avr.firmware_version < 4:
+            raise Exception("ADC streaming needs firmware version 4 or later.")
+        if not avr.defined("F_CPU"): raise Exception("F_CPU must be defined for ADC streaming.")
+
+        num_channels = len(self.channels)
+        cs, prescaler, top = _timer1_setting(avr.F_CPU, self._requested_rate * num_channels)
+        adps = _adc_setting(avr.F_CPU, self._requested_rate * num_channels)
+        self.sample_rate = avr.F_CPU / float(prescaler * (top + 1)) / num_channels
+        # Blocks hold whole scans
+        block_scans = max(1, min(BLOCK_MAX // num_channels, int(self.sample_rate * BLOCK_PERIOD)))
+
+        with self._condition:
+            self.blocks = self.scans = self.overruns = self.lost_blocks = self.dropped = 0
+            self._start = self._count = 0
+            self._sequence = None
+            self.running = True
+        avr._piper.set_read_callback(AVR.ADC_PIPE, self._receive)
+        avr._piper.write_packet(AVR.ADC_PIPE, bytes([AVR.ADC_START, block_scans * num_channels] + self.channels))
+
+        with avr.batch() as batch:
+            batch.update_fields("TCCR1B", CS1=0)    # stopped while it is set up
+            batch.write("TCCR1A", 0)
+            batch.write("TCNT1", 0)
+            batch.write("OCR1A", top)               # CTC mode, so the timer counts to OCR1A
+            batch.write("OCR1B", top)               # and compare match B triggers a conversion
+            batch.update_fields("ADMUX", REFS=self.arduino.analog_reference, ADLAR=0)
+            batch.update_fields("ADCSRB", ADTS=TRIGGER_TIMER1_COMPB)
+            batch.update_fields("ADCSRA", ADEN=1, ADATE=1, ADIE=1, ADIF=1, ADPS=adps)   # writing ADIF clears it
+            batch.update_fields("TCCR1B", WGM1=4, CS1=cs)
+
+    ## Stop sampling. Samples already received can still be read.
+    def stop(self):
+        if not self.running: return
+        self.avr._piper.write_packet(AVR.ADC_PIPE, bytes([AVR.ADC_STOP]))
+        with self.avr.batch() as batch:
+            batch.update_fields("ADCSRA", ADATE=0, ADIE=0)
+            batch.update_fields("TCCR1B", CS1=0)
+            # Blocks are sent before the reply to this, so none arrive once it has been received
+            batch.read("ADCSRA")
+        with self._condition:
+            self.running = False
+            self._condition.notify_all()
+
+    ## Get samples from the buffer.
+    # @param scans [int] Number of scans to wait for, or None for the scans already received.
+    # @param timeout [float] Maximum number of seconds to wait, or None to wait until they arrive or the stream stops.
+    # @return [numpy.ndarray] uint16 samples with a row per scan and a column per pin. It has fewer rows than asked for
+    #         if the timeout expired or the stream stopped.
+    def read(self, scans=None, timeout=None):
+        if scans is None:
+            with self._condition: scans = self._count
+        out = self._numpy.empty((scans, len(self.channels)), dtype=self._buffer.dtype)
+        return out[:self.read_into(out, timeout)]
+
+    ## Copy samples from the buffer into an array, to avoid allocating one for each read.
+    # @param out [numpy.ndarray] Array with a column per pin. Waits for as many scans as it has rows, up to the size of
+    #            the buffer.
+    # @param timeout See read().
+    # @return [int] Number of scans copied into the start of out.
+    def read_into(self, out, timeout=None):
+        scans = min(len(out), len(self._buffer))
+        with self._condition:
+            self._condition.wait_for(lambda: self._count >= scans or not self.running, timeout)
+            scans = min(scans, self._count)
+            first = min(scans, len(self._buffer) - self._start)
+            out[:first] = self._buffer[self._start:self._start + first]
+            out[first:scans] = self._buffer[:scans - first]
+            self._start = (self._start + scans) % len(self._buffer)
+            self._count -= scans
+        return scans
+
+    ## Get the number of scans waiting to be read.
+    def available(self):
+        with self._condition:
+            return self._count
+
+    """ Private functions """
+
+    def _channel(self, pin):
+        channel = self.arduino._analog_channels.get(pin)
+        return channel if channel is not None else self.arduino._analogChannel(pin)
+
+    # Piper read callback for ADC_PIPE. Runs on the read thread, so it only copies the block into the buffer.
+    def _receive(self, data):
+        num_channels = len(self.channels)
+        if len(data) < 2 or (len(data) - 2) % (2 * num_channels) != 0: return
+        block = self._numpy.frombuffer(data, dtype="<u2", offset=2).reshape(-1, num_channels)
+        with self._condition:
+            if not self.running: return
+            if self._sequence is not None: self.lost_blocks += (data[0] - self._sequence - 1) & 0xFF
+            self._sequence = data[0]
+            self.overruns += data[1]
+            self.blocks += 1
+            self.scans += len(block)
+            self._store(block)
+            self._condition.notify_all()
+
+    # Copy scans into the ring buffer, dropping the oldest if it is full
+    def _store(self, block):
+        size = len(self._buffer)
+        if len(block) > size:
+            self.dropped += len(block) - size
+            block = block[-size:]
+        overflow = self._count + len(block) - size
+        if overflow > 0:
+            self.dropped += overflow
+            self._start = (self._start + overflow) % size
+            self._count -= overflow
+        end = (self._start + self._count) % size
+        first = min(len(block), size - end)
+        self._buffer[end:end + first] = block[:first]
+        self._buffer[:len(block) - first] = block[first:]
+        self._count += len(block)
+
+
+# Timer1 clock select, prescaler and TOP for a conversion rate
+def _timer1_setting(f_cpu, rate):
+    for cs, prescaler in TIMER1_PRESCALERS:
+        top = int(round(f_cpu / float(prescaler * rate))) - 1
+        if top <= 0xFFFF: return cs, prescaler, max(top, 1)
+    raise Exception("Sample rate is too low for Timer1.")
+
+
+# ADC clock select for a conversion rate: the slowest (most accurate) clock that converts in time
+def _adc_setting(f_cpu, rate):
+    for adps, division in ADC_PRESCALERS:
+        if ADC_CYCLES * division / f_cpu <= 0.9 / rate: return adps
+    raise Exception("Sample rate is too high for the ADC.")
@@ -0,0 +1,374 @@
+"""
+aioavr.py
+asyncio front end for the AVR and Arduino layers. Register reads and writes are awaitable, any number of them can be in
+flight at once, and interrupts are delivered to async callbacks or an async iterator.
+
+Needs the pyserial-asyncio package.
+
+Samuel Brian
+"""
+
+import asyncio
+from avr import AVR, Batch, _uint8, _uint8R, _uint16R, _pack_write, _pack_bits, _pack_wait, _batch_packet
+from aiopiper import AsyncPiper
+from arduino import HIGH, LOW, INPUT, INPUT_PULLUP
+
+
+class AsyncAVR:
+
+    ## Construct an AsyncAVR.
+    # @param avr An AVR (or Leonardo) whose register and vector definitions are used. It doesn't need to be connected.
+    def __init__(self, avr):
+        self.avr = avr
+        self._piper = None
+        self._vect = {}             # vector index -> callback
+        self._subscribers = []      # queues for interruptEvents() iterators
+        self._int_enabled = True
+        self._firmware_version = None
+
+    ## Connect to the firmware on a serial port.
+    # @param framing [int] The Piper framing version to agree with firmware version 9 or later, as AVR.connect().
+    async def connect(self, port=0, baudrate=38400, framing=2):
+        try:
+            import serial_asyncio
+        except ImportError:
+            raise Exception("AsyncAVR needs the pyserial-asyncio package.")
+
+        port = self.avr._port_name(port)
+        try:
+            transport, self._piper = await serial_asyncio.create_serial_connection(
+                asyncio.get_running_loop(), AsyncPiper, port, baudrate=baudrate)
+            self._piper.transport = transport   # connection_made() is only called on the next loop iteration
+            self._piper.set_read_callback(AVR.INTERRUPT_PIPE, self._handleInterrupt)
+            await self._start_link(framing)
+        except Exception as e:
+            raise Exception("Could not connect to AVR on serial port {0}.".format(port))
+
+    def disconnect(self):
+        self._firmware_version = None
+        if self._piper.framing != 1:
+            # Leave the firmware in version 1 framing for whatever connects next
+            self._piper.write_packet(AVR.REGISTER_PIPE, _uint8(0) + _uint8(AVR.SET_FRAMING) + _uint8(1))
+        self._piper.close()
+        self._piper = None
+        for queue in self._subscribers: queue.put_nowait(None)
+
+    async def read(self, register_name):
+        return await self._read(self._register(register_name))
+
+    # Read a register that has already been looked up with AVR._register()
+    async def _read(self, register):
+        address, read_token, write_token = register
+        value = await self._request(_uint8(address) + _uint8(read_token))
+        if len(value) == 2:   return _uint16R(value)
+        elif len(value) == 1: return _uint8R(value)
+        return -1
+
+    async def write(self, register_name, value):
+        address, read_token, write_token = self._register(register_name)
+        self._write(_pack_write(address, value, write_token))
+
+    ## Read several registers with as few packets as possible.
+    # @return [list] The values in the same order as the names.
+    async def read_many(self, *register_names):
+        batch = self.batch()
+        results = [batch.read(name) for name in register_names]
+        await batch.send()
+        return [result.value for result in results]
+
+    ## Start a batch of register operations. Use with async with, or await its send().
+    def batch(self):
+        return AsyncBatch(self)
+
+    async def set_bits(self, sfr, mask):
+        self._modify_bits(sfr, AVR.SET_BITS, mask, mask)
+
+    async def clear_bits(self, sfr, mask):
+        self._modify_bits(sfr, AVR.CLEAR_BITS, mask, 0)
+
+    async def toggle_bits(self, sfr, mask):
+        self._modify_bits(sfr, AVR.TOGGLE_BITS, mask, 0)
+
+    async def update(self, sfr, mask, value):
+        self._modify_bits(sfr, AVR.UPDATE_BITS, mask, value)
+
+    ## Write several fields of a register with one masked write, see AVR.update_fields().
+    async def update_fields(self, sfr, **fields):
+        register, mask, value = self._pack_fields(sfr, fields)
+        self._write_bits(register, AVR.UPDATE_BITS, mask, value)
+
+    ## Wait until the bits of the register in mask equal those of value, see AVR.wait_bits(). Needs firmware version 5
+    # or later.
+    # @return [bool] True if the bits matched, False if the timeout expired first.
+    async def wait_bits(self, sfr, mask, value, timeout=1.0):
+        return await self._wait_bits(self._register(sfr), mask, value, timeout)
+
+    # wait_bits() on a register that has already been looked up with AVR._register()
+    async def _wait_bits(self, register, mask, value, timeout=1.0):
+        address, read_token, write_token = register
+        if self._piper is None: raise Exception("Not connected to an AVR.")
+        if self._firmware_version < 5:
+            # Older firmware can't wait, so poll the register
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + timeout
+            value &= mask
+            while await self._read(register) & mask != value:
+                if loop.time() >= deadline: return False
+            return True
+        return _uint8R(await self._request(_pack_wait(address, read_token, mask, value, timeout))) == 1
+
+    # The firmware's protocol version, read by connect(), or None if not connected. Batch.wait_bits() checks it.
+    @property
+    def firmware_version(self):
+        return self._firmware_version
+
+    async def sbi(self, sfr, bit):
+        await self.set_bits(sfr, 1 << bit)
+
+    async def cbi(self, sfr, bit):
+        await self.clear_bits(sfr, 1 << bit)
+
+    async def bit_is_set(self, sfr, bit):
+        return bool(await self.read(sfr) & (1 << bit))
+
+    async def bit_is_clear(self, sfr, bit):
+        return not await self.bit_is_set(sfr, bit)
+
+    ## Set the callback for an interrupt vector and enable it, or disable it if callback is None.
+    # @param callback A function or coroutine function taking no arguments. Functions are called in the event loop,
+    #                 coroutines are started as tasks.
+    def setInterruptCallback(self, vector, callback):
+        index = self._vector_index(vector)
+        self._vect[index] = callback
+        if callback is not None: self.enableInterrupt(index)
+        else: self.disableInterrupt(index)
+
+    ## Iterate over the names of interrupt vectors as they are triggered.
+    #   async for vector in avr.interruptEvents("INT0_vect", "TIMER1_OVF_vect"): ...
+    # @param vectors The vectors to enable. Other enabled vectors are also reported.
+    # @param max_queue_len Events that arrive while this many are waiting to be iterated are dropped.
+    async def interruptEvents(self, *vectors, max_queue_len=100):
+        queue = asyncio.Queue(max_queue_len)
+        self._subscribers.append(queue)
+        for vector in vectors: self.enableInterrupt(vector)
+        names = dict((index, name) for name, index in self.avr._vector_indices.items())
+        try:
+            while True:
+                index = await queue.get()
+                if index is None: return
+                yield names.get(index, index)
+        finally:
+            self._subscribers.remove(queue)
+
+    ## Enable the interrupt packet being sent from the microcontroller.
+    def enableInterrupt(self, vector):
+        self._write_interrupt(self._vector_index(vector), AVR.INT_ENABLE)
+
+    ## Disable the interrupt packet being sent from the microcontroller.
+    def disableInterrupt(self, vector):
+        self._write_interrupt(self._vector_index(vector), AVR.INT_DISABLE)
+
+    # Enable handling of incoming interrupt packets.
+    def sei(self):
+        self._int_enabled = True
+
+    # Ignore incoming interrupt packets.
+    def cli(self):
+        self._int_enabled = False
+
+    """ Private functions """
+
+    # Find the framing the firmware is using, which it keeps from the last connection, and agree the one asked for.
+    # Mirrors AVR._read_firmware_version() and AVR._set_framing().
+    async def _start_link(self, framing):
+        for current in (1, 2):
+            self._piper.set_framing(current)
+            version = await self._link_request(AVR.GET_VERSION, attempts=3 if current == 1 else 1)
+            if version is not None: break
+        else:
+            # Firmware from before GET_VERSION doesn't reply and is version 1
+            self._piper.set_framing(1)
+            self._firmware_version = 1
+            return
+        self._firmware_version = version
+        if version >= 9 and framing != current:
+            self._piper.parser.upgrade = (AVR.REGISTER_PIPE, _uint8(1), framing)
+            if await self._link_request(AVR.SET_FRAMING, _uint8(framing), timeout=1.0) == 1:
+                self._piper.framing = framing
+            else:
+                self._piper.parser.upgrade = None
+
+    # Send a REGISTER_PIPE request that isn't a register operation
+    # @return [int] The first byte of the reply, or None if there was no reply.
+    async def _link_request(self, token, payload=b"", attempts=1, timeout=0.5):
+        for attempt in range(attempts):
+            self._piper.write_packet(AVR.REGISTER_PIPE, _uint8(0) + _uint8(token) + payload)
+            reply = await self._piper.read_packet(AVR.REGISTER_PIPE, timeout)
+            if reply: return reply[0]
+        return None
+
+    def _register(self, register_name):
+        register = self.avr._register(register_name)
+        if register is None: raise AttributeError("'{0}' is not a register.".format(register_name))
+        return register
+
+    # Batch.update_fields() calls this on the batch's AVR
+    def _pack_fields(self, sfr, fields):
+        return self.avr._pack_fields(sfr, fields)
+
+    def _vector_index(self, vector):
+        return self.avr._vector_indices[vector] if isinstance(vector, str) else vector
+
+    def _modify_bits(self, sfr, op, mask, value):
+        self._write_bits(self._register(sfr), op, mask, value)
+
+    def _write_bits(self, register, op, mask, value):
+        address, read_token, write_token = register
+        self._write(_pack_bits(address, op | read_token, mask, value))
+
+    def _write(self, packet):
+        if self._piper is None: raise Exception("Not connected to an AVR.")
+        self._piper.write_packet(AVR.REGISTER_PIPE, packet)
+
+    def _request(self, packet):
+        if self._piper is None: raise Exception("Not connected to an AVR.")
+        return self._piper.request(AVR.REGISTER_PIPE, packet)
+
+    def _write_interrupt(self, index, enable):
+        if self._piper is None: raise Exception("Not connected to an AVR.")
+        self._piper.write_packet(AVR.INTERRUPT_PIPE, _uint8(index) + _uint8(enable))
+
+    def _handleInterrupt(self, index):
+        if not self._int_enabled: return
+        index = _uint8R(index)
+        for queue in self._subscribers:
+            if not queue.full(): queue.put_nowait(index)
+
+        callback = self._vect.get(index)
+        if callback is None: return
+        if asyncio.iscoroutinefunction(callback):
+            asyncio.ensure_future(callback())
+        else:
+            callback()
+
+
+class AsyncBatch(Batch):
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            await self.send()
+
+    ## Send all queued operations. Every packet is written before waiting for any of the replies.
+    # @return [list] The read values, in the order the reads were queued.
+    async def send(self):
+        ops, self._ops = self._ops, []
+        replies = []
+        for frame, count, frame_results in Batch._frames(ops):
+            if len(frame_results) > 0:
+                replies.append((self.avr._request(_batch_packet(frame, count)), frame_results))
+            else:
+                self.avr._write(_batch_packet(frame, count))
+        for reply, frame_results in replies:
+            Batch._unpack_reply(await reply, frame_results)
+        self.results = [result.value for packet, length, result, access in ops if length > 0]
+        return self.results
+
+
+class AsyncArduino:
+
+    ## Construct async versions of the Arduino I/O functions.
+    # @param arduino An Arduino (or Leonardo) providing the board's pin mappings. It doesn't need to be connected.
+    def __init__(self, arduino):
+        self.arduino = arduino
+        self.avr = AsyncAVR(arduino.avr)
+
+    async def connect(self, port=0, baudrate=38400, framing=2):
+        await self.avr.connect(port, baudrate, framing)
+
+    def disconnect(self):
+        self.avr.disconnect()
+
+    # Implementation from wiring_digital.c
+    async def pinMode(self, pin, mode):
+        pin = self.arduino.pins[pin]
+
+        if pin is None: return
+
+        if mode == INPUT:
+            self.avr._write_bits(pin.mode, AVR.CLEAR_BITS, pin.mask, 0)
+            self.avr._write_bits(pin.output, AVR.CLEAR_BITS, pin.mask, 0)
+        elif mode == INPUT_PULLUP:
+            self.avr._write_bits(pin.mode, AVR.CLEAR_BITS, pin.mask, 0)
+            self.avr._write_bits(pin.output, AVR.SET_BITS, pin.mask, 0)
+        else:
+            self.avr._write_bits(pin.mode, AVR.SET_BITS, pin.mask, 0)
+
+    # Implementation from wiring_digital.c
+    async def digitalWrite(self, pin, val):
+        pin = self.arduino.pins[pin]
+
+        if pin is None: return
+
+        if pin.pwm_off is not None: self.avr._write_bits(pin.pwm_off[0], AVR.CLEAR_BITS, pin.pwm_off[1], 0)
+
+        if val == LOW:
+            self.avr._write_bits(pin.output, AVR.CLEAR_BITS, pin.mask, 0)
+        else:
+            self.avr._write_bits(pin.output, AVR.SET_BITS, pin.mask, 0)
+
+    # Implementation from wiring_digital.c
+    async def digitalRead(self, pin):
+        pin = self.arduino.pins[pin]
+
+        if pin is None: return LOW
+
+        if pin.pwm_off is not None: self.avr._write_bits(pin.pwm_off[0], AVR.CLEAR_BITS, pin.pwm_off[1], 0)
+
+        if await self.avr._read(pin.input) & pin.mask: return HIGH
+        return LOW
+
+    # Implementation from wiring_digital.c
+    async def turnOffPWM(self, timer):
+        if timer not in self.arduino._timer_outputs:
+            self.arduino._timer_outputs[timer] = self.arduino._resolveTimerOutput(timer)
+        output = self.arduino._timer_outputs[timer]
+        if output is not None: self.avr._write_bits(output[0], AVR.CLEAR_BITS, output[1], 0)
+
+    # Implementation from wiring_analog.c
+    async def analogRead(self, pin):
+        arduino = self.arduino
+        channel = arduino._analog_channels.get(pin)
+        pin = channel if channel is not None else arduino._analogChannel(pin)
+
+        if arduino._adcsra is not None and self.avr.firmware_version >= 3:
+            # the firmware does the whole conversion, as below, in one request
+            reply = await self.avr._request(_uint8(pin) + _uint8(AVR.ANALOG_READ) + _uint8(arduino.analog_reference))
+            if len(reply) != 2: raise Exception("Unexpected reply to analogRead from the AVR.")
+            return _uint16R(reply)
+
+        if arduino._adc_mux5 is not None:
+            # the MUX5 bit of ADCSRB selects whether we're reading from channels 0 to 7 (MUX5 low) or 8 to 15 (MUX5 high).
+            adcsrb, mux5 = arduino._adc_mux5
+            self.avr._write_bits(adcsrb, AVR.UPDATE_BITS, mux5, mux5 if pin & 0x08 else 0)
+
+        if arduino._admux is not None:
+            # set the analog reference (high two bits of ADMUX) and select the channel (low 4 bits).
+            address, read_token, write_token = arduino._admux
+            self.avr._write(_pack_write(address, (arduino.analog_reference << 6) | (pin & 0x07), write_token))
+
+        if arduino._adcsra is None:
+            # we dont have an ADC, return 0
+            return 0
+
+        # start the conversion
+        self.avr._write_bits(arduino._adcsra, AVR.SET_BITS, arduino._adsc, 0)
+
+        # ADSC is cleared when the conversion finishes
+        if not await self.avr._wait_bits(arduino._adcsra, arduino._adsc, 0):
+            raise Exception("Timed out waiting for the ADC conversion.")
+
+        # The firmware reads 16-bit registers low byte first, as the ADC needs.
+        return await self.avr._read(arduino._adc)
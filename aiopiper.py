@@ -0,0 +1,103 @@
+"""
+aiopiper.py
+asyncio version of Piper, as a Protocol for asyncio transports. Kept apart from piper.py so that the threaded Piper
+doesn't need asyncio imported.
+
+Samuel Brian
+"""
+
+import asyncio
+from collections import deque
+from piper import Piper, FrameParser, pack_packet, uint8
+
+
+class AsyncPiper(asyncio.Protocol):
+
+    ## Construct an asyncio Piper protocol, for use with a transport such as serial_asyncio's.
+    # @param max_queue_len The maximum number of read packets to keep in memory for each pipe.
+    def __init__(self, max_queue_len=100):
+        self.max_queue_len = max_queue_len
+        self.transport = None
+        self.parser = FrameParser()
+        self.framing = 1            # framing version of written packets, see set_framing()
+        self.read_queue = {}        # pipe_id -> deque of packets nobody was waiting for
+        self.waiters = {}           # pipe_id -> deque of futures waiting for packets, oldest first
+        self.async_callbacks = {}
+        self.closed = False
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, chunk):
+        for pipe_id, data in self.parser.feed(chunk):
+            callback = self.async_callbacks.get(pipe_id)
+            if callback is not None:
+                callback(data)
+                continue
+
+            waiters = self.waiters.get(pipe_id)
+            while waiters:
+                future = waiters.popleft()
+                if not future.done():
+                    future.set_result(data)
+                    break
+            else:
+                queue = self.read_queue.setdefault(pipe_id, deque(maxlen=self.max_queue_len))
+                queue.append(data)
+
+    def connection_lost(self, exc):
+        self.closed = True
+        for waiters in self.waiters.values():
+            for future in waiters:
+                if not future.done(): future.set_exception(Exception("Piper closed while waiting for a packet."))
+            waiters.clear()
+
+    ## Close the transport.
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    ## Write a packet to a pipe.
+    def write_packet(self, pipe_id, data):
+        if self.closed or self.transport is None: raise Exception("Piper is not connected.")
+        self.transport.write(pack_packet(pipe_id, data, self.framing))
+
+    ## Change the framing version of both written and read packets, as Piper.set_framing().
+    def set_framing(self, version):
+        self.framing = version
+        self.parser.set_version(version)
+        if version == 2 and self.transport is not None:
+            self.transport.write(uint8(Piper.FRAME_DELIMITER))
+
+    ## Set the function to execute when a packet arrives with a particular pipe ID.
+    # The function is called in the event loop and should return quickly.
+    def set_read_callback(self, pipe_id, callback_function):
+        self.async_callbacks[pipe_id] = callback_function
+
+    ## Get the next packet from a pipe.
+    # @param timeout [float] Maximum number of seconds to wait, or None to wait forever.
+    # @return [bytes] The packet's payload data, or None if the timeout expired.
+    async def read_packet(self, pipe_id, timeout=None):
+        queue = self.read_queue.get(pipe_id)
+        if queue:
+            return queue.popleft()
+        future = self._wait(pipe_id)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    ## Write a packet and get a future for the next packet on the reply pipe.
+    # The future is registered before the packet is written, so any number of requests can be in flight and replies
+    # are matched to them in order.
+    def request(self, pipe_id, data, reply_pipe_id=None):
+        if reply_pipe_id is None: reply_pipe_id = pipe_id
+        future = self._wait(reply_pipe_id)
+        self.write_packet(pipe_id, data)
+        return future
+
+    def _wait(self, pipe_id):
+        if self.closed: raise Exception("Piper closed while waiting for a packet.")
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(pipe_id, deque()).append(future)
+        return future
@@ -6,8 +6,13 @@ Samuel Brian
 """
 
 from avr import *
+from avr import _BV, _uint8, _uint16R
 from time import sleep, time
 
+# Most bytes a SHIFT_OUT packet carries after its 8-byte header, and a SHIFT_IN reply after its sequence ID
+_SHIFT_OUT_MAX = Piper.MAX_DATA_LENGTH - 8
+_SHIFT_IN_MAX = Piper.MAX_DATA_LENGTH - 1
+
 # Defined in Arduino.h - here globally for convenience
 HIGH = 0x1
 LOW = 0x0
@@ -95,6 +100,9 @@ class Arduino:
         self.analog_reference = self.DEFAULT
         self.start_time_sec = time()  # seconds
 
+        # Look up the registers, bits and timers of every pin now, so the pin functions don't on each call
+        self._resolvePins()
+
         #self.init()
 
     def clockCyclesPerMicrosecond(self):
@@ -123,39 +131,41 @@ class Arduino:
 
     # Implementation from wiring.c
     def init(self):
+        # Queue all the register changes and send them together rather than a packet for each sbi().
+        batch = self.avr.batch()
 
             # on the ATmega168, timer 0 is also used for fast hardware pwm
             # (using phase-correct PWM would mean that timer 0 overflowed half as often
             # resulting in different millis() behavior on the ATmega8 and ATmega168)
         if self.avr.defined("TCCR0A") and self.avr.defined("WGM01"):
-            self.avr.sbi("TCCR0A", self.avr.WGM01)
-            self.avr.sbi("TCCR0A", self.avr.WGM00)
+            batch.sbi("TCCR0A", self.avr.WGM01)
+            batch.sbi("TCCR0A", self.avr.WGM00)
 
             # set timer 0 prescale factor to 64
         if self.avr.defined("__AVR_ATmega128__"):
             # CPU specific: different values for the ATmega128
-            self.avr.sbi("TCCR0", self.avr.CS02)
+            batch.sbi("TCCR0", self.avr.CS02)
         elif self.avr.defined("TCCR0") and self.avr.defined("CS01") and self.avr.defined("CS00"):
             # this combination is for the standard atmega8
-            self.avr.sbi("TCCR0", self.avr.CS01)
-            self.avr.sbi("TCCR0", self.avr.CS00)
+            batch.sbi("TCCR0", self.avr.CS01)
+            batch.sbi("TCCR0", self.avr.CS00)
         elif self.avr.defined("TCCR0B") and self.avr.defined("CS01") and self.avr.defined("CS00"):
             # this combination is for the standard 168/328/1280/2560
-            self.avr.sbi("TCCR0B", self.avr.CS01)
-            self.avr.sbi("TCCR0B", self.avr.CS00)
+            batch.sbi("TCCR0B", self.avr.CS01)
+            batch.sbi("TCCR0B", self.avr.CS00)
         elif self.avr.defined("TCCR0A") and self.avr.defined("CS01") and self.avr.defined("CS00"):
             # this combination is for the __AVR_ATmega645__ series
-            self.avr.sbi("TCCR0A", self.avr.CS01)
-            self.avr.sbi("TCCR0A", self.avr.CS00)
+            batch.sbi("TCCR0A", self.avr.CS01)
+            batch.sbi("TCCR0A", self.avr.CS00)
         else:
             raise Exception("error Timer 0 prescale factor 64 not set correctly")
         
     
             # enable timer 0 overflow interrupt
         if self.avr.defined("TIMSK") and self.avr.defined("TOIE0"):
-            self.avr.sbi("TIMSK", self.avr.TOIE0)
+            batch.sbi("TIMSK", self.avr.TOIE0)
         elif self.avr.defined("TIMSK0") and self.avr.defined("TOIE0"):
-            self.avr.sbi("TIMSK0", self.avr.TOIE0)
+            batch.sbi("TIMSK0", self.avr.TOIE0)
         else:
             raise Exception("error	Timer 0 overflow interrupt not set correctly")
         
@@ -166,69 +176,69 @@ class Arduino:
             # 8 MHz (with a 16 MHz clock) at 50% duty cycle
     
         if self.avr.defined("TCCR1B") and self.avr.defined("CS11") and self.avr.defined("CS10"):
-            self.avr.TCCR1B = 0
+            batch.write("TCCR1B", 0)
     
             # set timer 1 prescale factor to 64
-            self.avr.sbi("TCCR1B", self.avr.CS11)
+            batch.sbi("TCCR1B", self.avr.CS11)
             if self.avr.F_CPU >= 8000000:
-                self.avr.sbi("TCCR1B", self.avr.CS10)
+                batch.sbi("TCCR1B", self.avr.CS10)
         
         elif self.avr.defined("TCCR1") and self.avr.defined("CS11") and self.avr.defined("CS10"):
-            self.avr.sbi("TCCR1", self.avr.CS11)
+            batch.sbi("TCCR1", self.avr.CS11)
             if self.avr.F_CPU >= 8000000:
-                self.avr.sbi("TCCR1", self.avr.CS10)
+                batch.sbi("TCCR1", self.avr.CS10)
         
         
             # put timer 1 in 8-bit phase correct pwm mode
         if self.avr.defined("TCCR1A") and self.avr.defined("WGM10"):
-            self.avr.sbi("TCCR1A", self.avr.WGM10)
+            batch.sbi("TCCR1A", self.avr.WGM10)
         elif self.avr.defined("TCCR1"):
             raise Warning("warning this needs to be finished")
         
     
             # set timer 2 prescale factor to 64
         if self.avr.defined("TCCR2") and self.avr.defined("CS22"):
-            self.avr.sbi("TCCR2", self.avr.CS22)
+            batch.sbi("TCCR2", self.avr.CS22)
         elif self.avr.defined("TCCR2B") and self.avr.defined("CS22"):
-            self.avr.sbi("TCCR2B", self.avr.CS22)
+            batch.sbi("TCCR2B", self.avr.CS22)
         else:
             raise Warning("warning Timer 2 not finished (may not be present on this CPU)")
         
 
             # configure timer 2 for phase correct pwm (8-bit)
         if self.avr.defined("TCCR2") and self.avr.defined("WGM20"):
-            self.avr.sbi("TCCR2", self.avr.WGM20)
+            batch.sbi("TCCR2", self.avr.WGM20)
         elif self.avr.defined("TCCR2A") and self.avr.defined("WGM20"):
-            self.avr.sbi("TCCR2A", self.avr.WGM20)
+            batch.sbi("TCCR2A", self.avr.WGM20)
         else:
             raise Warning("warning Timer 2 not finished (may not be present on this CPU)")
         
     
         if self.avr.defined("TCCR3B") and self.avr.defined("CS31") and self.avr.defined("WGM30"):
-            self.avr.sbi("TCCR3B", self.avr.CS31)		# set timer 3 prescale factor to 64
-            self.avr.sbi("TCCR3B", self.avr.CS30)
-            self.avr.sbi("TCCR3A", self.avr.WGM30)		# put timer 3 in 8-bit phase correct pwm mode
+            batch.sbi("TCCR3B", self.avr.CS31)		# set timer 3 prescale factor to 64
+            batch.sbi("TCCR3B", self.avr.CS30)
+            batch.sbi("TCCR3A", self.avr.WGM30)		# put timer 3 in 8-bit phase correct pwm mode
         
     
         if self.avr.defined("TCCR4A") and self.avr.defined("TCCR4B") and self.avr.defined("TCCR4D"): ## beginning of timer4 block for 32U4 and similar ##
-            self.avr.sbi("TCCR4B", self.avr.CS42)		# set timer4 prescale factor to 64
-            self.avr.sbi("TCCR4B", self.avr.CS41)
-            self.avr.sbi("TCCR4B", self.avr.CS40)
-            self.avr.sbi("TCCR4D", self.avr.WGM40)		# put timer 4 in phase- and frequency-correct PWM mode
-            self.avr.sbi("TCCR4A", self.avr.PWM4A)		# enable PWM mode for comparator OCR4A
-            self.avr.sbi("TCCR4C", self.avr.PWM4D)		# enable PWM mode for comparator OCR4D
+            batch.sbi("TCCR4B", self.avr.CS42)		# set timer4 prescale factor to 64
+            batch.sbi("TCCR4B", self.avr.CS41)
+            batch.sbi("TCCR4B", self.avr.CS40)
+            batch.sbi("TCCR4D", self.avr.WGM40)		# put timer 4 in phase- and frequency-correct PWM mode
+            batch.sbi("TCCR4A", self.avr.PWM4A)		# enable PWM mode for comparator OCR4A
+            batch.sbi("TCCR4C", self.avr.PWM4D)		# enable PWM mode for comparator OCR4D
         else: ## beginning of timer4 block for ATMEGA1280 and ATMEGA2560 ##
             if self.avr.defined("TCCR4B") and self.avr.defined("CS41") and self.avr.defined("WGM40"):
-                self.avr.sbi("TCCR4B", self.avr.CS41)		# set timer 4 prescale factor to 64
-                self.avr.sbi("TCCR4B", self.avr.CS40)
-                self.avr.sbi("TCCR4A", self.avr.WGM40)		# put timer 4 in 8-bit phase correct pwm mode
+                batch.sbi("TCCR4B", self.avr.CS41)		# set timer 4 prescale factor to 64
+                batch.sbi("TCCR4B", self.avr.CS40)
+                batch.sbi("TCCR4A", self.avr.WGM40)		# put timer 4 in 8-bit phase correct pwm mode
 
             ## end timer4 block for ATMEGA1280/2560 and similar ##
     
         if self.avr.defined("TCCR5B") and self.avr.defined("CS51") and self.avr.defined("WGM50"):
-            self.avr.sbi("TCCR5B", self.avr.CS51)		# set timer 5 prescale factor to 64
-            self.avr.sbi("TCCR5B", self.avr.CS50)
-            self.avr.sbi("TCCR5A", self.avr.WGM50)		# put timer 5 in 8-bit phase correct pwm mode
+            batch.sbi("TCCR5B", self.avr.CS51)		# set timer 5 prescale factor to 64
+            batch.sbi("TCCR5B", self.avr.CS50)
+            batch.sbi("TCCR5A", self.avr.WGM50)		# put timer 5 in 8-bit phase correct pwm mode
         
     
         if self.avr.defined("ADCSRA"):
@@ -236,12 +246,12 @@ class Arduino:
             # 16 MHz / 128 = 125 KHz, inside the desired 50-200 KHz range.
             # XXX: this will not work properly for other clock speeds, and
             # this code should use F_CPU to determine the prescale factor.
-            self.avr.sbi("ADCSRA", self.avr.ADPS2)
-            self.avr.sbi("ADCSRA", self.avr.ADPS1)
-            self.avr.sbi("ADCSRA", self.avr.ADPS0)
+            batch.sbi("ADCSRA", self.avr.ADPS2)
+            batch.sbi("ADCSRA", self.avr.ADPS1)
+            batch.sbi("ADCSRA", self.avr.ADPS0)
     
             # enable a2d conversions
-            self.avr.sbi("ADCSRA", self.avr.ADEN)
+            batch.sbi("ADCSRA", self.avr.ADEN)
         
     
         #     # the bootloader connects pins 0 and 1 to the USART disconnect them
@@ -251,129 +261,193 @@ class Arduino:
         #     UCSRB = 0
         # elif self.avr.defined("UCSR0B"):
         #     UCSR0B = 0
+
+        batch.send()
     
 
 
     # Implementation from wiring_digital.c
     def pinMode(self, pin, mode):
-        bit = self.digitalPinToBitMask(pin)
-        port = self.digitalPinToPort(pin)
+        pin = self.pins[pin]
 
-        if port == Arduino.NOT_A_PIN: return
-
-        reg = self.portModeRegister(port)
-        out = self.portOutputRegister(port)
+        if pin is None: return
 
         if mode == INPUT:
             ##oldSREG = self.avr.SREG
             ##     cli();
-            reg.set(reg.get() & invert8(bit))  # *reg &= ~bit;
-            out.set(out.get() & invert8(bit))  # *out &= ~bit
+            self.avr._write_bits(pin.mode, AVR.CLEAR_BITS, pin.mask, 0)    # *reg &= ~bit;
+            self.avr._write_bits(pin.output, AVR.CLEAR_BITS, pin.mask, 0)  # *out &= ~bit
         ##self.avr.SREG = oldSREG
         elif mode == INPUT_PULLUP:
             ##oldSREG = self.avr.SREG
             ##    cli();
-            reg.set(reg.get() & invert8(bit))  # *reg &= ~bit;
-            out.set(out.get() | bit)  # *out |= bit
+            self.avr._write_bits(pin.mode, AVR.CLEAR_BITS, pin.mask, 0)    # *reg &= ~bit;
+            self.avr._write_bits(pin.output, AVR.SET_BITS, pin.mask, 0)    # *out |= bit
         ##self.avr.SREG = oldSREG
         else:
             ##oldSREG = self.avr.SREG
             ##     cli();
-            reg.set(reg.get() | bit)  # *reg |= bit;
+            self.avr._write_bits(pin.mode, AVR.SET_BITS, pin.mask, 0)      # *reg |= bit;
         ##self.avr.SREG = oldSREG
 
     # Implementation from wiring_digital.c
     def digitalWrite(self, pin, val):
-        timer = self.digitalPinToTimer(pin)
-        bit = self.digitalPinToBitMask(pin)
-        port = self.digitalPinToPort(pin)
+        pin = self.pins[pin]
 
-        if port == Arduino.NOT_A_PIN: return
+        if pin is None: return
 
         # If the pin that support PWM output, we need to turn it off
         # before doing a digital write.
-        if (timer != Arduino.NOT_ON_TIMER): self.turnOffPWM(timer)
-
-        out = self.portOutputRegister(port)
+        if pin.pwm_off is not None: self.avr._write_bits(pin.pwm_off[0], AVR.CLEAR_BITS, pin.pwm_off[1], 0)
 
         ##oldSREG = self.avr.SREG
         ##     cli();
 
         if val == LOW:
-            out.set(out.get() & invert8(bit))  # *out &= ~bit
+            self.avr._write_bits(pin.output, AVR.CLEAR_BITS, pin.mask, 0)  # *out &= ~bit
         else:
-            out.set(out.get() | bit)  # *out |= bit
+            self.avr._write_bits(pin.output, AVR.SET_BITS, pin.mask, 0)    # *out |= bit
 
         ##self.avr.SREG = oldSREG
 
     # Implementation from wiring_digital.c
     def digitalRead(self, pin):
-        timer = self.digitalPinToTimer(pin)
-        bit = self.digitalPinToBitMask(pin)
-        port = self.digitalPinToPort(pin)
+        pin = self.pins[pin]
 
-        if port == Arduino.NOT_A_PIN: return LOW
+        if pin is None: return LOW
 
         # If the pin that support PWM output, we need to turn it off
         # before getting a digital reading.
-        if (timer != Arduino.NOT_ON_TIMER): self.turnOffPWM(timer)
+        if pin.pwm_off is not None: self.avr._write_bits(pin.pwm_off[0], AVR.CLEAR_BITS, pin.pwm_off[1], 0)
 
-        if self.portInputRegister(port).get() & bit: return HIGH
+        if self.avr._get_value(pin.input[0], pin.input[1]) & pin.mask: return HIGH
         return LOW
 
     # Implementation from wiring_digital.c
     def turnOffPWM(self, timer):
+        if timer not in self._timer_outputs: self._timer_outputs[timer] = self._resolveTimerOutput(timer)
+        output = self._timer_outputs[timer]
+        if output is not None: self.avr._write_bits(output[0], AVR.CLEAR_BITS, output[1], 0)
+
+    # Get the (register, bit) that connects a timer's PWM output to its pin, or None.
+    def _timerOutputBit(self, timer):
         if self.avr.defined("TCCR1A") and self.avr.defined("COM1A1"):
-            if timer == Arduino.TIMER1A: self.avr.cbi("TCCR1A", self.avr.COM1A1)
+            if timer == Arduino.TIMER1A: return "TCCR1A", self.avr.COM1A1
 
         if self.avr.defined("TCCR1A") and self.avr.defined("COM1B1"):
-            if timer == Arduino.TIMER1B: self.avr.cbi("TCCR1A", self.avr.COM1B1)
+            if timer == Arduino.TIMER1B: return "TCCR1A", self.avr.COM1B1
 
         if self.avr.defined("TCCR2") and self.avr.defined("COM21"):
-            if timer == Arduino.TIMER2: self.avr.cbi("TCCR2", self.avr.COM21)
+            if timer == Arduino.TIMER2: return "TCCR2", self.avr.COM21
 
         if self.avr.defined("TCCR0A") and self.avr.defined("COM0A1"):
-            if timer == Arduino.TIMER0A: self.avr.cbi("TCCR0A", self.avr.COM0A1)
+            if timer == Arduino.TIMER0A: return "TCCR0A", self.avr.COM0A1
 
-        if self.avr.defined("TIMER0B") and self.avr.defined("COM0B1"):
-            if timer == Arduino.TIMER0B: self.avr.cbi("TCCR0A", self.avr.COM0B1)
+        if self.avr.defined("TCCR0A") and self.avr.defined("COM0B1"):
+            if timer == Arduino.TIMER0B: return "TCCR0A", self.avr.COM0B1
 
         if self.avr.defined("TCCR2A") and self.avr.defined("COM2A1"):
-            if timer == Arduino.TIMER2A: self.avr.cbi("TCCR2A", self.avr.COM2A1)
+            if timer == Arduino.TIMER2A: return "TCCR2A", self.avr.COM2A1
 
         if self.avr.defined("TCCR2A") and self.avr.defined("COM2B1"):
-            if timer == Arduino.TIMER2B: self.avr.cbi("TCCR2A", self.avr.COM2B1)
+            if timer == Arduino.TIMER2B: return "TCCR2A", self.avr.COM2B1
 
         if self.avr.defined("TCCR3A") and self.avr.defined("COM3A1"):
-            if timer == Arduino.TIMER3A: self.avr.cbi("TCCR3A", self.avr.COM3A1)
+            if timer == Arduino.TIMER3A: return "TCCR3A", self.avr.COM3A1
 
         if self.avr.defined("TCCR3A") and self.avr.defined("COM3B1"):
-            if timer == Arduino.TIMER3B: self.avr.cbi("TCCR3A", self.avr.COM3B1)
+            if timer == Arduino.TIMER3B: return "TCCR3A", self.avr.COM3B1
 
         if self.avr.defined("TCCR3A") and self.avr.defined("COM3C1"):
-            if timer == Arduino.TIMER3C: self.avr.cbi("TCCR3A", self.avr.COM3C1)
+            if timer == Arduino.TIMER3C: return "TCCR3A", self.avr.COM3C1
 
         if self.avr.defined("TCCR4A") and self.avr.defined("COM4A1"):
-            if timer == Arduino.TIMER4A: self.avr.cbi("TCCR4A", self.avr.COM4A1)
+            if timer == Arduino.TIMER4A: return "TCCR4A", self.avr.COM4A1
 
         if self.avr.defined("TCCR4A") and self.avr.defined("COM4B1"):
-            if timer == Arduino.TIMER4B: self.avr.cbi("TCCR4A", self.avr.COM4B1)
+            if timer == Arduino.TIMER4B: return "TCCR4A", self.avr.COM4B1
 
         if self.avr.defined("TCCR4A") and self.avr.defined("COM4C1"):
-            if timer == Arduino.TIMER4C: self.avr.cbi("TCCR4A", self.avr.COM4C1)
+            if timer == Arduino.TIMER4C: return "TCCR4A", self.avr.COM4C1
 
         if self.avr.defined("TCCR4C") and self.avr.defined("COM4D1"):
-            if timer == Arduino.TIMER4D: self.avr.cbi("TCCR4C", self.avr.COM4D1)
+            if timer == Arduino.TIMER4D: return "TCCR4C", self.avr.COM4D1
 
         if self.avr.defined("TCCR5A"):
-            if timer == Arduino.TIMER5A: self.avr.cbi("TCCR5A", self.avr.COM5A1)
-            if timer == Arduino.TIMER5B: self.avr.cbi("TCCR5A", self.avr.COM5B1)
-            if timer == Arduino.TIMER5C: self.avr.cbi("TCCR5A", self.avr.COM5C1)
+            if timer == Arduino.TIMER5A: return "TCCR5A", self.avr.COM5A1
+            if timer == Arduino.TIMER5B: return "TCCR5A", self.avr.COM5B1
+            if timer == Arduino.TIMER5C: return "TCCR5A", self.avr.COM5C1
+
+        return None
 
     # Implementation from wiring_analog.c
     def analogRead(self, pin):
+        channel = self._analog_channels.get(pin)
+        pin = channel if channel is not None else self._analogChannel(pin)
+
+        if self._adcsra is not None and self.avr.firmware_version >= 3:
+            # the firmware does the whole conversion, as below, in one request
+            return self._analogReadOp(pin)
+
+        if self._adc_mux5 is not None:
+            # the MUX5 bit of ADCSRB selects whether we're reading from channels
+            # 0 to 7 (MUX5 low) or 8 to 15 (MUX5 high).
+            adcsrb, mux5 = self._adc_mux5
+            self.avr._write_bits(adcsrb, AVR.UPDATE_BITS, mux5, mux5 if pin & 0x08 else 0)
+
+        if self._admux is not None:
+            # set the analog reference (high two bits of ADMUX) and select the
+            # channel (low 4 bits).  this also sets ADLAR (left-adjust result)
+            # to 0 (the default).
+            self.avr._set_value(self._admux[0], (self.analog_reference << 6) | (pin & 0x07), self._admux[2])
 
-        if "analogPinToChannel" in dir(self.board):
+        # without a delay, we seem to read from the wrong channel
+        #delay(1);
+
+        if self._adcsra is None:
+            # we dont have an ADC, return 0
+            return 0
+
+        # start the conversion
+        self.avr._write_bits(self._adcsra, AVR.SET_BITS, self._adsc, 0)
+
+        # ADSC is cleared when the conversion finishes
+        if not self.avr._wait_bits(self._adcsra, self._adsc, 0):
+            raise Exception("Timed out waiting for the ADC conversion.")
+
+        # we have to read ADCL first; doing so locks both ADCL
+        # and ADCH until ADCH is read.  reading ADCL second would
+        # cause the results of each conversion to be discarded,
+        # as ADCL and ADCH would be locked when it completed.
+        # The firmware reads 16-bit registers low byte first.
+        return self.avr._get_value(self._adc[0], self._adc[1])
+
+    ## Sample analog pins continuously, much faster than analogRead() can. See adcstream.py.
+    # @param pins Analog pins (e.g. A0), in the order they are sampled.
+    # @param sample_rate [float] Samples of each pin per second.
+    # @return [ADCStream] Not started yet; use it in a with block or call its start().
+    def analogStream(self, pins, sample_rate, buffer_seconds=1.0):
+        from adcstream import ADCStream
+        return ADCStream(self, pins, sample_rate, buffer_seconds)
+
+    # analogRead() with the firmware's ANALOG_READ operation
+    def _analogReadOp(self, channel):
+        avr = self.avr
+        admux = (self.analog_reference << 6) | (channel & 0x07)
+        with avr._shadow.lock:
+            # The operation writes ADMUX and MUX5, so keep them up to date if they are cached
+            if self._admux is not None: avr._shadow.change(self._admux.addresses, None, 0, admux)
+            if self._adc_mux5 is not None:
+                adcsrb, mux5 = self._adc_mux5
+                avr._shadow.change(adcsrb.addresses, AVR.UPDATE_BITS, mux5, mux5 if channel & 0x08 else 0)
+            request = avr._submit(_uint8(channel) + _uint8(AVR.ANALOG_READ) + _uint8(self.analog_reference))
+        reply = avr._wait(request)
+        if len(reply) != 2: raise Exception("Unexpected reply to analogRead from the AVR.")
+        return _uint16R(reply)
+
+    # Convert an analog pin number (or channel number) to an ADC channel.
+    def _analogChannel(self, pin):
+        if self._analog_pin_map:
             if self.avr.defined("__AVR_ATmega32U4__"):
                 if (pin >= 18): pin -= 18  # allow for channel or pin numbers
             pin = self.board.analogPinToChannel(pin)
@@ -387,41 +461,7 @@ class Arduino:
             if (pin >= 24): pin -= 24  # allow for channel or pin numbers
         else:
             if (pin >= 14): pin -= 14  # allow for channel or pin numbers
-
-        if self.avr.defined("ADCSRB") and self.avr.defined("MUX5"):
-            # the MUX5 bit of ADCSRB selects whether we're reading from channels
-            # 0 to 7 (MUX5 low) or 8 to 15 (MUX5 high).
-            self.avr.ADCSRB = (self.avr.ADCSRB & invert(1 << self.avr.MUX5)) | (((pin >> 3) & 0x01) << self.avr.MUX5)
-
-        if self.avr.defined("ADMUX"):
-            # set the analog reference (high two bits of ADMUX) and select the
-            # channel (low 4 bits).  this also sets ADLAR (left-adjust result)
-            # to 0 (the default).
-            self.avr.ADMUX = (self.analog_reference << 6) | (pin & 0x07)
-
-        # without a delay, we seem to read from the wrong channel
-        #delay(1);
-
-        if self.avr.defined("ADCSRA") and self.avr.defined("ADCL"):
-            # start the conversion
-            self.avr.sbi("ADCSRA", self.avr.ADSC)
-
-            # ADSC is cleared when the conversion finishes
-            while (self.avr.bit_is_set("ADCSRA", self.avr.ADSC)): pass
-
-            # we have to read ADCL first; doing so locks both ADCL
-            # and ADCH until ADCH is read.  reading ADCL second would
-            # cause the results of each conversion to be discarded,
-            # as ADCL and ADCH would be locked when it completed.
-            low = self.avr.ADCL
-            high = self.avr.ADCH
-        else:
-            # we dont have an ADC, return 0
-            low = 0
-            high = 0
-
-        # combine the two bytes
-        return (high << 8) | low
+        return pin
 
     # Implementation from wiring_analog.c
     def analogReference(self, mode):
@@ -442,145 +482,132 @@ class Arduino:
         elif (val == 255):
             self.digitalWrite(pin, HIGH)
         else:
-            timer = self.digitalPinToTimer(pin)
+            pwm = self.pins[pin].pwm if self.pins[pin] is not None else None
 
-            if timer == "NOT_ON_TIMER":  # Moved this up from bottom [samuelbr]
+            if pwm is None:  # Moved this up from bottom [samuelbr]
                 if (val < 128):
                     self.digitalWrite(pin, LOW)
                 else:
                     self.digitalWrite(pin, HIGH)
                 return
 
-            # XXX fix needed for atmega8
-            if self.avr.defined("TCCR0") and self.avr.defined("COM00") and not self.avr.defined("__AVR_ATmega8__"):
-                if timer == Arduino.TIMER0A:
-                    # connect pwm to pin on timer 0
-                    self.avr.sbi("TCCR0", self.avr.COM00)
-                    self.avr.OCR0 = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR0A") and self.avr.defined("COM0A1"):
-                if timer == Arduino.TIMER0A:
-                    # connect pwm to pin on timer 0, channel A
-                    self.avr.sbi("TCCR0A", self.avr.COM0A1)
-                    self.avr.OCR0A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR0A") and self.avr.defined("COM0B1"):
-                if timer == Arduino.TIMER0B:
-                    # connect pwm to pin on timer 0, channel B
-                    self.avr.sbi("TCCR0A", self.avr.COM0B1)
-                    self.avr.OCR0B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR1A") and self.avr.defined("COM1A1"):
-                if timer == Arduino.TIMER1A:
-                    # connect pwm to pin on timer 1, channel A
-                    self.avr.sbi("TCCR1A", self.avr.COM1A1)
-                    self.avr.OCR1A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR1A") and self.avr.defined("COM1B1"):
-                if timer == Arduino.TIMER1B:
-                    # connect pwm to pin on timer 1, channel B
-                    self.avr.sbi("TCCR1A", self.avr.COM1B1)
-                    self.avr.OCR1B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR2") and self.avr.defined("COM21"):
-                if timer == Arduino.TIMER2:
-                    # connect pwm to pin on timer 2
-                    self.avr.sbi("TCCR2", self.avr.COM21)
-                    self.avr.OCR2 = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR2A") and self.avr.defined("COM2A1"):
-                if timer == Arduino.TIMER2A:
-                    # connect pwm to pin on timer 2, channel A
-                    self.avr.sbi("TCCR2A", self.avr.COM2A1)
-                    self.avr.OCR2A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR2A") and self.avr.defined("COM2B1"):
-                if timer == Arduino.TIMER2B:
-                    # connect pwm to pin on timer 2, channel B
-                    self.avr.sbi("TCCR2A", self.avr.COM2B1)
-                    self.avr.OCR2B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR3A") and self.avr.defined("COM3A1"):
-                if timer == Arduino.TIMER3A:
-                    # connect pwm to pin on timer 3, channel A
-                    self.avr.sbi("TCCR3A", self.avr.COM3A1)
-                    self.avr.OCR3A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR3A") and self.avr.defined("COM3B1"):
-                if timer == Arduino.TIMER3B:
-                    # connect pwm to pin on timer 3, channel B
-                    self.avr.sbi("TCCR3A", self.avr.COM3B1)
-                    self.avr.OCR3B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR3A") and self.avr.defined("COM3C1"):
-                if timer == Arduino.TIMER3C:
-                    # connect pwm to pin on timer 3, channel C
-                    self.avr.sbi("TCCR3A", self.avr.COM3C1)
-                    self.avr.OCR3C = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR4A"):
-                if timer == Arduino.TIMER4A:
-                    #connect pwm to pin on timer 4, channel A
-                    self.avr.sbi("TCCR4A", self.avr.COM4A1)
-                    if self.avr.defined("COM4A0"):  # only used on 32U4
-                        self.avr.cbi("TCCR4A", self.avr.COM4A0)
-                    self.avr.OCR4A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR4A") and self.avr.defined("COM4B1"):
-                if timer == Arduino.TIMER4B:
-                    # connect pwm to pin on timer 4, channel B
-                    self.avr.sbi("TCCR4A", self.avr.COM4B1)
-                    self.avr.OCR4B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR4A") and self.avr.defined("COM4C1"):
-                if timer == Arduino.TIMER4C:
-                    # connect pwm to pin on timer 4, channel C
-                    self.avr.sbi("TCCR4A", self.avr.COM4C1)
-                    self.avr.OCR4C = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR4C") and self.avr.defined("COM4D1"):
-                if timer == Arduino.TIMER4D:
-                    # connect pwm to pin on timer 4, channel D
-                    self.avr.sbi("TCCR4C", self.avr.COM4D1)
-                    if self.avr.defined("COM4D0"):  # only used on 32U4
-                        self.avr.cbi("TCCR4C", self.avr.COM4D0)
-                    self.avr.OCR4D = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR5A") and self.avr.defined("COM5A1"):
-                if timer == Arduino.TIMER5A:
-                    # connect pwm to pin on timer 5, channel A
-                    self.avr.sbi("TCCR5A", self.avr.COM5A1)
-                    self.avr.OCR5A = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR5A") and self.avr.defined("COM5B1"):
-                if timer == Arduino.TIMER5B:
-                    # connect pwm to pin on timer 5, channel B
-                    self.avr.sbi("TCCR5A", self.avr.COM5B1)
-                    self.avr.OCR5B = val  # set pwm duty
-                    return
-
-            if self.avr.defined("TCCR5A") and self.avr.defined("COM5C1"):
-                if timer == Arduino.TIMER5C:
-                    # connect pwm to pin on timer 5, channel C
-                    self.avr.sbi("TCCR5A", self.avr.COM5C1)
-                    self.avr.OCR5C = val  # set pwm duty
-                    return
+            # connect pwm to pin on the timer, clearing the other COM bit where the chip has one
+            tccr, com_set, com_clear, ocr = pwm
+            self.avr._write_bits(tccr, AVR.UPDATE_BITS, com_set | com_clear, com_set)
+            self.avr._set_value(ocr[0], val, ocr[2])  # set pwm duty
+
+    # Get the (TCCR register, COM bit mask to set, COM bit mask to clear, OCR register) that connect a timer's PWM
+    # output to its pin, or None. From analogWrite() in wiring_analog.c.
+    def _timerPWMOutput(self, timer):
+        # XXX fix needed for atmega8
+        if self.avr.defined("TCCR0") and self.avr.defined("COM00") and not self.avr.defined("__AVR_ATmega8__"):
+            if timer == Arduino.TIMER0A: return "TCCR0", _BV(self.avr.COM00), 0, "OCR0"
+
+        if self.avr.defined("TCCR0A") and self.avr.defined("COM0A1"):
+            if timer == Arduino.TIMER0A: return "TCCR0A", _BV(self.avr.COM0A1), 0, "OCR0A"
+
+        if self.avr.defined("TCCR0A") and self.avr.defined("COM0B1"):
+            if timer == Arduino.TIMER0B: return "TCCR0A", _BV(self.avr.COM0B1), 0, "OCR0B"
+
+        if self.avr.defined("TCCR1A") and self.avr.defined("COM1A1"):
+            if timer == Arduino.TIMER1A: return "TCCR1A", _BV(self.avr.COM1A1), 0, "OCR1A"
+
+        if self.avr.defined("TCCR1A") and self.avr.defined("COM1B1"):
+            if timer == Arduino.TIMER1B: return "TCCR1A", _BV(self.avr.COM1B1), 0, "OCR1B"
+
+        if self.avr.defined("TCCR2") and self.avr.defined("COM21"):
+            if timer == Arduino.TIMER2: return "TCCR2", _BV(self.avr.COM21), 0, "OCR2"
+
+        if self.avr.defined("TCCR2A") and self.avr.defined("COM2A1"):
+            if timer == Arduino.TIMER2A: return "TCCR2A", _BV(self.avr.COM2A1), 0, "OCR2A"
+
+        if self.avr.defined("TCCR2A") and self.avr.defined("COM2B1"):
+            if timer == Arduino.TIMER2B: return "TCCR2A", _BV(self.avr.COM2B1), 0, "OCR2B"
+
+        if self.avr.defined("TCCR3A") and self.avr.defined("COM3A1"):
+            if timer == Arduino.TIMER3A: return "TCCR3A", _BV(self.avr.COM3A1), 0, "OCR3A"
+
+        if self.avr.defined("TCCR3A") and self.avr.defined("COM3B1"):
+            if timer == Arduino.TIMER3B: return "TCCR3A", _BV(self.avr.COM3B1), 0, "OCR3B"
+
+        if self.avr.defined("TCCR3A") and self.avr.defined("COM3C1"):
+            if timer == Arduino.TIMER3C: return "TCCR3A", _BV(self.avr.COM3C1), 0, "OCR3C"
+
+        if self.avr.defined("TCCR4A"):
+            # COM4A0 is only used on 32U4
+            if timer == Arduino.TIMER4A:
+                return "TCCR4A", _BV(self.avr.COM4A1), _BV(self.avr.COM4A0) if self.avr.defined("COM4A0") else 0, "OCR4A"
+
+        if self.avr.defined("TCCR4A") and self.avr.defined("COM4B1"):
+            if timer == Arduino.TIMER4B: return "TCCR4A", _BV(self.avr.COM4B1), 0, "OCR4B"
+
+        if self.avr.defined("TCCR4A") and self.avr.defined("COM4C1"):
+            if timer == Arduino.TIMER4C: return "TCCR4A", _BV(self.avr.COM4C1), 0, "OCR4C"
+
+        if self.avr.defined("TCCR4C") and self.avr.defined("COM4D1"):
+            # COM4D0 is only used on 32U4
+            if timer == Arduino.TIMER4D:
+                return "TCCR4C", _BV(self.avr.COM4D1), _BV(self.avr.COM4D0) if self.avr.defined("COM4D0") else 0, "OCR4D"
+
+        if self.avr.defined("TCCR5A") and self.avr.defined("COM5A1"):
+            if timer == Arduino.TIMER5A: return "TCCR5A", _BV(self.avr.COM5A1), 0, "OCR5A"
+
+        if self.avr.defined("TCCR5A") and self.avr.defined("COM5B1"):
+            if timer == Arduino.TIMER5B: return "TCCR5A", _BV(self.avr.COM5B1), 0, "OCR5B"
+
+        if self.avr.defined("TCCR5A") and self.avr.defined("COM5C1"):
+            if timer == Arduino.TIMER5C: return "TCCR5A", _BV(self.avr.COM5C1), 0, "OCR5C"
+
+        return None
+
+    def _resolveTimerOutput(self, timer):
+        output = self._timerOutputBit(timer)
+        return (self.avr._register(output[0]), _BV(output[1])) if output is not None else None
+
+    # Resolve the pin tables and the chip's ADC registers once. See Pin.
+    def _resolvePins(self):
+        # Only the timers connected to pins are resolved. Others are resolved by turnOffPWM() when first used.
+        timers = set(self.board.digital_pin_to_timer_PGM) - {Arduino.NOT_ON_TIMER}
+
+        self._timer_outputs = {}    # timer -> (TCCR register, COM bit mask), or None
+        for timer in timers:
+            self._timer_outputs[timer] = self._resolveTimerOutput(timer)
+
+        timer_pwm = {}              # timer -> (TCCR register, COM mask to set, COM mask to clear, OCR register)
+        for timer in timers:
+            pwm = self._timerPWMOutput(timer)
+            if pwm is not None and self.avr.is_register(pwm[3]):
+                timer_pwm[timer] = (self.avr._register(pwm[0]), pwm[1], pwm[2], self.avr._register(pwm[3]))
+
+        self.pins = []
+        for p in range(len(self.board.digital_pin_to_port_PGM)):
+            port = self.digitalPinToPort(p)
+            if port == Arduino.NOT_A_PIN:
+                self.pins.append(None)
+                continue
+            timer = self.digitalPinToTimer(p)
+            self.pins.append(Pin(self.digitalPinToBitMask(p),
+                                 self.avr._register(self.portModeRegister(port).register),
+                                 self.avr._register(self.portOutputRegister(port).register),
+                                 self.avr._register(self.portInputRegister(port).register),
+                                 self._timer_outputs.get(timer), timer_pwm.get(timer)))
+
+        # Pin or channel number -> ADC channel
+        self._analog_pin_map = "analogPinToChannel" in dir(self.board)
+        self._analog_channels = {}
+        for p in range(len(self.pins)):
+            try: self._analog_channels[p] = self._analogChannel(p)
+            except IndexError: pass
+
+        self._adc_mux5 = None       # (ADCSRB, MUX5 mask)
+        if self.avr.defined("ADCSRB") and self.avr.defined("MUX5"):
+            self._adc_mux5 = (self.avr._register("ADCSRB"), _BV(self.avr.MUX5))
+        self._admux = self.avr._register("ADMUX")
+        self._adcsra = None
+        if self.avr.defined("ADCSRA") and self.avr.defined("ADCL"):
+            self._adcsra = self.avr._register("ADCSRA")
+            self._adsc = _BV(self.avr.ADSC)
+            self._adc = self.avr._register("ADCW" if self.avr.is_register("ADCW") else "ADC")
 
     # The Arduino time functions (implemented in wiring.c) rely on local variables updated in the TIMER0_OVF ISR and
     # can't be accessed through the SFR bridge. Plus, the overhead with the serial communication would make timing
@@ -601,6 +628,10 @@ class Arduino:
 
     # Implementation from wiring_shift.c
     def shiftOut(self, dataPin, clockPin, bitOrder, val):
+        if self.avr.firmware_version >= 7:
+            self.shiftOutBuffer(dataPin, clockPin, bitOrder, _uint8(val))
+            return
+
         for i in range(0, 8):
             if (bitOrder == LSBFIRST):
                 self.digitalWrite(dataPin, not not (val & (1 << i)))
@@ -612,6 +643,9 @@ class Arduino:
 
     # Implementation from wiring_shift.c
     def shiftIn(self, dataPin, clockPin, bitOrder):
+        if self.avr.firmware_version >= 7:
+            return self.shiftInBuffer(dataPin, clockPin, bitOrder, 1)[0]
+
         value = 0
         for i in range(0, 8):
             self.digitalWrite(clockPin, HIGH)
@@ -622,6 +656,73 @@ class Arduino:
             self.digitalWrite(clockPin, LOW)
         return value
 
+    ## Shift bytes out one bit at a time, as shiftOut() does for one byte. The AVR does the bit-banging itself, a
+    # packet for every 247 bytes, so it runs at the AVR's speed. Needs firmware version 7 or later; older firmware
+    # falls back to shiftOut() for each byte.
+    # @param data Any bytes-like object.
+    # @param halfPeriod [int] Microseconds the clock is held high and then low for each bit (up to 255), or 0 to
+    #                   clock as fast as the AVR can.
+    def shiftOutBuffer(self, dataPin, clockPin, bitOrder, data, halfPeriod=0):
+        data = memoryview(data).cast("B")
+        if self.avr.firmware_version < 7:
+            for val in data: self.shiftOut(dataPin, clockPin, bitOrder, val)
+            return
+        data_pin, clock_pin = self._shiftPins(dataPin, clockPin)
+        if data_pin is None or clock_pin is None or len(data) == 0: return
+
+        avr = self.avr
+        last_bit = data[-1] & (0x80 if bitOrder == LSBFIRST else 0x01)
+        with avr._shadow.lock:
+            # The clock is left low, and the data pin at the last bit
+            avr._shadow.change(clock_pin.output.addresses, AVR.CLEAR_BITS, clock_pin.mask, 0)
+            avr._shadow.change(data_pin.output.addresses, AVR.SET_BITS if last_bit else AVR.CLEAR_BITS,
+                               data_pin.mask, data_pin.mask if last_bit else 0)
+            for offset in range(0, len(data), _SHIFT_OUT_MAX):
+                chunk = data[offset:offset + _SHIFT_OUT_MAX]
+                avr._piper.write_packet(AVR.REGISTER_PIPE, self._packShift(AVR.SHIFT_OUT, data_pin.output, data_pin,
+                                                                           clock_pin, bitOrder, halfPeriod, len(chunk))
+                                        + chunk)
+
+    ## Shift bytes in one bit at a time, as shiftIn() does for one byte. The AVR does the bit-banging itself, so it
+    # runs at the AVR's speed. Needs firmware version 7 or later; older firmware falls back to shiftIn() for each byte.
+    # @param length [int] Number of bytes to shift in.
+    # @param halfPeriod See shiftOutBuffer().
+    # @return [bytes]
+    def shiftInBuffer(self, dataPin, clockPin, bitOrder, length, halfPeriod=0):
+        if self.avr.firmware_version < 7:
+            return bytes(self.shiftIn(dataPin, clockPin, bitOrder) for i in range(length))
+        data_pin, clock_pin = self._shiftPins(dataPin, clockPin)
+        if data_pin is None or clock_pin is None: return bytes(length)
+
+        avr = self.avr
+        requests = []
+        with avr._shadow.lock:
+            avr._shadow.change(clock_pin.output.addresses, AVR.CLEAR_BITS, clock_pin.mask, 0)
+            for offset in range(0, length, _SHIFT_IN_MAX):
+                count = min(_SHIFT_IN_MAX, length - offset)
+                packet = self._packShift(AVR.SHIFT_IN, data_pin.input, data_pin, clock_pin, bitOrder, halfPeriod, count)
+                requests.append((count, avr._submit(packet)))
+        data = b""
+        for count, request in requests:
+            reply = avr._wait(request, avr.timeout + count * 16 * halfPeriod / 1000000.0)
+            if len(reply) != count: raise Exception("Unexpected reply to shiftIn from the AVR.")
+            data += reply
+        return data
+
+    # The pins for shiftOutBuffer() and shiftInBuffer(), with their PWM turned off as digitalWrite() and digitalRead()
+    # would
+    def _shiftPins(self, dataPin, clockPin):
+        pins = (self.pins[dataPin], self.pins[clockPin])
+        for pin in pins:
+            if pin is not None and pin.pwm_off is not None:
+                self.avr._write_bits(pin.pwm_off[0], AVR.CLEAR_BITS, pin.pwm_off[1], 0)
+        return pins
+
+    # Pack the header of a SHIFT_OUT or SHIFT_IN operation. data_register is the data pin's PORTx or PINx.
+    def _packShift(self, token, data_register, data_pin, clock_pin, bitOrder, halfPeriod, length):
+        return _uint8(bitOrder) + _uint8(token) + _uint8(data_register.addresses[0]) + _uint8(data_pin.mask) \
+            + _uint8(clock_pin.output.addresses[0]) + _uint8(clock_pin.mask) + _uint8(halfPeriod) + _uint8(length)
+
     # The callback handling for the external interrupt methods is a bit different to the original Arduino because of how
     # the Python AVR layer already handles interrupts.
     # Implementation from WInterrupts.c
@@ -641,97 +742,97 @@ class Arduino:
             # and the 32U4.  Since avrlib defines registers PCMSK1 and PCMSK2 that aren't
             # even present on the 32U4 this is the only way to distinguish between them.
             if interruptNum == 0:
-                self.avr.EICRA = (self.avr.EICRA & invert((1<<self.avr.self.avr.ISC00) | (1<<self.avr.ISC01))) | (mode << self.avr.self.avr.ISC00)
-                self.avr.self.avr.EIMSK |= (1<<self.avr.INT0)
+                self.avr.update_fields("EICRA", ISC0=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT0))
                 avrINTx = 0
             elif interruptNum == 1:
-                self.avr.EICRA = (self.avr.EICRA & invert((1<<self.avr.ISC10) | (1<<self.avr.ISC11))) | (mode << self.avr.ISC10)
-                self.avr.EIMSK |= (1<<self.avr.INT1)
+                self.avr.update_fields("EICRA", ISC1=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT1))
                 avrINTx = 1
             elif interruptNum == 2:
-                self.avr.EICRA = (self.avr.EICRA & invert((1<<self.avr.ISC20) | (1<<self.avr.ISC21))) | (mode << self.avr.ISC20)
-                self.avr.EIMSK |= (1<<self.avr.INT2)
+                self.avr.update_fields("EICRA", ISC2=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT2))
                 avrINTx = 2
             elif interruptNum == 3:
-                self.avr.EICRA = (self.avr.EICRA & invert((1<<self.avr.ISC30) | (1<<self.avr.ISC31))) | (mode << self.avr.ISC30)
-                self.avr.EIMSK |= (1<<self.avr.INT3)
+                self.avr.update_fields("EICRA", ISC3=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT3))
                 avrINTx = 3
             elif interruptNum == 4:
-                self.avr.EICRB = (self.avr.EICRB & invert((1<<self.avr.ISC60) | (1<<self.avr.ISC61))) | (mode << self.avr.ISC60)
-                self.avr.EIMSK |= (1<<self.avr.INT6)
+                self.avr.update_fields("EICRB", ISC6=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT6))
                 avrINTx = 6
         elif self.avr.defined("EICRA") and self.avr.defined("EICRB") and self.avr.defined("EIMSK"):
             if interruptNum == 2:
-                self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC00) | (1 << self.avr.ISC01))) | (mode << self.avr.ISC00)
-                self.avr.EIMSK |= (1 << self.avr.INT0)
+                self.avr.update_fields("EICRA", ISC0=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT0))
                 avrINTx = 0
             elif interruptNum == 3:
-                self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC10) | (1 << self.avr.ISC11))) | (mode << self.avr.ISC10)
-                self.avr.EIMSK |= (1 << self.avr.INT1)
+                self.avr.update_fields("EICRA", ISC1=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT1))
                 avrINTx = 1
             elif interruptNum == 4:
-                self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC20) | (1 << self.avr.ISC21))) | (mode << self.avr.ISC20)
-                self.avr.EIMSK |= (1 << self.avr.INT2)
+                self.avr.update_fields("EICRA", ISC2=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT2))
                 avrINTx = 2
             elif interruptNum == 5:
-                self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC30) | (1 << self.avr.ISC31))) | (mode << self.avr.ISC30)
-                self.avr.EIMSK |= (1 << self.avr.INT3)
+                self.avr.update_fields("EICRA", ISC3=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT3))
                 avrINTx = 3
             elif interruptNum == 0:
-                self.avr.EICRB = (self.avr.EICRB & invert((1 << self.avr.ISC40) | (1 << self.avr.ISC41))) | (mode << self.avr.ISC40)
-                self.avr.EIMSK |= (1 << self.avr.INT4)
+                self.avr.update_fields("EICRB", ISC4=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT4))
                 avrINTx = 4
             elif interruptNum == 1:
-                self.avr.EICRB = (self.avr.EICRB & invert((1 << self.avr.ISC50) | (1 << self.avr.ISC51))) | (mode << self.avr.ISC50)
-                self.avr.EIMSK |= (1 << self.avr.INT5)
+                self.avr.update_fields("EICRB", ISC5=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT5))
                 avrINTx = 5
             elif interruptNum == 6:
-                self.avr.EICRB = (self.avr.EICRB & invert((1 << self.avr.ISC60) | (1 << self.avr.ISC61))) | (mode << self.avr.ISC60)
-                self.avr.EIMSK |= (1 << self.avr.INT6)
+                self.avr.update_fields("EICRB", ISC6=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT6))
                 avrINTx = 6
             elif interruptNum == 7:
-                self.avr.EICRB = (self.avr.EICRB & invert((1 << self.avr.ISC70) | (1 << self.avr.ISC71))) | (mode << self.avr.ISC70)
-                self.avr.EIMSK |= (1 << self.avr.INT7)
+                self.avr.update_fields("EICRB", ISC7=mode)
+                self.avr.set_bits("EIMSK", _BV(self.avr.INT7))
                 avrINTx = 7
         else:
             if interruptNum == 0:
                 if self.avr.defined("EICRA") and self.avr.defined("ISC00") and self.avr.defined("EIMSK"):
-                    self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC00) | (1 << self.avr.ISC01))) | (mode << self.avr.ISC00)
-                    self.avr.EIMSK |= (1 << self.avr.INT0)
+                    self.avr.update_fields("EICRA", ISC0=mode)
+                    self.avr.set_bits("EIMSK", _BV(self.avr.INT0))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC00") and self.avr.defined("GICR"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC00) | (1 << self.avr.ISC01))) | (mode << self.avr.ISC00)
-                    self.avr.GICR |= (1 << self.avr.INT0)
+                    self.avr.update_fields("MCUCR", ISC0=mode)
+                    self.avr.set_bits("GICR", _BV(self.avr.INT0))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC00") and self.avr.defined("GIMSK"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC00) | (1 << self.avr.ISC01))) | (mode << self.avr.ISC00)
-                    self.avr.GIMSK |= (1 << self.avr.INT0)
+                    self.avr.update_fields("MCUCR", ISC0=mode)
+                    self.avr.set_bits("GIMSK", _BV(self.avr.INT0))
                 else:
                     raise Exception("error attachInterrupt not finished for this CPU (if interruptNum == 0)")
                 avrINTx = 0
             
             if interruptNum == 1:
                 if self.avr.defined("EICRA") and self.avr.defined("ISC10") and self.avr.defined("ISC11") and self.avr.defined("EIMSK"):
-                    self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC10) | (1 << self.avr.ISC11))) | (mode << self.avr.ISC10)
-                    self.avr.EIMSK |= (1 << self.avr.INT1)
+                    self.avr.update_fields("EICRA", ISC1=mode)
+                    self.avr.set_bits("EIMSK", _BV(self.avr.INT1))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC10") and self.avr.defined("ISC11") and self.avr.defined("GICR"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC10) | (1 << self.avr.ISC11))) | (mode << self.avr.ISC10)
-                    self.avr.GICR |= (1 << self.avr.INT1)
+                    self.avr.update_fields("MCUCR", ISC1=mode)
+                    self.avr.set_bits("GICR", _BV(self.avr.INT1))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC10") and self.avr.defined("GIMSK") and self.avr.defined("GIMSK"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC10) | (1 << self.avr.ISC11))) | (mode << self.avr.ISC10)
-                    self.avr.GIMSK |= (1 << self.avr.INT1)
+                    self.avr.update_fields("MCUCR", ISC1=mode)
+                    self.avr.set_bits("GIMSK", _BV(self.avr.INT1))
                 else:
-                    raise Warning("warning attachself.avr.INTerrupt may need some more work for this cpu (case 1)")
+                    raise Warning("warning attachInterrupt may need some more work for this cpu (case 1)")
                 avrINTx = 1
             
-            if self.avr.INTerruptNum == 2:
+            if interruptNum == 2:
                 if self.avr.defined("EICRA") and self.avr.defined("ISC20") and self.avr.defined("ISC21") and self.avr.defined("EIMSK"):
-                    self.avr.EICRA = (self.avr.EICRA & invert((1 << self.avr.ISC20) | (1 << self.avr.ISC21))) | (mode << self.avr.ISC20)
-                    self.avr.EIMSK |= (1 << self.avr.INT2)
+                    self.avr.update_fields("EICRA", ISC2=mode)
+                    self.avr.set_bits("EIMSK", _BV(self.avr.INT2))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC20") and self.avr.defined("ISC21") and self.avr.defined("GICR"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC20) | (1 << self.avr.ISC21))) | (mode << self.avr.ISC20)
-                    self.avr.GICR |= (1 << self.avr.INT2)
+                    self.avr.update_fields("MCUCR", ISC2=mode)
+                    self.avr.set_bits("GICR", _BV(self.avr.INT2))
                 elif self.avr.defined("MCUCR") and self.avr.defined("ISC20") and self.avr.defined("GIMSK") and self.avr.defined("GIMSK"):
-                    self.avr.MCUCR = (self.avr.MCUCR & invert((1 << self.avr.ISC20) | (1 << self.avr.ISC21))) | (mode << self.avr.ISC20)
-                    self.avr.GIMSK |= (1 << self.avr.INT2)
+                    self.avr.update_fields("MCUCR", ISC2=mode)
+                    self.avr.set_bits("GIMSK", _BV(self.avr.INT2))
                 avrINTx = 2
 
         if (interruptNum < self.EXTERNAL_NUM_INTERRUPTS):
@@ -742,6 +843,9 @@ class Arduino:
 
     # Implementation from WInterrupts.c
     def detachInterrupt(self, interruptNum):
+
+        avrINTx = 0
+
         if (interruptNum < self.EXTERNAL_NUM_INTERRUPTS):
 
             # Disable the interrupt.  (We can't assume that interruptNum is equal
@@ -749,57 +853,77 @@ class Arduino:
             # ATmega8.  There, INT0 is 6 and INT1 is 7.)
 
             if self.avr.defined("__AVR_ATmega32U4__"):
-                if self.avr.INTerruptNum == 0:
-                    self.avr.EIMSK &= ~(1<<self.avr.INT0)
-                elif self.avr.INTerruptNum == 1:
-                    self.avr.EIMSK &= ~(1<<self.avr.INT1)
-                elif self.avr.INTerruptNum == 2:
-                    self.avr.EIMSK &= ~(1<<self.avr.INT2)
-                elif self.avr.INTerruptNum == 3:
-                    self.avr.EIMSK &= ~(1<<self.avr.INT3)
-                elif self.avr.INTerruptNum == 4:
-                    self.avr.EIMSK &= ~(1<<self.avr.INT6)
+                if interruptNum == 0:
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT0))
+                    avrINTx = 0
+                elif interruptNum == 1:
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT1))
+                    avrINTx = 1
+                elif interruptNum == 2:
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT2))
+                    avrINTx = 2
+                elif interruptNum == 3:
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT3))
+                    avrINTx = 3
+                elif interruptNum == 4:
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT6))
+                    avrINTx = 6
             elif self.avr.defined("EICRA") and self.avr.defined("EICRB") and self.avr.defined("EIMSK"):
                 if interruptNum == 2:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT0)                
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT0))                
+                    avrINTx = 0
                 elif interruptNum == 3:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT1)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT1))
+                    avrINTx = 1
                 elif interruptNum == 4:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT2)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT2))
+                    avrINTx = 2
                 elif interruptNum == 5:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT3)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT3))
+                    avrINTx = 3
                 elif interruptNum == 0:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT4)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT4))
+                    avrINTx = 4
                 elif interruptNum == 1:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT5)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT5))
+                    avrINTx = 5
                 elif interruptNum == 6:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT6)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT6))
+                    avrINTx = 6
                 elif interruptNum == 7:
-                    self.avr.EIMSK &= ~(1 << self.avr.INT7)
+                    self.avr.clear_bits("EIMSK", _BV(self.avr.INT7))
+                    avrINTx = 7
             else:
                 if interruptNum == 0:
                     if self.avr.defined("EIMSK") and self.avr.defined("INT0"):
-                        self.avr.EIMSK &= ~(1 << self.avr.INT0)
+                        self.avr.clear_bits("EIMSK", _BV(self.avr.INT0))
+                        avrINTx = 0
                     elif self.avr.defined("GICR") and self.avr.defined("ISC00"):
-                        self.avr.GICR &= ~(1 << self.avr.INT0) # atmega32
+                        self.avr.clear_bits("GICR", _BV(self.avr.INT0)) # atmega32
+                        avrINTx = 0
                     elif self.avr.defined("GIMSK") and self.avr.defined("INT0"):
-                        self.avr.GIMSK &= ~(1 << self.avr.INT0)
+                        self.avr.clear_bits("GIMSK", _BV(self.avr.INT0))
+                        avrINTx = 0
                     else:
                         raise Exception("error detachInterrupt not finished for this cpu")
                 elif interruptNum == 1:
                     if self.avr.defined("EIMSK") and self.avr.defined("INT1"):
-                        self.avr.EIMSK &= ~(1 << self.avr.INT1)
+                        self.avr.clear_bits("EIMSK", _BV(self.avr.INT1))
+                        avrINTx = 1
                     elif self.avr.defined("GICR") and self.avr.defined("INT1"):
-                        self.avr.GICR &= ~(1 << self.avr.INT1) # atmega32
+                        self.avr.clear_bits("GICR", _BV(self.avr.INT1)) # atmega32
+                        avrINTx = 1
                     elif self.avr.defined("GIMSK") and self.avr.defined("INT1"):
-                        self.avr.GIMSK &= ~(1 << self.avr.INT1)
+                        self.avr.clear_bits("GIMSK", _BV(self.avr.INT1))
+                        avrINTx = 1
                     else:
                         raise Warning("warning detachInterrupt may need some more work for this cpu (case 1)")
 
-        # Hook into AVR class callback system [samuelbr]
-        ind = self.avr._vector_indices["INT" + str(interruptNum) + "_vect"]
-        self.avr._vect[ind] = None
-        self.avr.disableInterrupt(ind)
+        if (interruptNum < self.EXTERNAL_NUM_INTERRUPTS):
+            # Hook into AVR class callback system [samuelbr]
+            ind = self.avr._vector_indices["INT" + str(avrINTx) + "_vect"]
+            self.avr._vect[ind] = None
+            self.avr.disableInterrupt(ind)
 
     def interrupts(self):
         self.avr.sei()
@@ -828,3 +952,15 @@ class Arduino:
     def portModeRegister(self, P):
         return self.board.port_to_mode_PGM[P]
 
+
+class Pin:
+
+    ## Construct a Pin, which holds what the pin functions need for one digital pin.
+    # Registers are (address, read_token, write_token) tuples from AVR._register().
+    def __init__(self, mask, mode, output, input, pwm_off, pwm):
+        self.mask = mask            # the pin's bit in its port registers
+        self.mode = mode            # DDRx
+        self.output = output        # PORTx
+        self.input = input          # PINx
+        self.pwm_off = pwm_off      # (TCCR register, COM bit mask) that disconnects the pin's timer, or None
+        self.pwm = pwm              # (TCCR register, COM mask to set, COM mask to clear, OCR register), or None
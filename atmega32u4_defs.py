@@ -0,0 +1,12 @@
+"""
+atmega32u4_defs.py
+Generated by defcache.py from "iom32u4.h", "portpins.h". Don't edit.
+"""
+
+SFR_IO8 = {'ACSR': 48, 'DDRB': 4, 'DDRC': 7, 'DDRD': 10, 'DDRE': 13, 'DDRF': 16, 'EEARH': 34, 'EEARL': 33, 'EECR': 31, 'EEDR': 32, 'EIFR': 28, 'EIMSK': 29, 'EIND': 60, 'GPIOR0': 30, 'GPIOR1': 42, 'GPIOR2': 43, 'GTCCR': 35, 'MCUCR': 53, 'MCUSR': 52, 'OCDR': 49, 'OCR0A': 39, 'OCR0B': 40, 'PCIFR': 27, 'PINB': 3, 'PINC': 6, 'PIND': 9, 'PINE': 12, 'PINF': 15, 'PLLCSR': 41, 'PLLFRQ': 50, 'PORTB': 5, 'PORTC': 8, 'PORTD': 11, 'PORTE': 14, 'PORTF': 17, 'RAMPZ': 59, 'SMCR': 51, 'SPCR': 44, 'SPDR': 46, 'SPMCSR': 55, 'SPSR': 45, 'TCCR0A': 36, 'TCCR0B': 37, 'TCNT0': 38, 'TIFR0': 21, 'TIFR1': 22, 'TIFR2': 23, 'TIFR3': 24, 'TIFR4': 25, 'TIFR5': 26}
+SFR_IO16 = {'EEAR': 33}
+SFR_MEM8 = {'ADCH': 121, 'ADCL': 120, 'ADCSRA': 122, 'ADCSRB': 123, 'ADMUX': 124, 'CLKPR': 97, 'CLKSEL0': 197, 'CLKSEL1': 198, 'CLKSTA': 199, 'DIDR0': 126, 'DIDR1': 127, 'DIDR2': 125, 'DT4': 212, 'EICRA': 105, 'EICRB': 106, 'ICR1H': 135, 'ICR1L': 134, 'ICR3H': 151, 'ICR3L': 150, 'OCR1AH': 137, 'OCR1AL': 136, 'OCR1BH': 139, 'OCR1BL': 138, 'OCR1CH': 141, 'OCR1CL': 140, 'OCR2A': 179, 'OCR2B': 180, 'OCR3AH': 153, 'OCR3AL': 152, 'OCR3BH': 155, 'OCR3BL': 154, 'OCR3CH': 157, 'OCR3CL': 156, 'OCR4A': 207, 'OCR4B': 208, 'OCR4C': 209, 'OCR4D': 210, 'OSCCAL': 102, 'OTGCON': 221, 'OTGIEN': 222, 'OTGINT': 223, 'OTGTCON': 249, 'PCICR': 104, 'PCMSK0': 107, 'PCMSK1': 108, 'PCMSK2': 109, 'PRR0': 100, 'PRR1': 101, 'RCCTRL': 103, 'TC4H': 191, 'TCCR1A': 128, 'TCCR1B': 129, 'TCCR1C': 130, 'TCCR2A': 176, 'TCCR2B': 177, 'TCCR3A': 144, 'TCCR3B': 145, 'TCCR3C': 146, 'TCCR4A': 192, 'TCCR4B': 193, 'TCCR4C': 194, 'TCCR4D': 195, 'TCCR4E': 196, 'TCNT1H': 133, 'TCNT1L': 132, 'TCNT2': 178, 'TCNT3H': 149, 'TCNT3L': 148, 'TCNT4H': 191, 'TCNT4L': 190, 'TIMSK0': 110, 'TIMSK1': 111, 'TIMSK2': 112, 'TIMSK3': 113, 'TIMSK4': 114, 'TIMSK5': 115, 'TWAMR': 189, 'TWAR': 186, 'TWBR': 184, 'TWCR': 188, 'TWDR': 187, 'TWSR': 185, 'UBRR1H': 205, 'UBRR1L': 204, 'UCSR1A': 200, 'UCSR1B': 201, 'UCSR1C': 202, 'UDADDR': 227, 'UDCON': 224, 'UDFNUMH': 229, 'UDFNUML': 228, 'UDIEN': 226, 'UDINT': 225, 'UDMFN': 230, 'UDR1': 206, 'UDTST': 231, 'UEBCHX': 243, 'UEBCLX': 242, 'UECFG0X': 236, 'UECFG1X': 237, 'UECONX': 235, 'UEDATX': 241, 'UEIENX': 240, 'UEINT': 244, 'UEINTX': 232, 'UENUM': 233, 'UERST': 234, 'UESTA0X': 238, 'UESTA1X': 239, 'UHADDR': 161, 'UHCON': 158, 'UHFLEN': 164, 'UHFNUMH': 163, 'UHFNUML': 162, 'UHIEN': 160, 'UHINT': 159, 'UHWCON': 215, 'UPBCHX': 247, 'UPBCLX': 246, 'UPCFG0X': 170, 'UPCFG1X': 171, 'UPCFG2X': 173, 'UPCONX': 169, 'UPDATX': 175, 'UPERRX': 245, 'UPIENX': 174, 'UPINRQX': 165, 'UPINT': 248, 'UPINTX': 166, 'UPNUM': 167, 'UPRST': 168, 'UPSTAX': 172, 'USBCON': 216, 'USBINT': 218, 'USBSTA': 217, 'WDTCSR': 96}
+SFR_MEM16 = {'ADC': 120, 'ICR1': 134, 'ICR3': 150, 'OCR1A': 136, 'OCR1B': 138, 'OCR1C': 140, 'OCR3A': 152, 'OCR3B': 154, 'OCR3C': 156, 'TCNT1': 132, 'TCNT3': 148, 'TCNT4': 190, 'UBRR1': 204, 'UDFNUM': 228, 'UEBCX': 242, 'UHFNUM': 162}
+constants = {'ACBG': 6, 'ACD': 7, 'ACI': 4, 'ACIC': 2, 'ACIE': 3, 'ACIS0': 0, 'ACIS1': 1, 'ACME': 6, 'ACO': 5, 'ADATE': 5, 'ADC0D': 0, 'ADC10D': 2, 'ADC11D': 3, 'ADC12D': 4, 'ADC13D': 5, 'ADC1D': 1, 'ADC2D': 2, 'ADC3D': 3, 'ADC4D': 4, 'ADC5D': 5, 'ADC6D': 6, 'ADC7D': 7, 'ADC8D': 0, 'ADC9D': 1, 'ADCH0': 0, 'ADCH1': 1, 'ADCH2': 2, 'ADCH3': 3, 'ADCH4': 4, 'ADCH5': 5, 'ADCH6': 6, 'ADCH7': 7, 'ADCL0': 0, 'ADCL1': 1, 'ADCL2': 2, 'ADCL3': 3, 'ADCL4': 4, 'ADCL5': 5, 'ADCL6': 6, 'ADCL7': 7, 'ADDEN': 7, 'ADEN': 7, 'ADHSM': 7, 'ADIE': 3, 'ADIF': 4, 'ADLAR': 5, 'ADPS0': 0, 'ADPS1': 1, 'ADPS2': 2, 'ADSC': 6, 'ADTS0': 0, 'ADTS1': 1, 'ADTS2': 2, 'ADTS3': 4, 'AIN0D': 0, 'AIN1D': 1, 'ALLOC': 1, 'BLBSET': 3, 'BORF': 2, 'BYCT0': 0, 'BYCT1': 1, 'BYCT2': 2, 'BYCT3': 3, 'BYCT4': 4, 'BYCT5': 5, 'BYCT6': 6, 'BYCT7': 7, 'CAL0': 0, 'CAL1': 1, 'CAL2': 2, 'CAL3': 3, 'CAL4': 4, 'CAL5': 5, 'CAL6': 6, 'CAL7': 7, 'CFGOK': 7, 'CLKPCE': 7, 'CLKPS0': 0, 'CLKPS1': 1, 'CLKPS2': 2, 'CLKPS3': 3, 'CLKS': 0, 'COM0A0': 6, 'COM0A1': 7, 'COM0B0': 4, 'COM0B1': 5, 'COM1A0': 6, 'COM1A1': 7, 'COM1B0': 4, 'COM1B1': 5, 'COM1C0': 2, 'COM1C1': 3, 'COM2A0': 6, 'COM2A1': 7, 'COM2B0': 4, 'COM2B1': 5, 'COM3A0': 6, 'COM3A1': 7, 'COM3B0': 4, 'COM3B1': 5, 'COM3C0': 2, 'COM3C1': 3, 'COM4A0': 6, 'COM4A0S': 6, 'COM4A1': 7, 'COM4A1S': 7, 'COM4B0': 4, 'COM4B0S': 4, 'COM4B1': 5, 'COM4B1S': 5, 'COM4D0': 2, 'COM4D1': 3, 'CPHA': 2, 'CPOL': 3, 'CS00': 0, 'CS01': 1, 'CS02': 2, 'CS10': 0, 'CS11': 1, 'CS12': 2, 'CS20': 0, 'CS21': 1, 'CS22': 2, 'CS30': 0, 'CS31': 1, 'CS32': 2, 'CS40': 0, 'CS41': 1, 'CS42': 2, 'CS43': 3, 'CTRLDIR': 2, 'CURRBK0': 0, 'CURRBK1': 1, 'DAT0': 0, 'DAT1': 1, 'DAT2': 2, 'DAT3': 3, 'DAT4': 4, 'DAT5': 5, 'DAT6': 6, 'DAT7': 7, 'DDB0': 0, 'DDB1': 1, 'DDB2': 2, 'DDB3': 3, 'DDB4': 4, 'DDB5': 5, 'DDB6': 6, 'DDB7': 7, 'DDC6': 6, 'DDC7': 7, 'DDD0': 0, 'DDD1': 1, 'DDD2': 2, 'DDD3': 3, 'DDD4': 4, 'DDD5': 5, 'DDD6': 6, 'DDD7': 7, 'DDE2': 2, 'DDE6': 6, 'DDF0': 0, 'DDF1': 1, 'DDF4': 4, 'DDF5': 5, 'DDF6': 6, 'DDF7': 7, 'DETACH': 0, 'DOR1': 3, 'DORD': 5, 'DT4L0': 0, 'DT4L1': 1, 'DT4L2': 2, 'DT4L3': 3, 'DT4L4': 4, 'DT4L5': 5, 'DT4L6': 6, 'DT4L7': 7, 'DTPS40': 4, 'DTPS41': 5, 'DTSEQ0': 2, 'DTSEQ1': 3, 'EEAR0': 0, 'EEAR1': 1, 'EEAR10': 2, 'EEAR11': 3, 'EEAR2': 2, 'EEAR3': 3, 'EEAR4': 4, 'EEAR5': 5, 'EEAR6': 6, 'EEAR7': 7, 'EEAR8': 0, 'EEAR9': 1, 'EEDR0': 0, 'EEDR1': 1, 'EEDR2': 2, 'EEDR3': 3, 'EEDR4': 4, 'EEDR5': 5, 'EEDR6': 6, 'EEDR7': 7, 'EEMPE': 2, 'EEPE': 1, 'EEPM0': 4, 'EEPM1': 5, 'EERE': 0, 'EERIE': 3, 'EIND0': 0, 'ENHC4': 6, 'EORSME': 5, 'EORSMI': 5, 'EORSTE': 3, 'EORSTI': 3, 'EPBK0': 2, 'EPBK1': 3, 'EPDIR': 0, 'EPEN': 0, 'EPINT0': 0, 'EPINT1': 1, 'EPINT2': 2, 'EPINT3': 3, 'EPINT4': 4, 'EPINT5': 5, 'EPINT6': 6, 'EPRST0': 0, 'EPRST1': 1, 'EPRST2': 2, 'EPRST3': 3, 'EPRST4': 4, 'EPRST5': 5, 'EPRST6': 6, 'EPSIZE0': 4, 'EPSIZE1': 5, 'EPSIZE2': 6, 'EPTYPE0': 6, 'EPTYPE1': 7, 'EXCKSEL0': 0, 'EXCKSEL1': 1, 'EXCKSEL2': 2, 'EXCKSEL3': 3, 'EXSUT0': 4, 'EXSUT1': 5, 'EXTE': 2, 'EXTON': 0, 'EXTRF': 1, 'FE1': 4, 'FIFOCON': 7, 'FLERRE': 7, 'FNCERR': 4, 'FNUM0': 0, 'FNUM1': 1, 'FNUM10': 2, 'FNUM2': 2, 'FNUM3': 3, 'FNUM4': 4, 'FNUM5': 5, 'FNUM6': 6, 'FNUM7': 7, 'FNUM8': 0, 'FNUM9': 1, 'FOC0A': 7, 'FOC0B': 6, 'FOC1A': 7, 'FOC1B': 6, 'FOC1C': 5, 'FOC2A': 7, 'FOC2B': 6, 'FOC3A': 7, 'FOC3B': 6, 'FOC3C': 5, 'FOC4A': 3, 'FOC4B': 2, 'FOC4D': 1, 'FPAC4': 3, 'FPEN4': 6, 'FPES4': 4, 'FPF4': 2, 'FPIE4': 7, 'FPNC4': 5, 'FRZCLK': 5, 'FUSE_MEMORY_SIZE': 3, 'GPIOR00': 0, 'GPIOR01': 1, 'GPIOR02': 2, 'GPIOR03': 3, 'GPIOR04': 4, 'GPIOR05': 5, 'GPIOR06': 6, 'GPIOR07': 7, 'GPIOR10': 0, 'GPIOR11': 1, 'GPIOR12': 2, 'GPIOR13': 3, 'GPIOR14': 4, 'GPIOR15': 5, 'GPIOR16': 6, 'GPIOR17': 7, 'GPIOR20': 0, 'GPIOR21': 1, 'GPIOR22': 2, 'GPIOR23': 3, 'GPIOR24': 4, 'GPIOR25': 5, 'GPIOR26': 6, 'GPIOR27': 7, 'ICES1': 6, 'ICES3': 6, 'ICF1': 5, 'ICF3': 5, 'ICIE1': 5, 'ICIE3': 5, 'ICNC1': 7, 'ICNC3': 7, 'ICR1H0': 0, 'ICR1H1': 1, 'ICR1H2': 2, 'ICR1H3': 3, 'ICR1H4': 4, 'ICR1H5': 5, 'ICR1H6': 6, 'ICR1H7': 7, 'ICR1L0': 0, 'ICR1L1': 1, 'ICR1L2': 2, 'ICR1L3': 3, 'ICR1L4': 4, 'ICR1L5': 5, 'ICR1L6': 6, 'ICR1L7': 7, 'ICR3H0': 0, 'ICR3H1': 1, 'ICR3H2': 2, 'ICR3H3': 3, 'ICR3H4': 4, 'ICR3H5': 5, 'ICR3H6': 6, 'ICR3H7': 7, 'ICR3L0': 0, 'ICR3L1': 1, 'ICR3L2': 2, 'ICR3L3': 3, 'ICR3L4': 4, 'ICR3L5': 5, 'ICR3L6': 6, 'ICR3L7': 7, 'INT0': 0, 'INT1': 1, 'INT2': 2, 'INT3': 3, 'INT4': 4, 'INT5': 5, 'INT6': 6, 'INT7': 7, 'INTF0': 0, 'INTF1': 1, 'INTF2': 2, 'INTF3': 3, 'INTF4': 4, 'INTF5': 5, 'INTF6': 6, 'INTF7': 7, 'ISC00': 0, 'ISC01': 1, 'ISC10': 2, 'ISC11': 3, 'ISC20': 4, 'ISC21': 5, 'ISC30': 6, 'ISC31': 7, 'ISC40': 0, 'ISC41': 1, 'ISC50': 2, 'ISC51': 3, 'ISC60': 4, 'ISC61': 5, 'ISC70': 6, 'ISC71': 7, 'IVCE': 0, 'IVSEL': 1, 'JTD': 7, 'JTRF': 4, 'LSM': 2, 'MPCM1': 0, 'MSTR': 4, 'MUX0': 0, 'MUX1': 1, 'MUX2': 2, 'MUX3': 3, 'MUX4': 4, 'MUX5': 5, 'NAKINE': 6, 'NAKINI': 6, 'NAKOUTE': 4, 'NAKOUTI': 4, 'NBUSYBK0': 0, 'NBUSYBK1': 1, 'OC4OE0': 0, 'OC4OE1': 1, 'OC4OE2': 2, 'OC4OE3': 3, 'OC4OE4': 4, 'OC4OE5': 5, 'OCDR0': 0, 'OCDR1': 1, 'OCDR2': 2, 'OCDR3': 3, 'OCDR4': 4, 'OCDR5': 5, 'OCDR6': 6, 'OCDR7': 7, 'OCF0A': 1, 'OCF0B': 2, 'OCF1A': 1, 'OCF1B': 2, 'OCF1C': 3, 'OCF2A': 1, 'OCF2B': 2, 'OCF3A': 1, 'OCF3B': 2, 'OCF3C': 3, 'OCF4A': 6, 'OCF4B': 5, 'OCF4D': 7, 'OCIE0A': 1, 'OCIE0B': 2, 'OCIE1A': 1, 'OCIE1B': 2, 'OCIE1C': 3, 'OCIE2A': 1, 'OCIE2B': 2, 'OCIE3A': 1, 'OCIE3B': 2, 'OCIE3C': 3, 'OCIE4A': 6, 'OCIE4B': 5, 'OCIE4D': 7, 'OCR0A_0': 0, 'OCR0A_1': 1, 'OCR0A_2': 2, 'OCR0A_3': 3, 'OCR0A_4': 4, 'OCR0A_5': 5, 'OCR0A_6': 6, 'OCR0A_7': 7, 'OCR0B_0': 0, 'OCR0B_1': 1, 'OCR0B_2': 2, 'OCR0B_3': 3, 'OCR0B_4': 4, 'OCR0B_5': 5, 'OCR0B_6': 6, 'OCR0B_7': 7, 'OCR1AH0': 0, 'OCR1AH1': 1, 'OCR1AH2': 2, 'OCR1AH3': 3, 'OCR1AH4': 4, 'OCR1AH5': 5, 'OCR1AH6': 6, 'OCR1AH7': 7, 'OCR1AL0': 0, 'OCR1AL1': 1, 'OCR1AL2': 2, 'OCR1AL3': 3, 'OCR1AL4': 4, 'OCR1AL5': 5, 'OCR1AL6': 6, 'OCR1AL7': 7, 'OCR1BH0': 0, 'OCR1BH1': 1, 'OCR1BH2': 2, 'OCR1BH3': 3, 'OCR1BH4': 4, 'OCR1BH5': 5, 'OCR1BH6': 6, 'OCR1BH7': 7, 'OCR1BL0': 0, 'OCR1BL1': 1, 'OCR1BL2': 2, 'OCR1BL3': 3, 'OCR1BL4': 4, 'OCR1BL5': 5, 'OCR1BL6': 6, 'OCR1BL7': 7, 'OCR1CH0': 0, 'OCR1CH1': 1, 'OCR1CH2': 2, 'OCR1CH3': 3, 'OCR1CH4': 4, 'OCR1CH5': 5, 'OCR1CH6': 6, 'OCR1CH7': 7, 'OCR1CL0': 0, 'OCR1CL1': 1, 'OCR1CL2': 2, 'OCR1CL3': 3, 'OCR1CL4': 4, 'OCR1CL5': 5, 'OCR1CL6': 6, 'OCR1CL7': 7, 'OCR2_0': 0, 'OCR2_1': 1, 'OCR2_2': 2, 'OCR2_3': 3, 'OCR2_4': 4, 'OCR2_5': 5, 'OCR2_6': 6, 'OCR2_7': 7, 'OCR3AH0': 0, 'OCR3AH1': 1, 'OCR3AH2': 2, 'OCR3AH3': 3, 'OCR3AH4': 4, 'OCR3AH5': 5, 'OCR3AH6': 6, 'OCR3AH7': 7, 'OCR3AL0': 0, 'OCR3AL1': 1, 'OCR3AL2': 2, 'OCR3AL3': 3, 'OCR3AL4': 4, 'OCR3AL5': 5, 'OCR3AL6': 6, 'OCR3AL7': 7, 'OCR3BH0': 0, 'OCR3BH1': 1, 'OCR3BH2': 2, 'OCR3BH3': 3, 'OCR3BH4': 4, 'OCR3BH5': 5, 'OCR3BH6': 6, 'OCR3BH7': 7, 'OCR3BL0': 0, 'OCR3BL1': 1, 'OCR3BL2': 2, 'OCR3BL3': 3, 'OCR3BL4': 4, 'OCR3BL5': 5, 'OCR3BL6': 6, 'OCR3BL7': 7, 'OCR3CH0': 0, 'OCR3CH1': 1, 'OCR3CH2': 2, 'OCR3CH3': 3, 'OCR3CH4': 4, 'OCR3CH5': 5, 'OCR3CH6': 6, 'OCR3CH7': 7, 'OCR3CL0': 0, 'OCR3CL1': 1, 'OCR3CL2': 2, 'OCR3CL3': 3, 'OCR3CL4': 4, 'OCR3CL5': 5, 'OCR3CL6': 6, 'OCR3CL7': 7, 'OCR4A0': 0, 'OCR4A1': 1, 'OCR4A2': 2, 'OCR4A3': 3, 'OCR4A4': 4, 'OCR4A5': 5, 'OCR4A6': 6, 'OCR4A7': 7, 'OCR4B0': 0, 'OCR4B1': 1, 'OCR4B2': 2, 'OCR4B3': 3, 'OCR4B4': 4, 'OCR4B5': 5, 'OCR4B6': 6, 'OCR4B7': 7, 'OCR4C0': 0, 'OCR4C1': 1, 'OCR4C2': 2, 'OCR4C3': 3, 'OCR4C4': 4, 'OCR4C5': 5, 'OCR4C6': 6, 'OCR4C7': 7, 'OCR4D0': 0, 'OCR4D1': 1, 'OCR4D2': 2, 'OCR4D3': 3, 'OCR4D4': 4, 'OCR4D5': 5, 'OCR4D6': 6, 'OCR4D7': 7, 'OTGPADE': 4, 'OVERFI': 6, 'PCIE0': 0, 'PCIF0': 0, 'PCINT0': 0, 'PCINT1': 1, 'PCINT2': 2, 'PCINT3': 3, 'PCINT4': 4, 'PCINT5': 5, 'PCINT6': 6, 'PCINT7': 7, 'PDIV0': 0, 'PDIV1': 1, 'PDIV2': 2, 'PDIV3': 3, 'PGERS': 1, 'PGWRT': 2, 'PINB0': 0, 'PINB1': 1, 'PINB2': 2, 'PINB3': 3, 'PINB4': 4, 'PINB5': 5, 'PINB6': 6, 'PINB7': 7, 'PINC6': 6, 'PINC7': 7, 'PIND0': 0, 'PIND1': 1, 'PIND2': 2, 'PIND3': 3, 'PIND4': 4, 'PIND5': 5, 'PIND6': 6, 'PIND7': 7, 'PINDIV': 4, 'PINE2': 2, 'PINE6': 6, 'PINF0': 0, 'PINF1': 1, 'PINF4': 4, 'PINF5': 5, 'PINF6': 6, 'PINF7': 7, 'PINMUX': 7, 'PLLE': 1, 'PLLTM0': 4, 'PLLTM1': 5, 'PLLUSB': 6, 'PLOCK': 0, 'PORF': 0, 'PORTB0': 0, 'PORTB1': 1, 'PORTB2': 2, 'PORTB3': 3, 'PORTB4': 4, 'PORTB5': 5, 'PORTB6': 6, 'PORTB7': 7, 'PORTC6': 6, 'PORTC7': 7, 'PORTD0': 0, 'PORTD1': 1, 'PORTD2': 2, 'PORTD3': 3, 'PORTD4': 4, 'PORTD5': 5, 'PORTD6': 6, 'PORTD7': 7, 'PORTE2': 2, 'PORTE6': 6, 'PORTF0': 0, 'PORTF1': 1, 'PORTF4': 4, 'PORTF5': 5, 'PORTF6': 6, 'PORTF7': 7, 'PRADC': 0, 'PRSPI': 2, 'PRTIM0': 5, 'PRTIM1': 3, 'PRTIM2': 6, 'PRTIM3': 3, 'PRTWI': 7, 'PRUSART0': 1, 'PRUSART1': 0, 'PRUSB': 7, 'PSR4': 6, 'PSRASY': 1, 'PSRSYNC': 0, 'PUD': 4, 'PWM4A': 1, 'PWM4B': 0, 'PWM4D': 0, 'PWM4X': 7, 'RAMPZ0': 0, 'RCCKSEL0': 4, 'RCCKSEL1': 5, 'RCCKSEL2': 6, 'RCCKSEL3': 7, 'RCE': 3, 'RCFREQ': 0, 'RCON': 1, 'RCSUT0': 6, 'RCSUT1': 7, 'REFS0': 6, 'REFS1': 7, 'RMWKUP': 1, 'RSTCPU': 3, 'RSTDT': 3, 'RWAL': 5, 'RWWSB': 6, 'RWWSRE': 4, 'RXB81': 1, 'RXC1': 7, 'RXCIE1': 7, 'RXEN1': 4, 'RXOUTE': 2, 'RXOUTI': 2, 'RXSTPE': 3, 'RXSTPI': 3, 'SE': 0, 'SIGNATURE_0': 30, 'SIGNATURE_1': 149, 'SIGNATURE_2': 135, 'SIGRD': 5, 'SM0': 1, 'SM1': 2, 'SM2': 3, 'SOFE': 2, 'SOFI': 2, 'SPDR0': 0, 'SPDR1': 1, 'SPDR2': 2, 'SPDR3': 3, 'SPDR4': 4, 'SPDR5': 5, 'SPDR6': 6, 'SPDR7': 7, 'SPE': 6, 'SPEED': 3, 'SPI2X': 0, 'SPIE': 7, 'SPIF': 7, 'SPMEN': 0, 'SPMIE': 7, 'SPR0': 0, 'SPR1': 1, 'STALLEDE': 1, 'STALLEDI': 1, 'STALLRQ': 5, 'STALLRQC': 4, 'SUSPE': 0, 'SUSPI': 0, 'TC40': 0, 'TC41': 1, 'TC410': 2, 'TC42': 2, 'TC43': 3, 'TC44': 4, 'TC45': 5, 'TC46': 6, 'TC47': 7, 'TC48': 0, 'TC49': 1, 'TCNT0_0': 0, 'TCNT0_1': 1, 'TCNT0_2': 2, 'TCNT0_3': 3, 'TCNT0_4': 4, 'TCNT0_5': 5, 'TCNT0_6': 6, 'TCNT0_7': 7, 'TCNT1H0': 0, 'TCNT1H1': 1, 'TCNT1H2': 2, 'TCNT1H3': 3, 'TCNT1H4': 4, 'TCNT1H5': 5, 'TCNT1H6': 6, 'TCNT1H7': 7, 'TCNT1L0': 0, 'TCNT1L1': 1, 'TCNT1L2': 2, 'TCNT1L3': 3, 'TCNT1L4': 4, 'TCNT1L5': 5, 'TCNT1L6': 6, 'TCNT1L7': 7, 'TCNT2_0': 0, 'TCNT2_1': 1, 'TCNT2_2': 2, 'TCNT2_3': 3, 'TCNT2_4': 4, 'TCNT2_5': 5, 'TCNT2_6': 6, 'TCNT2_7': 7, 'TCNT3H0': 0, 'TCNT3H1': 1, 'TCNT3H2': 2, 'TCNT3H3': 3, 'TCNT3H4': 4, 'TCNT3H5': 5, 'TCNT3H6': 6, 'TCNT3H7': 7, 'TCNT3L0': 0, 'TCNT3L1': 1, 'TCNT3L2': 2, 'TCNT3L3': 3, 'TCNT3L4': 4, 'TCNT3L5': 5, 'TCNT3L6': 6, 'TCNT3L7': 7, 'TLOCK4': 7, 'TOIE0': 0, 'TOIE1': 0, 'TOIE2': 0, 'TOIE3': 0, 'TOIE4': 2, 'TOV0': 0, 'TOV1': 0, 'TOV2': 0, 'TOV3': 0, 'TOV4': 2, 'TSM': 7, 'TWA0': 1, 'TWA1': 2, 'TWA2': 3, 'TWA3': 4, 'TWA4': 5, 'TWA5': 6, 'TWA6': 7, 'TWAM0': 1, 'TWAM1': 2, 'TWAM2': 3, 'TWAM3': 4, 'TWAM4': 5, 'TWAM5': 6, 'TWAM6': 7, 'TWBR0': 0, 'TWBR1': 1, 'TWBR2': 2, 'TWBR3': 3, 'TWBR4': 4, 'TWBR5': 5, 'TWBR6': 6, 'TWBR7': 7, 'TWD0': 0, 'TWD1': 1, 'TWD2': 2, 'TWD3': 3, 'TWD4': 4, 'TWD5': 5, 'TWD6': 6, 'TWD7': 7, 'TWEA': 6, 'TWEN': 2, 'TWGCE': 0, 'TWIE': 0, 'TWINT': 7, 'TWPS0': 0, 'TWPS1': 1, 'TWS3': 3, 'TWS4': 4, 'TWS5': 5, 'TWS6': 6, 'TWS7': 7, 'TWSTA': 5, 'TWSTO': 4, 'TWWC': 3, 'TXB81': 0, 'TXC1': 6, 'TXCIE1': 6, 'TXEN1': 3, 'TXINE': 0, 'TXINI': 0, 'U2X1': 1, 'UADD0': 0, 'UADD1': 1, 'UADD2': 2, 'UADD3': 3, 'UADD4': 4, 'UADD5': 5, 'UADD6': 6, 'UCPOL1': 0, 'UCSZ10': 1, 'UCSZ11': 2, 'UCSZ12': 2, 'UDR1_0': 0, 'UDR1_1': 1, 'UDR1_2': 2, 'UDR1_3': 3, 'UDR1_4': 4, 'UDR1_5': 5, 'UDR1_6': 6, 'UDR1_7': 7, 'UDRE1': 5, 'UDRIE1': 5, 'UENUM_0': 0, 'UENUM_1': 1, 'UENUM_2': 2, 'UMSEL10': 6, 'UMSEL11': 7, 'UNDERFI': 5, 'UPE1': 2, 'UPM10': 4, 'UPM11': 5, 'UPRSME': 6, 'UPRSMI': 6, 'USBE': 7, 'USBS1': 3, 'UVREGE': 0, 'VBUS': 0, 'VBUSTE': 0, 'VBUSTI': 0, 'WAKEUPE': 4, 'WAKEUPI': 4, 'WCOL': 6, 'WDCE': 4, 'WDE': 3, 'WDIE': 6, 'WDIF': 7, 'WDP0': 0, 'WDP1': 1, 'WDP2': 2, 'WDP3': 5, 'WDRF': 3, 'WGM00': 0, 'WGM01': 1, 'WGM02': 3, 'WGM10': 0, 'WGM11': 1, 'WGM12': 3, 'WGM13': 4, 'WGM20': 0, 'WGM21': 1, 'WGM22': 3, 'WGM30': 0, 'WGM31': 1, 'WGM32': 3, 'WGM33': 4, 'WGM40': 0, 'WGM41': 1, '_AVR_IOM32U4_H_': 1, '_AVR_PORTPINS_H_': 1, '__BOOT_LOCK_BITS_0_EXIST': None, '__BOOT_LOCK_BITS_1_EXIST': None, '__LOCK_BITS_EXIST': None}
+vector_indices = {'ADC_vect': 29, 'ANALOG_COMP_vect': 28, 'EE_READY_vect': 30, 'INT0_vect': 1, 'INT1_vect': 2, 'INT2_vect': 3, 'INT3_vect': 4, 'INT6_vect': 7, 'PCINT0_vect': 9, 'SPI_STC_vect': 24, 'SPM_READY_vect': 37, 'TIMER0_COMPA_vect': 21, 'TIMER0_COMPB_vect': 22, 'TIMER0_OVF_vect': 23, 'TIMER1_CAPT_vect': 16, 'TIMER1_COMPA_vect': 17, 'TIMER1_COMPB_vect': 18, 'TIMER1_COMPC_vect': 19, 'TIMER1_OVF_vect': 20, 'TIMER3_CAPT_vect': 31, 'TIMER3_COMPA_vect': 32, 'TIMER3_COMPB_vect': 33, 'TIMER3_COMPC_vect': 34, 'TIMER3_OVF_vect': 35, 'TIMER4_COMPA_vect': 38, 'TIMER4_COMPB_vect': 39, 'TIMER4_COMPD_vect': 40, 'TIMER4_FPF_vect': 42, 'TIMER4_OVF_vect': 41, 'TWI_vect': 36, 'USART1_RX_vect': 25, 'USART1_TX_vect': 27, 'USART1_UDRE_vect': 26, 'USB_COM_vect': 11, 'USB_GEN_vect': 10, 'WDT_vect': 12}
+register_bits = {'ACSR': {'ACIS0': 0, 'ACIS1': 1, 'ACIC': 2, 'ACIE': 3, 'ACI': 4, 'ACO': 5, 'ACBG': 6, 'ACD': 7}, 'ADCH': {'ADCH0': 0, 'ADCH1': 1, 'ADCH2': 2, 'ADCH3': 3, 'ADCH4': 4, 'ADCH5': 5, 'ADCH6': 6, 'ADCH7': 7}, 'ADCL': {'ADCL0': 0, 'ADCL1': 1, 'ADCL2': 2, 'ADCL3': 3, 'ADCL4': 4, 'ADCL5': 5, 'ADCL6': 6, 'ADCL7': 7}, 'ADCSRA': {'ADPS0': 0, 'ADPS1': 1, 'ADPS2': 2, 'ADIE': 3, 'ADIF': 4, 'ADATE': 5, 'ADSC': 6, 'ADEN': 7}, 'ADCSRB': {'ADTS0': 0, 'ADTS1': 1, 'ADTS2': 2, 'ADTS3': 4, 'MUX5': 5, 'ACME': 6, 'ADHSM': 7}, 'ADMUX': {'MUX0': 0, 'MUX1': 1, 'MUX2': 2, 'MUX3': 3, 'MUX4': 4, 'ADLAR': 5, 'REFS0': 6, 'REFS1': 7}, 'CLKPR': {'CLKPS0': 0, 'CLKPS1': 1, 'CLKPS2': 2, 'CLKPS3': 3, 'CLKPCE': 7}, 'CLKSEL0': {'CLKS': 0, 'EXTE': 2, 'RCE': 3, 'EXSUT0': 4, 'EXSUT1': 5, 'RCSUT0': 6, 'RCSUT1': 7}, 'CLKSEL1': {'EXCKSEL0': 0, 'EXCKSEL1': 1, 'EXCKSEL2': 2, 'EXCKSEL3': 3, 'RCCKSEL0': 4, 'RCCKSEL1': 5, 'RCCKSEL2': 6, 'RCCKSEL3': 7}, 'CLKSTA': {'EXTON': 0, 'RCON': 1}, 'DDRB': {'DDB0': 0, 'DDB1': 1, 'DDB2': 2, 'DDB3': 3, 'DDB4': 4, 'DDB5': 5, 'DDB6': 6, 'DDB7': 7}, 'DDRC': {'DDC6': 6, 'DDC7': 7}, 'DDRD': {'DDD0': 0, 'DDD1': 1, 'DDD2': 2, 'DDD3': 3, 'DDD4': 4, 'DDD5': 5, 'DDD6': 6, 'DDD7': 7}, 'DDRE': {'DDE2': 2, 'DDE6': 6}, 'DDRF': {'DDF0': 0, 'DDF1': 1, 'DDF4': 4, 'DDF5': 5, 'DDF6': 6, 'DDF7': 7}, 'DIDR0': {'ADC0D': 0, 'ADC1D': 1, 'ADC2D': 2, 'ADC3D': 3, 'ADC4D': 4, 'ADC5D': 5, 'ADC6D': 6, 'ADC7D': 7}, 'DIDR1': {'AIN0D': 0, 'AIN1D': 1}, 'DIDR2': {'ADC8D': 0, 'ADC9D': 1, 'ADC10D': 2, 'ADC11D': 3, 'ADC12D': 4, 'ADC13D': 5}, 'DT4': {'DT4L0': 0, 'DT4L1': 1, 'DT4L2': 2, 'DT4L3': 3, 'DT4L4': 4, 'DT4L5': 5, 'DT4L6': 6, 'DT4L7': 7}, 'EEARH': {'EEAR8': 0, 'EEAR9': 1, 'EEAR10': 2, 'EEAR11': 3}, 'EEARL': {'EEAR0': 0, 'EEAR1': 1, 'EEAR2': 2, 'EEAR3': 3, 'EEAR4': 4, 'EEAR5': 5, 'EEAR6': 6, 'EEAR7': 7}, 'EECR': {'EERE': 0, 'EEPE': 1, 'EEMPE': 2, 'EERIE': 3, 'EEPM0': 4, 'EEPM1': 5}, 'EEDR': {'EEDR0': 0, 'EEDR1': 1, 'EEDR2': 2, 'EEDR3': 3, 'EEDR4': 4, 'EEDR5': 5, 'EEDR6': 6, 'EEDR7': 7}, 'EICRA': {'ISC00': 0, 'ISC01': 1, 'ISC10': 2, 'ISC11': 3, 'ISC20': 4, 'ISC21': 5, 'ISC30': 6, 'ISC31': 7}, 'EICRB': {'ISC40': 0, 'ISC41': 1, 'ISC50': 2, 'ISC51': 3, 'ISC60': 4, 'ISC61': 5, 'ISC70': 6, 'ISC71': 7}, 'EIFR': {'INTF0': 0, 'INTF1': 1, 'INTF2': 2, 'INTF3': 3, 'INTF4': 4, 'INTF5': 5, 'INTF6': 6, 'INTF7': 7}, 'EIMSK': {'INT0': 0, 'INT1': 1, 'INT2': 2, 'INT3': 3, 'INT4': 4, 'INT5': 5, 'INT6': 6, 'INT7': 7}, 'EIND': {'EIND0': 0}, 'GPIOR0': {'GPIOR00': 0, 'GPIOR01': 1, 'GPIOR02': 2, 'GPIOR03': 3, 'GPIOR04': 4, 'GPIOR05': 5, 'GPIOR06': 6, 'GPIOR07': 7}, 'GPIOR1': {'GPIOR10': 0, 'GPIOR11': 1, 'GPIOR12': 2, 'GPIOR13': 3, 'GPIOR14': 4, 'GPIOR15': 5, 'GPIOR16': 6, 'GPIOR17': 7}, 'GPIOR2': {'GPIOR20': 0, 'GPIOR21': 1, 'GPIOR22': 2, 'GPIOR23': 3, 'GPIOR24': 4, 'GPIOR25': 5, 'GPIOR26': 6, 'GPIOR27': 7}, 'GTCCR': {'PSRSYNC': 0, 'PSRASY': 1, 'TSM': 7}, 'ICR1H': {'ICR1H0': 0, 'ICR1H1': 1, 'ICR1H2': 2, 'ICR1H3': 3, 'ICR1H4': 4, 'ICR1H5': 5, 'ICR1H6': 6, 'ICR1H7': 7}, 'ICR1L': {'ICR1L0': 0, 'ICR1L1': 1, 'ICR1L2': 2, 'ICR1L3': 3, 'ICR1L4': 4, 'ICR1L5': 5, 'ICR1L6': 6, 'ICR1L7': 7}, 'ICR3H': {'ICR3H0': 0, 'ICR3H1': 1, 'ICR3H2': 2, 'ICR3H3': 3, 'ICR3H4': 4, 'ICR3H5': 5, 'ICR3H6': 6, 'ICR3H7': 7}, 'ICR3L': {'ICR3L0': 0, 'ICR3L1': 1, 'ICR3L2': 2, 'ICR3L3': 3, 'ICR3L4': 4, 'ICR3L5': 5, 'ICR3L6': 6, 'ICR3L7': 7}, 'MCUCR': {'IVCE': 0, 'IVSEL': 1, 'PUD': 4, 'JTD': 7}, 'MCUSR': {'PORF': 0, 'EXTRF': 1, 'BORF': 2, 'WDRF': 3, 'JTRF': 4}, 'OCDR': {'OCDR0': 0, 'OCDR1': 1, 'OCDR2': 2, 'OCDR3': 3, 'OCDR4': 4, 'OCDR5': 5, 'OCDR6': 6, 'OCDR7': 7}, 'OCR0A': {'OCR0A_0': 0, 'OCR0A_1': 1, 'OCR0A_2': 2, 'OCR0A_3': 3, 'OCR0A_4': 4, 'OCR0A_5': 5, 'OCR0A_6': 6, 'OCR0A_7': 7}, 'OCR0B': {'OCR0B_0': 0, 'OCR0B_1': 1, 'OCR0B_2': 2, 'OCR0B_3': 3, 'OCR0B_4': 4, 'OCR0B_5': 5, 'OCR0B_6': 6, 'OCR0B_7': 7}, 'OCR1AH': {'OCR1AH0': 0, 'OCR1AH1': 1, 'OCR1AH2': 2, 'OCR1AH3': 3, 'OCR1AH4': 4, 'OCR1AH5': 5, 'OCR1AH6': 6, 'OCR1AH7': 7}, 'OCR1AL': {'OCR1AL0': 0, 'OCR1AL1': 1, 'OCR1AL2': 2, 'OCR1AL3': 3, 'OCR1AL4': 4, 'OCR1AL5': 5, 'OCR1AL6': 6, 'OCR1AL7': 7}, 'OCR1BH': {'OCR1BH0': 0, 'OCR1BH1': 1, 'OCR1BH2': 2, 'OCR1BH3': 3, 'OCR1BH4': 4, 'OCR1BH5': 5, 'OCR1BH6': 6, 'OCR1BH7': 7}, 'OCR1BL': {'OCR1BL0': 0, 'OCR1BL1': 1, 'OCR1BL2': 2, 'OCR1BL3': 3, 'OCR1BL4': 4, 'OCR1BL5': 5, 'OCR1BL6': 6, 'OCR1BL7': 7}, 'OCR1CH': {'OCR1CH0': 0, 'OCR1CH1': 1, 'OCR1CH2': 2, 'OCR1CH3': 3, 'OCR1CH4': 4, 'OCR1CH5': 5, 'OCR1CH6': 6, 'OCR1CH7': 7}, 'OCR1CL': {'OCR1CL0': 0, 'OCR1CL1': 1, 'OCR1CL2': 2, 'OCR1CL3': 3, 'OCR1CL4': 4, 'OCR1CL5': 5, 'OCR1CL6': 6, 'OCR1CL7': 7}, 'OCR2A': {'OCR2_0': 0, 'OCR2_1': 1, 'OCR2_2': 2, 'OCR2_3': 3, 'OCR2_4': 4, 'OCR2_5': 5, 'OCR2_6': 6, 'OCR2_7': 7}, 'OCR2B': {'OCR2_0': 0, 'OCR2_1': 1, 'OCR2_2': 2, 'OCR2_3': 3, 'OCR2_4': 4, 'OCR2_5': 5, 'OCR2_6': 6, 'OCR2_7': 7}, 'OCR3AH': {'OCR3AH0': 0, 'OCR3AH1': 1, 'OCR3AH2': 2, 'OCR3AH3': 3, 'OCR3AH4': 4, 'OCR3AH5': 5, 'OCR3AH6': 6, 'OCR3AH7': 7}, 'OCR3AL': {'OCR3AL0': 0, 'OCR3AL1': 1, 'OCR3AL2': 2, 'OCR3AL3': 3, 'OCR3AL4': 4, 'OCR3AL5': 5, 'OCR3AL6': 6, 'OCR3AL7': 7}, 'OCR3BH': {'OCR3BH0': 0, 'OCR3BH1': 1, 'OCR3BH2': 2, 'OCR3BH3': 3, 'OCR3BH4': 4, 'OCR3BH5': 5, 'OCR3BH6': 6, 'OCR3BH7': 7}, 'OCR3BL': {'OCR3BL0': 0, 'OCR3BL1': 1, 'OCR3BL2': 2, 'OCR3BL3': 3, 'OCR3BL4': 4, 'OCR3BL5': 5, 'OCR3BL6': 6, 'OCR3BL7': 7}, 'OCR3CH': {'OCR3CH0': 0, 'OCR3CH1': 1, 'OCR3CH2': 2, 'OCR3CH3': 3, 'OCR3CH4': 4, 'OCR3CH5': 5, 'OCR3CH6': 6, 'OCR3CH7': 7}, 'OCR3CL': {'OCR3CL0': 0, 'OCR3CL1': 1, 'OCR3CL2': 2, 'OCR3CL3': 3, 'OCR3CL4': 4, 'OCR3CL5': 5, 'OCR3CL6': 6, 'OCR3CL7': 7}, 'OCR4A': {'OCR4A0': 0, 'OCR4A1': 1, 'OCR4A2': 2, 'OCR4A3': 3, 'OCR4A4': 4, 'OCR4A5': 5, 'OCR4A6': 6, 'OCR4A7': 7}, 'OCR4B': {'OCR4B0': 0, 'OCR4B1': 1, 'OCR4B2': 2, 'OCR4B3': 3, 'OCR4B4': 4, 'OCR4B5': 5, 'OCR4B6': 6, 'OCR4B7': 7}, 'OCR4C': {'OCR4C0': 0, 'OCR4C1': 1, 'OCR4C2': 2, 'OCR4C3': 3, 'OCR4C4': 4, 'OCR4C5': 5, 'OCR4C6': 6, 'OCR4C7': 7}, 'OCR4D': {'OCR4D0': 0, 'OCR4D1': 1, 'OCR4D2': 2, 'OCR4D3': 3, 'OCR4D4': 4, 'OCR4D5': 5, 'OCR4D6': 6, 'OCR4D7': 7}, 'OSCCAL': {'CAL0': 0, 'CAL1': 1, 'CAL2': 2, 'CAL3': 3, 'CAL4': 4, 'CAL5': 5, 'CAL6': 6, 'CAL7': 7}, 'PCICR': {'PCIE0': 0}, 'PCIFR': {'PCIF0': 0}, 'PCMSK0': {'PCINT0': 0, 'PCINT1': 1, 'PCINT2': 2, 'PCINT3': 3, 'PCINT4': 4, 'PCINT5': 5, 'PCINT6': 6, 'PCINT7': 7}, 'PINB': {'PINB0': 0, 'PINB1': 1, 'PINB2': 2, 'PINB3': 3, 'PINB4': 4, 'PINB5': 5, 'PINB6': 6, 'PINB7': 7}, 'PINC': {'PINC6': 6, 'PINC7': 7}, 'PIND': {'PIND0': 0, 'PIND1': 1, 'PIND2': 2, 'PIND3': 3, 'PIND4': 4, 'PIND5': 5, 'PIND6': 6, 'PIND7': 7}, 'PINE': {'PINE2': 2, 'PINE6': 6}, 'PINF': {'PINF0': 0, 'PINF1': 1, 'PINF4': 4, 'PINF5': 5, 'PINF6': 6, 'PINF7': 7}, 'PLLCSR': {'PLOCK': 0, 'PLLE': 1, 'PINDIV': 4}, 'PLLFRQ': {'PDIV0': 0, 'PDIV1': 1, 'PDIV2': 2, 'PDIV3': 3, 'PLLTM0': 4, 'PLLTM1': 5, 'PLLUSB': 6, 'PINMUX': 7}, 'PORTB': {'PORTB0': 0, 'PORTB1': 1, 'PORTB2': 2, 'PORTB3': 3, 'PORTB4': 4, 'PORTB5': 5, 'PORTB6': 6, 'PORTB7': 7}, 'PORTC': {'PORTC6': 6, 'PORTC7': 7}, 'PORTD': {'PORTD0': 0, 'PORTD1': 1, 'PORTD2': 2, 'PORTD3': 3, 'PORTD4': 4, 'PORTD5': 5, 'PORTD6': 6, 'PORTD7': 7}, 'PORTE': {'PORTE2': 2, 'PORTE6': 6}, 'PORTF': {'PORTF0': 0, 'PORTF1': 1, 'PORTF4': 4, 'PORTF5': 5, 'PORTF6': 6, 'PORTF7': 7}, 'PRR0': {'PRADC': 0, 'PRUSART0': 1, 'PRSPI': 2, 'PRTIM1': 3, 'PRTIM0': 5, 'PRTIM2': 6, 'PRTWI': 7}, 'PRR1': {'PRUSART1': 0, 'PRTIM3': 3, 'PRUSB': 7}, 'RAMPZ': {'RAMPZ0': 0}, 'RCCTRL': {'RCFREQ': 0}, 'SMCR': {'SE': 0, 'SM0': 1, 'SM1': 2, 'SM2': 3}, 'SPCR': {'SPR0': 0, 'SPR1': 1, 'CPHA': 2, 'CPOL': 3, 'MSTR': 4, 'DORD': 5, 'SPE': 6, 'SPIE': 7}, 'SPDR': {'SPDR0': 0, 'SPDR1': 1, 'SPDR2': 2, 'SPDR3': 3, 'SPDR4': 4, 'SPDR5': 5, 'SPDR6': 6, 'SPDR7': 7}, 'SPMCSR': {'SPMEN': 0, 'PGERS': 1, 'PGWRT': 2, 'BLBSET': 3, 'RWWSRE': 4, 'SIGRD': 5, 'RWWSB': 6, 'SPMIE': 7}, 'SPSR': {'SPI2X': 0, 'WCOL': 6, 'SPIF': 7}, 'TC4H': {'TC48': 0, 'TC49': 1, 'TC410': 2}, 'TCCR0A': {'WGM00': 0, 'WGM01': 1, 'COM0B0': 4, 'COM0B1': 5, 'COM0A0': 6, 'COM0A1': 7}, 'TCCR0B': {'CS00': 0, 'CS01': 1, 'CS02': 2, 'WGM02': 3, 'FOC0B': 6, 'FOC0A': 7}, 'TCCR1A': {'WGM10': 0, 'WGM11': 1, 'COM1C0': 2, 'COM1C1': 3, 'COM1B0': 4, 'COM1B1': 5, 'COM1A0': 6, 'COM1A1': 7}, 'TCCR1B': {'CS10': 0, 'CS11': 1, 'CS12': 2, 'WGM12': 3, 'WGM13': 4, 'ICES1': 6, 'ICNC1': 7}, 'TCCR1C': {'FOC1C': 5, 'FOC1B': 6, 'FOC1A': 7}, 'TCCR2A': {'WGM20': 0, 'WGM21': 1, 'COM2B0': 4, 'COM2B1': 5, 'COM2A0': 6, 'COM2A1': 7}, 'TCCR2B': {'CS20': 0, 'CS21': 1, 'CS22': 2, 'WGM22': 3, 'FOC2B': 6, 'FOC2A': 7}, 'TCCR3A': {'WGM30': 0, 'WGM31': 1, 'COM3C0': 2, 'COM3C1': 3, 'COM3B0': 4, 'COM3B1': 5, 'COM3A0': 6, 'COM3A1': 7}, 'TCCR3B': {'CS30': 0, 'CS31': 1, 'CS32': 2, 'WGM32': 3, 'WGM33': 4, 'ICES3': 6, 'ICNC3': 7}, 'TCCR3C': {'FOC3C': 5, 'FOC3B': 6, 'FOC3A': 7}, 'TCCR4A': {'PWM4B': 0, 'PWM4A': 1, 'FOC4B': 2, 'FOC4A': 3, 'COM4B0': 4, 'COM4B1': 5, 'COM4A0': 6, 'COM4A1': 7}, 'TCCR4B': {'CS40': 0, 'CS41': 1, 'CS42': 2, 'CS43': 3, 'DTPS40': 4, 'DTPS41': 5, 'PSR4': 6, 'PWM4X': 7}, 'TCCR4C': {'PWM4D': 0, 'FOC4D': 1, 'COM4D0': 2, 'COM4D1': 3, 'COM4B0S': 4, 'COM4B1S': 5, 'COM4A0S': 6, 'COM4A1S': 7}, 'TCCR4D': {'WGM40': 0, 'WGM41': 1, 'FPF4': 2, 'FPAC4': 3, 'FPES4': 4, 'FPNC4': 5, 'FPEN4': 6, 'FPIE4': 7}, 'TCCR4E': {'OC4OE0': 0, 'OC4OE1': 1, 'OC4OE2': 2, 'OC4OE3': 3, 'OC4OE4': 4, 'OC4OE5': 5, 'ENHC4': 6, 'TLOCK4': 7}, 'TCNT0': {'TCNT0_0': 0, 'TCNT0_1': 1, 'TCNT0_2': 2, 'TCNT0_3': 3, 'TCNT0_4': 4, 'TCNT0_5': 5, 'TCNT0_6': 6, 'TCNT0_7': 7}, 'TCNT1H': {'TCNT1H0': 0, 'TCNT1H1': 1, 'TCNT1H2': 2, 'TCNT1H3': 3, 'TCNT1H4': 4, 'TCNT1H5': 5, 'TCNT1H6': 6, 'TCNT1H7': 7}, 'TCNT1L': {'TCNT1L0': 0, 'TCNT1L1': 1, 'TCNT1L2': 2, 'TCNT1L3': 3, 'TCNT1L4': 4, 'TCNT1L5': 5, 'TCNT1L6': 6, 'TCNT1L7': 7}, 'TCNT2': {'TCNT2_0': 0, 'TCNT2_1': 1, 'TCNT2_2': 2, 'TCNT2_3': 3, 'TCNT2_4': 4, 'TCNT2_5': 5, 'TCNT2_6': 6, 'TCNT2_7': 7}, 'TCNT3H': {'TCNT3H0': 0, 'TCNT3H1': 1, 'TCNT3H2': 2, 'TCNT3H3': 3, 'TCNT3H4': 4, 'TCNT3H5': 5, 'TCNT3H6': 6, 'TCNT3H7': 7}, 'TCNT3L': {'TCNT3L0': 0, 'TCNT3L1': 1, 'TCNT3L2': 2, 'TCNT3L3': 3, 'TCNT3L4': 4, 'TCNT3L5': 5, 'TCNT3L6': 6, 'TCNT3L7': 7}, 'TCNT4L': {'TC40': 0, 'TC41': 1, 'TC42': 2, 'TC43': 3, 'TC44': 4, 'TC45': 5, 'TC46': 6, 'TC47': 7}, 'TIFR0': {'TOV0': 0, 'OCF0A': 1, 'OCF0B': 2}, 'TIFR1': {'TOV1': 0, 'OCF1A': 1, 'OCF1B': 2, 'OCF1C': 3, 'ICF1': 5}, 'TIFR2': {'TOV2': 0, 'OCF2A': 1, 'OCF2B': 2}, 'TIFR3': {'TOV3': 0, 'OCF3A': 1, 'OCF3B': 2, 'OCF3C': 3, 'ICF3': 5}, 'TIFR4': {'TOV4': 2, 'OCF4B': 5, 'OCF4A': 6, 'OCF4D': 7}, 'TIMSK0': {'TOIE0': 0, 'OCIE0A': 1, 'OCIE0B': 2}, 'TIMSK1': {'TOIE1': 0, 'OCIE1A': 1, 'OCIE1B': 2, 'OCIE1C': 3, 'ICIE1': 5}, 'TIMSK2': {'TOIE2': 0, 'OCIE2A': 1, 'OCIE2B': 2}, 'TIMSK3': {'TOIE3': 0, 'OCIE3A': 1, 'OCIE3B': 2, 'OCIE3C': 3, 'ICIE3': 5}, 'TIMSK4': {'TOIE4': 2, 'OCIE4B': 5, 'OCIE4A': 6, 'OCIE4D': 7}, 'TWAMR': {'TWAM0': 1, 'TWAM1': 2, 'TWAM2': 3, 'TWAM3': 4, 'TWAM4': 5, 'TWAM5': 6, 'TWAM6': 7}, 'TWAR': {'TWGCE': 0, 'TWA0': 1, 'TWA1': 2, 'TWA2': 3, 'TWA3': 4, 'TWA4': 5, 'TWA5': 6, 'TWA6': 7}, 'TWBR': {'TWBR0': 0, 'TWBR1': 1, 'TWBR2': 2, 'TWBR3': 3, 'TWBR4': 4, 'TWBR5': 5, 'TWBR6': 6, 'TWBR7': 7}, 'TWCR': {'TWIE': 0, 'TWEN': 2, 'TWWC': 3, 'TWSTO': 4, 'TWSTA': 5, 'TWEA': 6, 'TWINT': 7}, 'TWDR': {'TWD0': 0, 'TWD1': 1, 'TWD2': 2, 'TWD3': 3, 'TWD4': 4, 'TWD5': 5, 'TWD6': 6, 'TWD7': 7}, 'TWSR': {'TWPS0': 0, 'TWPS1': 1, 'TWS3': 3, 'TWS4': 4, 'TWS5': 5, 'TWS6': 6, 'TWS7': 7}, 'UCSR1A': {'MPCM1': 0, 'U2X1': 1, 'UPE1': 2, 'DOR1': 3, 'FE1': 4, 'UDRE1': 5, 'TXC1': 6, 'RXC1': 7}, 'UCSR1B': {'TXB81': 0, 'RXB81': 1, 'UCSZ12': 2, 'TXEN1': 3, 'RXEN1': 4, 'UDRIE1': 5, 'TXCIE1': 6, 'RXCIE1': 7}, 'UCSR1C': {'UCPOL1': 0, 'UCSZ10': 1, 'UCSZ11': 2, 'USBS1': 3, 'UPM10': 4, 'UPM11': 5, 'UMSEL10': 6, 'UMSEL11': 7}, 'UDADDR': {'UADD0': 0, 'UADD1': 1, 'UADD2': 2, 'UADD3': 3, 'UADD4': 4, 'UADD5': 5, 'UADD6': 6, 'ADDEN': 7}, 'UDCON': {'DETACH': 0, 'RMWKUP': 1, 'LSM': 2, 'RSTCPU': 3}, 'UDFNUMH': {'FNUM8': 0, 'FNUM9': 1, 'FNUM10': 2}, 'UDFNUML': {'FNUM0': 0, 'FNUM1': 1, 'FNUM2': 2, 'FNUM3': 3, 'FNUM4': 4, 'FNUM5': 5, 'FNUM6': 6, 'FNUM7': 7}, 'UDIEN': {'SUSPE': 0, 'SOFE': 2, 'EORSTE': 3, 'WAKEUPE': 4, 'EORSME': 5, 'UPRSME': 6}, 'UDINT': {'SUSPI': 0, 'SOFI': 2, 'EORSTI': 3, 'WAKEUPI': 4, 'EORSMI': 5, 'UPRSMI': 6}, 'UDMFN': {'FNCERR': 4}, 'UDR1': {'UDR1_0': 0, 'UDR1_1': 1, 'UDR1_2': 2, 'UDR1_3': 3, 'UDR1_4': 4, 'UDR1_5': 5, 'UDR1_6': 6, 'UDR1_7': 7}, 'UEBCLX': {'BYCT0': 0, 'BYCT1': 1, 'BYCT2': 2, 'BYCT3': 3, 'BYCT4': 4, 'BYCT5': 5, 'BYCT6': 6, 'BYCT7': 7}, 'UECFG0X': {'EPDIR': 0, 'EPTYPE0': 6, 'EPTYPE1': 7}, 'UECFG1X': {'ALLOC': 1, 'EPBK0': 2, 'EPBK1': 3, 'EPSIZE0': 4, 'EPSIZE1': 5, 'EPSIZE2': 6}, 'UECONX': {'EPEN': 0, 'RSTDT': 3, 'STALLRQC': 4, 'STALLRQ': 5}, 'UEDATX': {'DAT0': 0, 'DAT1': 1, 'DAT2': 2, 'DAT3': 3, 'DAT4': 4, 'DAT5': 5, 'DAT6': 6, 'DAT7': 7}, 'UEIENX': {'TXINE': 0, 'STALLEDE': 1, 'RXOUTE': 2, 'RXSTPE': 3, 'NAKOUTE': 4, 'NAKINE': 6, 'FLERRE': 7}, 'UEINT': {'EPINT0': 0, 'EPINT1': 1, 'EPINT2': 2, 'EPINT3': 3, 'EPINT4': 4, 'EPINT5': 5, 'EPINT6': 6}, 'UEINTX': {'TXINI': 0, 'STALLEDI': 1, 'RXOUTI': 2, 'RXSTPI': 3, 'NAKOUTI': 4, 'RWAL': 5, 'NAKINI': 6, 'FIFOCON': 7}, 'UENUM': {'UENUM_0': 0, 'UENUM_1': 1, 'UENUM_2': 2}, 'UERST': {'EPRST0': 0, 'EPRST1': 1, 'EPRST2': 2, 'EPRST3': 3, 'EPRST4': 4, 'EPRST5': 5, 'EPRST6': 6}, 'UESTA0X': {'NBUSYBK0': 0, 'NBUSYBK1': 1, 'DTSEQ0': 2, 'DTSEQ1': 3, 'UNDERFI': 5, 'OVERFI': 6, 'CFGOK': 7}, 'UESTA1X': {'CURRBK0': 0, 'CURRBK1': 1, 'CTRLDIR': 2}, 'UHWCON': {'UVREGE': 0}, 'USBCON': {'VBUSTE': 0, 'OTGPADE': 4, 'FRZCLK': 5, 'USBE': 7}, 'USBINT': {'VBUSTI': 0}, 'USBSTA': {'VBUS': 0, 'SPEED': 3}, 'WDTCSR': {'WDP0': 0, 'WDP1': 1, 'WDP2': 2, 'WDE': 3, 'WDCE': 4, 'WDP3': 5, 'WDIE': 6, 'WDIF': 7}}
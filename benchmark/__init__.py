@@ -0,0 +1,163 @@
+"""
+benchmark
+Measures the round trip, throughput and interrupt latency of the AVR and Piper layers, against a real AVR or the
+emulator in emulator.py. Results are a dict (or JSON from the command line) so they can be compared across commits.
+
+    python -m benchmark [--port PORT] [--baudrate 38400] [--iterations 500] [--output results.json]
+    python -m benchmark --compare old.json new.json
+
+Samuel Brian
+"""
+
+import importlib.util
+import time
+from collections import deque
+from threading import Event
+from avr import AVR
+from dispatcher import QUEUE
+
+# Pin used for the digital benchmarks (the Leonardo's LED) and analog pin for analogRead
+DIGITAL_PIN = 13
+ANALOG_PIN = 0
+# Pins and rate for the ADC streaming benchmark
+STREAM_PINS = (0, 1)
+STREAM_RATE = 2000
+
+
+## Run every benchmark.
+# @param board A connected Leonardo (or other Arduino + AVR).
+# @param emulator The Emulator the board is connected to, or None for a real AVR. Interrupt latency needs it.
+# @param iterations [int] Number of operations timed by each benchmark.
+# @return [dict] Benchmark name -> result.
+def run(board, emulator=None, iterations=500):
+    results = {}
+    cpu = ReaderCPU(board)
+    results["read_latency_us"] = read_latency(board, iterations)
+    results["write_latency_us"] = write_latency(board, iterations)
+    # pinMode and digitalWrite don't wait for a reply, so they measure how fast packets can be sent
+    results["pinMode_ops"] = ops_per_second(lambda i: board.pinMode(DIGITAL_PIN, i & 1), iterations)
+    results["digitalWrite_ops"] = ops_per_second(lambda i: board.digitalWrite(DIGITAL_PIN, i & 1), iterations)
+    results["analogRead_ops"] = ops_per_second(lambda i: board.analogRead(ANALOG_PIN), iterations)
+    results["reader_cpu_busy"] = cpu.fraction()
+    if emulator is not None:
+        results["interrupt_latency_us"] = interrupt_latency(board, emulator, iterations)
+    if board.firmware_version >= 4 and importlib.util.find_spec("numpy") is not None:
+        results["adc_stream"] = adc_stream(board)
+    results["reader_cpu_idle"] = reader_cpu_idle(board)
+    return results
+
+
+## Time single register reads.
+# @return [dict] Percentiles of the round trip in microseconds.
+def read_latency(board, iterations):
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        board.PORTB
+        times.append(time.perf_counter() - start)
+    return percentiles(times)
+
+
+## Time register writes until the AVR has applied them, by reading the register back after each write.
+# @return [dict] Percentiles of the round trip in microseconds.
+def write_latency(board, iterations):
+    times = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        board.GPIOR0 = i & 0xFF
+        board.GPIOR0
+        times.append(time.perf_counter() - start)
+    return percentiles(times)
+
+
+## Count how many times a function can be called per second.
+# @param function Called with the iteration number.
+def ops_per_second(function, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        function(i)
+    return iterations / (time.perf_counter() - start)
+
+
+## Time from an interrupt packet arriving at the read thread to its callback running.
+# Interrupts are triggered one at a time so the latency doesn't include waiting for earlier callbacks.
+# @return [dict] Percentiles of the latency in microseconds.
+def interrupt_latency(board, emulator, iterations, vector="INT0_vect"):
+    arrivals = deque()
+    times = []
+    done = Event()
+
+    def arrived(data):
+        arrivals.append(time.perf_counter())
+        board._handleInterrupt(data)
+
+    def callback():
+        times.append(time.perf_counter() - arrivals.popleft())
+        done.set()
+
+    board.setInterruptPolicy(vector, QUEUE)
+    board._piper.set_read_callback(AVR.INTERRUPT_PIPE, arrived)
+    setattr(board, vector, callback)
+    board.PORTB     # the enable packet has been handled once a later request is answered
+    try:
+        for i in range(iterations):
+            done.clear()
+            emulator.trigger(vector)
+            if not done.wait(board.timeout): break
+    finally:
+        setattr(board, vector, None)
+        board._piper.set_read_callback(AVR.INTERRUPT_PIPE, board._handleInterrupt)
+    return percentiles(times)
+
+
+## Stream analog pins for a while.
+# @return [dict] Scans received per second, the rate asked for, samples dropped by the AVR, blocks lost, and the
+#         fraction of a CPU the read thread used.
+def adc_stream(board, seconds=1.0, rate=STREAM_RATE):
+    stream = board.analogStream([board.A0 + pin for pin in STREAM_PINS], rate, buffer_seconds=seconds * 2)
+    cpu = ReaderCPU(board)
+    with stream:
+        start = time.perf_counter()
+        time.sleep(seconds)
+        elapsed = time.perf_counter() - start
+    return {"scans_per_second": stream.scans / elapsed, "sample_rate": stream.sample_rate,
+            "overruns": stream.overruns, "lost_blocks": stream.lost_blocks, "reader_cpu": cpu.fraction()}
+
+
+## Fraction of a CPU the read thread uses while no packets arrive.
+def reader_cpu_idle(board, seconds=1.0):
+    cpu = ReaderCPU(board)
+    time.sleep(seconds)
+    return cpu.fraction()
+
+
+## Percentiles of a list of durations.
+# @param times Durations in seconds.
+# @return [dict] p50, p99, mean and max in microseconds, and the number of samples n.
+def percentiles(times):
+    if len(times) == 0: return {"n": 0}
+    ordered = sorted(times)
+    at = lambda p: ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1e6
+    return {"n": len(ordered), "p50": at(0.50), "p99": at(0.99),
+            "mean": sum(ordered) / len(ordered) * 1e6, "max": ordered[-1] * 1e6}
+
+
+class ReaderCPU:
+
+    ## Start measuring the CPU time of a board's Piper read thread.
+    def __init__(self, board):
+        try:
+            self.clock = time.pthread_getcpuclockid(board._piper.read_thread.ident)
+        except (AttributeError, OSError):
+            self.clock = None   # not available on this platform
+        self.start_cpu = self._cpu()
+        self.start = time.perf_counter()
+
+    ## Get the fraction of a CPU the read thread has used since the measurement started.
+    # @return [float] Between 0 and 1, or None if it can't be measured on this platform.
+    def fraction(self):
+        if self.clock is None: return None
+        return (self._cpu() - self.start_cpu) / (time.perf_counter() - self.start)
+
+    def _cpu(self):
+        return time.clock_gettime(self.clock) if self.clock is not None else 0
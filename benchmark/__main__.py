@@ -0,0 +1,99 @@
+"""
+benchmark/__main__.py
+Command line for the benchmarks. Runs against the emulator unless a port is given.
+
+Samuel Brian
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from benchmark import run
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark the AVR and Piper layers.")
+    parser.add_argument("--port", default=None, help="serial port of a real AVR (default: use the emulator)")
+    parser.add_argument("--baudrate", type=int, default=38400)
+    parser.add_argument("--max-baudrate", type=int, default=None,
+                        help="let connect() switch to a faster rate, up to this (default: stay at --baudrate)")
+    parser.add_argument("--iterations", type=int, default=500, help="operations timed by each benchmark")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    from leonardo import Leonardo
+    board = Leonardo()
+    emulator = None
+    port = args.port
+    if port is None:
+        from emulator import Emulator
+        emulator = Emulator(Leonardo(), args.baudrate)
+        emulator.analog[7] = 512    # A0 is channel 7
+        port = emulator.start()
+
+    board.connect(port, args.baudrate, args.max_baudrate)
+    try:
+        results = run(board, emulator, args.iterations)
+    finally:
+        board.disconnect()
+        if emulator is not None: emulator.stop()
+
+    output = {
+        "commit": _git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "device": "emulator" if emulator is not None else args.port,
+        "baudrate": board.baudrate,
+        "firmware_version": board.firmware_version,
+        "iterations": args.iterations,
+        "results": results,
+    }
+    text = json.dumps(output, indent=2, sort_keys=True)
+    if args.output is not None:
+        with open(args.output, "w") as file: file.write(text + "\n")
+    print(text)
+
+
+## Print the change in each result between two results files.
+def compare(old_filename, new_filename):
+    with open(old_filename) as file: old = json.load(file)["results"]
+    with open(new_filename) as file: new = json.load(file)["results"]
+    for name in sorted(set(old) | set(new)):
+        for key, old_value, new_value in _values(name, old.get(name), new.get(name)):
+            if isinstance(old_value, (int, float)) and isinstance(new_value, (int, float)) and old_value != 0:
+                change = "{0:+.1f}%".format((new_value - old_value) / old_value * 100)
+            else:
+                change = ""
+            print("{0:<32} {1:>14} {2:>14} {3:>9}".format(key, _format(old_value), _format(new_value), change))
+
+
+# Flatten a result into (name, old, new) rows
+def _values(name, old, new):
+    if isinstance(old, dict) or isinstance(new, dict):
+        old, new = old or {}, new or {}
+        return [(name + "." + key, old.get(key), new.get(key)) for key in sorted(set(old) | set(new)) if key != "n"]
+    return [(name, old, new)]
+
+
+def _format(value):
+    if isinstance(value, float): return "{0:.3f}".format(value)
+    return str(value)
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""
+defcache.py
+Parses AVR register headers into definition tables and caches the tables on disk, so each header is only parsed once.
+A header's cache is kept in a __defcache__ directory next to it and is rebuilt when the header's path, size or
+modification time changes.
+
+Prebuild the caches for a directory of headers with:
+    python defcache.py avrheaders
+
+It also generates data modules that hold the definitions of a chip, so they can be imported without the headers:
+    python defcache.py --module atmega32u4_defs.py avrheaders/iom32u4.h avrheaders/portpins.h
+
+Samuel Brian
+"""
+
+import importlib
+import os
+import pickle
+import re
+
+CACHE_DIR = "__defcache__"
+CACHE_VERSION = 2       # increment when the format of the tables changes
+
+# The kinds of definition in a header, and the tables they are parsed into.
+# register_bits is {register name: {bit name: bit}}, from the bit constants listed under each register.
+TABLES = ("SFR_IO8", "SFR_IO16", "SFR_MEM8", "SFR_MEM16", "constants", "vector_indices", "register_bits")
+
+_DEFINE = re.compile(r"#\s*define\s+")
+_SFR = re.compile(r"_SFR_(IO8|IO16|MEM8|MEM16)\((.+)\)")
+_VECTOR = re.compile(r"_VECTOR\((.+)\)")
+
+
+## Get the definitions in a header, from its cache if it is up to date.
+# @param header_filename Path of the header.
+# @param cache [bool] Whether to use and update the cache. The header is parsed if the cache can't be written.
+# @return [dict] Table name (see TABLES) -> {name: value}.
+def load(header_filename, cache=True):
+    if not cache: return parse(header_filename)
+
+    key = _key(header_filename)
+    cache_filename = cache_path(header_filename)
+    try:
+        with open(cache_filename, "rb") as file:
+            cached_key, tables = pickle.load(file)
+        if cached_key == key: return tables
+    except (OSError, EOFError, pickle.UnpicklingError, ValueError):
+        pass
+
+    tables = parse(header_filename)
+    try:
+        _write(cache_filename, key, tables)
+    except OSError:
+        pass    # e.g. a read-only install; the header is just parsed every time
+    return tables
+
+
+## Parse and cache a header, or every .h file in a directory.
+# @return [list] (header filename, number of definitions) for each header cached.
+def build(path):
+    if os.path.isdir(path):
+        headers = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith(".h")]
+    else:
+        headers = [path]
+    built = []
+    for header_filename in headers:
+        tables = parse(header_filename)
+        _write(cache_path(header_filename), _key(header_filename), tables)
+        built.append((header_filename, sum(len(table) for table in tables.values())))
+    return built
+
+
+## Parse the #defines in a header.
+# @return [dict] Table name (see TABLES) -> {name: value}.
+def parse(header_filename):
+    tables = dict((name, {}) for name in TABLES)
+    sfr_tables = {"IO8": tables["SFR_IO8"], "IO16": tables["SFR_IO16"],
+                  "MEM8": tables["SFR_MEM8"], "MEM16": tables["SFR_MEM16"]}
+    constants = tables["constants"]
+    vector_indices = tables["vector_indices"]
+    register_bits = tables["register_bits"]
+    register = None     # the register whose bits are being listed
+
+    with open(header_filename, "r") as file:
+        for line in file:
+            matches = _DEFINE.search(line)
+            if matches is None:
+                # The bits of a register are listed straight after it, up to a blank line
+                if line.strip() == "": register = None
+                continue
+            spl = line.replace(matches.group(0), "").strip().split(" ")
+
+            # Constants with no value
+            if len(spl) < 2:
+                constants[spl[0]] = None
+                continue
+
+            # Registers
+            matches = _SFR.search(spl[1])
+            if matches is not None:
+                sfr_tables[matches.group(1)][spl[0]] = _to_int(matches.group(2))
+                register = spl[0]
+                continue
+
+            # Interrupt vectors
+            matches = _VECTOR.search(line)
+            if matches is not None:
+                vector_indices[spl[0]] = _to_int(matches.group(1))
+                register = None
+                continue
+
+            # Other constants
+            try:
+                constants[spl[0]] = _to_int(spl[1])
+            except ValueError:
+                register = None
+                continue
+            if register is not None and 0 <= constants[spl[0]] < 16:
+                register_bits.setdefault(register, {})[spl[0]] = constants[spl[0]]
+            else:
+                register = None
+
+            # Unhandled: FUSE_*, RAM*, XRAM*, _VECTOR_SIZE, and some others.
+    return tables
+
+
+## Get the definitions in a data module generated by write_module(). The module is only imported once, so every
+# caller shares the same tables and must not change them.
+# @param module_name e.g. "atmega32u4_defs"
+# @return [dict] Table name (see TABLES) -> {name: value}.
+def load_module(module_name):
+    module = importlib.import_module(module_name)
+    return dict((name, getattr(module, name, {})) for name in TABLES)     # modules from older versions lack some tables
+
+
+## Write definition tables as a Python data module for load_module().
+# @param sources [list] Names of the headers the tables were parsed from, for the module's docstring.
+def write_module(tables, module_filename, sources):
+    with open(module_filename, "w") as file:
+        file.write('"""\n{0}\nGenerated by defcache.py from {1}. Don\'t edit.\n"""\n\n'.format(
+            os.path.basename(module_filename), ", ".join('"{0}"'.format(source) for source in sources)))
+        for name in TABLES:
+            # Sorted so regenerating the module gives a small diff
+            items = ", ".join("{0!r}: {1!r}".format(key, tables[name][key]) for key in sorted(tables[name]))
+            file.write("{0} = {{{1}}}\n".format(name, items))
+
+
+## Get the filename of a header's cache.
+def cache_path(header_filename):
+    directory, name = os.path.split(os.path.abspath(header_filename))
+    return os.path.join(directory, CACHE_DIR, name + ".pickle")
+
+
+""" Private functions """
+
+# What a cache must have been built from to be used
+def _key(header_filename):
+    status = os.stat(header_filename)
+    return CACHE_VERSION, os.path.abspath(header_filename), status.st_size, status.st_mtime_ns
+
+
+def _write(cache_filename, key, tables):
+    os.makedirs(os.path.dirname(cache_filename), exist_ok=True)
+    # Write to a temporary file first so another process never loads a partly written cache
+    temporary_filename = "{0}.{1}.tmp".format(cache_filename, os.getpid())
+    with open(temporary_filename, "wb") as file:
+        pickle.dump((key, tables), file, pickle.HIGHEST_PROTOCOL)
+    os.replace(temporary_filename, cache_filename)
+
+
+def _to_int(string): return int(string, 16) if "x" in string else int(string, 10)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Prebuild the definition caches of AVR register headers.")
+    parser.add_argument("paths", nargs="+", help="headers, or directories of .h files")
+    parser.add_argument("--module", metavar="FILENAME", help="write the headers' definitions to one data module instead")
+    args = parser.parse_args()
+
+    if args.module is not None:
+        tables = dict((name, {}) for name in TABLES)
+        for path in args.paths:
+            for name, table in parse(path).items():
+                if name == "register_bits":
+                    for register, bits in table.items(): tables[name].setdefault(register, {}).update(bits)
+                else:
+                    tables[name].update(table)
+        write_module(tables, args.module, [os.path.basename(path) for path in args.paths])
+        print("{0}: {1} definitions".format(args.module, sum(len(table) for table in tables.values())))
+        raise SystemExit
+
+    for path in args.paths:
+        for header_filename, count in build(path):
+            print("{0}: {1} definitions".format(cache_path(header_filename), count))
@@ -0,0 +1,127 @@
+"""
+dispatcher.py
+Runs interrupt callbacks on a fixed pool of worker threads, with a policy per interrupt for what to do when they arrive
+faster than they can be handled.
+
+Samuel Brian
+"""
+
+from threading import Condition, Thread
+from collections import deque
+import logging
+
+_log = logging.getLogger(__name__)
+
+# Dispatch policies
+INLINE          = "inline"      # Run the callback in the thread that received the interrupt. It must not block.
+QUEUE           = "queue"       # Queue every interrupt, dropping it if the queue is full.
+DROP_IF_BUSY    = "drop"        # Drop the interrupt if its callback is already queued or running.
+COALESCE        = "coalesce"    # Keep at most one queued interrupt; later ones are merged into it.
+
+
+class Dispatcher:
+
+    ## Construct a Dispatcher. Worker threads are started when the first callback is dispatched.
+    # @param workers [int] Number of worker threads. With one worker, callbacks run in the order they were dispatched.
+    # @param max_queue_len [int] Maximum number of callbacks waiting to run.
+    # @param policy The policy for keys that haven't had one set with set_policy().
+    def __init__(self, workers=1, max_queue_len=100, policy=QUEUE):
+        self.workers = workers
+        self.max_queue_len = max_queue_len
+        self.policy = policy
+        self.policies = {}
+
+        self._queue = deque()
+        self._condition = Condition()
+        self._threads = []
+        self._running = False
+        self._generation = 0    # incremented by stop() so old workers exit even if new ones have started
+        self._pending = {}      # key -> number of queued callbacks
+        self._busy = {}         # key -> number of running callbacks
+        self._stats = {}        # key -> counters
+
+    ## Set the policy for a key.
+    def set_policy(self, key, policy):
+        if policy not in (INLINE, QUEUE, DROP_IF_BUSY, COALESCE):
+            raise Exception("Unknown dispatch policy '{0}'.".format(policy))
+        self.policies[key] = policy
+
+    ## Run a callback according to its key's policy.
+    # @param key Identifies the source of the callback, e.g. an interrupt vector number.
+    # @param callback A function taking no arguments.
+    def dispatch(self, key, callback):
+        policy = self.policies.get(key, self.policy)
+        if policy == INLINE:
+            self._count(key, "dispatched")
+            self._run(key, callback)
+            return
+
+        with self._condition:
+            self._count(key, "dispatched")
+            pending = self._pending.get(key, 0)
+            if policy == DROP_IF_BUSY and (pending > 0 or self._busy.get(key, 0) > 0):
+                self._count(key, "dropped")
+                return
+            if policy == COALESCE and pending > 0:
+                self._count(key, "coalesced")
+                return
+            if len(self._queue) >= self.max_queue_len:
+                self._count(key, "dropped")
+                return
+
+            if not self._running: self._start()
+            self._queue.append((key, callback))
+            self._pending[key] = pending + 1
+            self._condition.notify()
+
+    ## Stop the worker threads once they finish their current callback. Queued callbacks are discarded.
+    def stop(self):
+        with self._condition:
+            self._running = False
+            self._generation += 1
+            self._queue.clear()
+            self._pending.clear()
+            self._condition.notify_all()
+        self._threads = []
+
+    ## Get the counters for each key.
+    # @return [dict] key -> {"dispatched", "run", "dropped", "coalesced", "errors"}
+    def stats(self):
+        with self._condition:
+            return dict((key, dict(counters)) for key, counters in self._stats.items())
+
+    """ Private functions """
+
+    def _start(self):
+        self._running = True
+        self._threads = [Thread(target=self._worker, args=(self._generation,), daemon=True) for i in range(self.workers)]
+        for thread in self._threads: thread.start()
+
+    def _worker(self, generation):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: len(self._queue) > 0 or generation != self._generation)
+                if generation != self._generation: return
+                key, callback = self._queue.popleft()
+                self._pending[key] -= 1
+                self._busy[key] = self._busy.get(key, 0) + 1
+            try:
+                self._run(key, callback)
+            finally:
+                with self._condition:
+                    self._busy[key] -= 1
+
+    def _run(self, key, callback):
+        try:
+            callback()
+        except Exception as e:
+            # An exception in one callback shouldn't stop the interrupts that follow it
+            self._count(key, "errors")
+            _log.error("Exception in interrupt callback %s: %r", key, e)
+        self._count(key, "run")
+
+    def _count(self, key, counter):
+        with self._condition:
+            if key not in self._stats:
+                self._stats[key] = {"dispatched": 0, "run": 0, "dropped": 0, "coalesced": 0, "errors": 0}
+            self._stats[key][counter] += 1
@@ -0,0 +1,392 @@
+"""
+emulator.py
+Host-side emulator of the firmware in firmware_atmega32u4, for testing and benchmarking without an AVR.
+It speaks the Piper register and interrupt protocol over a pseudo-terminal, so AVR.connect() can attach to it by port
+name. Registers are plain memory, apart from the ADC which converts immediately when ADSC is set. ADC streaming sends
+blocks at the rate Timer1 is set to, with the samples in analog.
+
+Run it on its own with:
+    python emulator.py [--baudrate 38400]
+and connect to the port it prints.
+
+Samuel Brian
+"""
+
+import os
+from binascii import crc_hqx
+from threading import Event, Lock, Thread
+from time import perf_counter, sleep
+from avr import AVR
+from piper import FrameParser, Piper, pack_packet
+
+
+class Emulator:
+
+    FIRMWARE_VERSION = 9
+    DATA_SPACE_SIZE = 0x0B00    # registers and SRAM of the ATmega32U4
+    SFR_OFFSET      = 0x20      # _SFR_IO8(x) is data space address x + 0x20
+    NUM_VECTORS     = 43
+    TIMER1_PRESCALERS = {1: 1, 2: 8, 3: 64, 4: 256, 5: 1024}   # CS1 field -> prescaler
+
+    ## Construct an Emulator.
+    # @param avr An AVR (or Leonardo) with the chip's definitions, used to find the ADC registers.
+    # @param baudrate If given, delay packets by the time they would take on a serial link at this rate. The rate
+    #                 follows SET_BAUD.
+    def __init__(self, avr, baudrate=None):
+        self.avr = avr
+        self.baudrate = baudrate
+        self.link_baudrate = 38400      # rate the firmware would be running at
+        self.max_baudrate = 2000000     # fastest rate SET_BAUD accepts
+        self.bad_baudrates = set()      # rates at which nothing gets through, to test falling back
+        self.framing = 1                # Piper framing version, which like the firmware's lasts between connections
+        self.memory = bytearray(Emulator.DATA_SPACE_SIZE)
+        self.interrupt_enabled = [False] * Emulator.NUM_VECTORS
+        self.analog = [0] * 16      # value returned by a conversion of each ADC channel
+        self.shifted_out = bytearray()  # bytes sent by SHIFT_OUT, for tests to check
+        self.port = None
+
+        # Counters
+        self.packets_received = 0
+        self.packets_sent = 0
+        self.operations = 0
+
+        self._master = None
+        self._slave = None
+        self._parser = FrameParser()
+        self._write_lock = Lock()
+        self._running = False
+        self._stream = None     # (channels, samples per block) while ADC streaming is started
+        self._streamer = None   # thread sending the stream's blocks
+        self._stream_changed = Event()
+        self._pending_baud = None       # rate to switch to after the reply to SET_BAUD
+        self._baud_previous = None      # rate to go back to if the new rate isn't confirmed in time
+        self._baud_switch_time = 0
+        self._pending_framing = None    # framing to switch to after the reply to SET_FRAMING
+
+        # Functions called after a register is written, by data space address
+        self.write_hooks = {}
+        if avr.is_register("ADCSRA"):
+            self.write_hooks[self._address("ADCSRA")] = self._adc_hook
+
+    ## Open a pseudo-terminal and start answering packets on it.
+    # @return [str] The name of the port to connect to.
+    def start(self):
+        import pty, tty
+        self._master, self._slave = pty.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._running = True
+        Thread(target=self._read_thread, daemon=True).start()
+        return self.port
+
+    def stop(self):
+        self._running = False
+        self._stream = None
+        self._stream_changed.set()
+        for fd in (self._master, self._slave):
+            if fd is not None: os.close(fd)
+        self._master = self._slave = None
+
+    ## Trigger an interrupt. It is only sent if the host has enabled it.
+    # @param vector The vector name or index.
+    def trigger(self, vector):
+        if isinstance(vector, str): vector = self.avr._vector_indices[vector]
+        if self.interrupt_enabled[vector]:
+            self._write_packet(AVR.INTERRUPT_PIPE, bytes([vector]))
+
+    def read_register(self, name):
+        address, width = self._address(name), self._width(name)
+        return int.from_bytes(self.memory[address:address + width], "little")
+
+    def write_register(self, name, value):
+        address, width = self._address(name), self._width(name)
+        self.memory[address:address + width] = (value & ((1 << (8 * width)) - 1)).to_bytes(width, "little")
+
+    """ Private functions """
+
+    def _read_thread(self):
+        try:
+            while self._running:
+                chunk = os.read(self._master, 4096)
+                if len(chunk) == 0: break
+                for pipe_id, data in self._parser.feed(chunk):
+                    if self._baud_previous is not None and \
+                            perf_counter() - self._baud_switch_time >= AVR.BAUD_CONFIRM_TIME:
+                        self._set_baud(self._baud_previous)
+                    if self.link_baudrate in self.bad_baudrates: continue
+                    self.packets_received += 1
+                    self._delay(len(data) + 4)
+                    self._handle_packet(pipe_id, data)
+        except OSError:
+            pass    # stop() closed the pseudo-terminal
+
+    def _handle_packet(self, pipe_id, data):
+        if pipe_id == AVR.REGISTER_PIPE:
+            reply = bytearray()
+            self._register_pipe_read(data, reply)
+            if len(reply) > 0: self._write_packet(AVR.REGISTER_PIPE, reply[:255])
+            if self._pending_framing is not None:
+                self.framing = self._pending_framing
+                self._parser.set_version(self.framing)
+                self._pending_framing = None
+            if self._pending_baud is not None:
+                previous = self.link_baudrate
+                self._set_baud(self._pending_baud)
+                self._baud_previous, self._baud_switch_time = previous, perf_counter()
+                self._pending_baud = None
+        elif pipe_id == AVR.INTERRUPT_PIPE and len(data) >= 2:
+            if data[0] < Emulator.NUM_VECTORS:
+                self.interrupt_enabled[data[0]] = data[1] == AVR.INT_ENABLE
+        elif pipe_id == AVR.ADC_PIPE and len(data) >= 1:
+            self._adc_pipe_read(data)
+
+    # Mirrors adcPipeRead() in the firmware
+    def _adc_pipe_read(self, data):
+        self._stream = None
+        if data[0] == AVR.ADC_START and len(data) >= 3 and data[1] > 0:
+            self._stream = (list(data[2:18]), min(data[1], 64))
+            if self._streamer is None:
+                self._streamer = Thread(target=self._stream_thread, daemon=True)
+                self._streamer.start()
+        self._stream_changed.set()
+
+    # Sends blocks of samples at the conversion rate while Timer1 triggers the ADC, like the firmware's ADC ISR.
+    # Samples are dropped (and counted as overruns) if the link is too slow for the rate.
+    def _stream_thread(self):
+        stream = None
+        while self._running:
+            if self._stream is None:
+                self._stream_changed.wait()
+                self._stream_changed.clear()
+                continue
+            if self._stream is not stream:
+                # Started again
+                stream = self._stream
+                index, sequence, overruns, due = 0, 0, 0, None
+            channels, block_length = stream
+            rate = self._conversion_rate()
+            if rate is None:
+                due = None
+                sleep(0.001)
+                continue
+            now = perf_counter()
+            if due is None: due = now + block_length / rate
+            if due > now: sleep(due - now)
+            if self._stream is not stream: continue     # stopped or started again while waiting
+
+            block = bytearray([sequence & 0xFF, min(overruns, 0xFF)])
+            for i in range(block_length):
+                block += (self.analog[channels[index % len(channels)]] & 0x3FF).to_bytes(2, "little")
+                index += 1
+            self._write_packet(AVR.ADC_PIPE, block)
+            sequence += 1
+            overruns = 0
+
+            # Conversions that happened while the block was being sent are lost, up to the start of a scan
+            due += block_length / rate
+            behind = int((perf_counter() - due) * rate)
+            behind += -(index + behind) % len(channels)
+            if behind > 0:
+                overruns = behind
+                index += behind
+                due += behind / rate
+
+    # Conversions per second triggered by Timer1 compare match B, or None if the ADC isn't being triggered
+    def _conversion_rate(self):
+        avr = self.avr
+        adcsra = self.read_register("ADCSRA")
+        enabled = avr._field("ADCSRA", "ADEN").mask | avr._field("ADCSRA", "ADATE").mask
+        if adcsra & enabled != enabled or avr._field("ADCSRB", "ADTS").unpack(self.read_register("ADCSRB")) != 5:
+            return None
+        prescaler = Emulator.TIMER1_PRESCALERS.get(avr._field("TCCR1B", "CS1").unpack(self.read_register("TCCR1B")))
+        if prescaler is None: return None
+        return avr.F_CPU / float(prescaler * (self.read_register("OCR1A") + 1))
+
+    # Mirrors registerPipeRead() in the firmware
+    def _register_pipe_read(self, data, reply):
+        if len(data) < 2: return
+        address, token = data[0], data[1]
+
+        if token == AVR.REGISTER_BATCH or token == AVR.REGISTER_SEQ:
+            if token == AVR.REGISTER_SEQ: reply.append(address)
+            i = 2
+            while i + 1 < len(data):
+                i = self._register_op(data[i], data[i + 1], data, i + 2, reply)
+        elif token == AVR.GET_VERSION:
+            reply.append(Emulator.FIRMWARE_VERSION)
+        elif token == AVR.SET_BAUD and len(data) >= 6:
+            rate = int.from_bytes(data[2:6], "little")
+            accepted = 0 < rate <= self.max_baudrate
+            if accepted: self._pending_baud = rate
+            reply.append(1 if accepted else 0)
+        elif token == AVR.CONFIRM_BAUD:
+            self._baud_previous = None
+            reply.append(1)
+        elif token == AVR.SET_FRAMING and len(data) >= 3:
+            accepted = data[2] in (1, 2)
+            if accepted: self._pending_framing = data[2]
+            reply.append(1 if accepted else 0)
+        else:
+            self._register_op(address, token, data, 2, reply)
+
+    # Mirrors registerOp() in the firmware
+    # @return The index in data after the operation.
+    def _register_op(self, address, token, data, i, reply):
+        self.operations += 1
+        if token == AVR.ANALOG_READ:
+            self._analog_read(address, data[i], reply)
+            return i + 1
+        if token == AVR.SHIFT_OUT or token == AVR.SHIFT_IN:
+            return self._shift(address, token, data, i, reply)
+        if token == AVR.READ_BLOCK or token == AVR.WRITE_BLOCK:
+            address |= data[i] << 8
+            length = data[i + 1]
+            i += 2
+            if token == AVR.READ_BLOCK:
+                reply += self.memory[address:address + length]
+                return i
+            self._write_memory(address, data[i:i + length])
+            return i + length
+        space = token & 0x0F
+        if space == AVR.READ_IO8 or space == AVR.READ_IO16: address += Emulator.SFR_OFFSET
+        width = 2 if space == AVR.READ_IO16 or space == AVR.READ_MEM16 else 1
+        op = token & 0xF0
+
+        if token in (AVR.READ_IO8, AVR.READ_IO16, AVR.READ_MEM8, AVR.READ_MEM16):
+            reply += self.memory[address:address + width]
+            return i
+        if token in (AVR.WRITE_IO8, AVR.WRITE_IO16, AVR.WRITE_MEM8, AVR.WRITE_MEM16):
+            self._write_memory(address, data[i:i + width])
+            return i + width
+        if op in (AVR.SET_BITS, AVR.CLEAR_BITS, AVR.TOGGLE_BITS, AVR.UPDATE_BITS):
+            mask = int.from_bytes(data[i:i + width], "little")
+            i += width
+            if op == AVR.UPDATE_BITS:
+                value = int.from_bytes(data[i:i + width], "little")
+                i += width
+            else:
+                value = mask if op == AVR.SET_BITS else 0
+            old = int.from_bytes(self.memory[address:address + width], "little")
+            new = old ^ mask if op == AVR.TOGGLE_BITS else (old & ~mask) | (value & mask)
+            self._write_memory(address, new.to_bytes(width, "little"))
+            return i
+        if op == AVR.WAIT_BITS:
+            mask = int.from_bytes(data[i:i + width], "little")
+            value = int.from_bytes(data[i + width:i + 2 * width], "little") & mask
+            timeout = int.from_bytes(data[i + 2 * width:i + 2 * width + 2], "little") / 1000.0
+            reply.append(self._wait_bits(address, width, mask, value, timeout))
+            return i + 2 * width + 2
+        return i    # unknown tokens are ignored, like the firmware
+
+    # Mirrors shiftOp() in the firmware. Shifting in reads the data pin's PIN bit, which nothing changes during the shift.
+    def _shift(self, bit_order, token, data, i, reply):
+        data_address, data_mask, clock_address, clock_mask, half_period, length = data[i:i + 6]
+        i += 6
+        if token == AVR.SHIFT_OUT:
+            values = data[i:i + length]
+            self.shifted_out += values
+            if length > 0:
+                last_bit = values[-1] & (0x80 if bit_order == 0 else 0x01)
+                self.memory[data_address] = (self.memory[data_address] & ~data_mask & 0xFF) | (data_mask if last_bit else 0)
+            i += length
+        else:
+            reply += bytes([0xFF if self.memory[data_address] & data_mask else 0x00]) * length
+        self.memory[clock_address] &= ~clock_mask & 0xFF
+        return i
+
+    # Mirrors waitBits() in the firmware. Memory only changes here if something else, e.g. a test, writes to it.
+    def _wait_bits(self, address, width, mask, value, timeout):
+        deadline = perf_counter() + timeout
+        while int.from_bytes(self.memory[address:address + width], "little") & mask != value:
+            if perf_counter() >= deadline: return 0
+            sleep(0.001)
+        return 1
+
+    def _write_memory(self, address, data):
+        self.memory[address:address + len(data)] = data
+        for a in range(address, address + len(data)):
+            if a in self.write_hooks: self.write_hooks[a](self.memory[a])
+
+    # Mirrors analogReadOp() in the firmware
+    def _analog_read(self, channel, reference, reply):
+        if self.avr.is_register("ADCSRB") and "MUX5" in self.avr._constants:
+            mux5 = 1 << self.avr._constants["MUX5"]
+            adcsrb = self._address("ADCSRB")
+            self.memory[adcsrb] = (self.memory[adcsrb] & ~mux5 & 0xFF) | (mux5 if channel & 0x08 else 0)
+        self._write_memory(self._address("ADMUX"), bytes([((reference << 6) | (channel & 0x07)) & 0xFF]))
+        adcsra = self._address("ADCSRA")
+        self._write_memory(adcsra, bytes([self.memory[adcsra] | (1 << self.avr._constants["ADSC"])]))
+        reply += self.memory[self._address("ADC"):self._address("ADC") + 2]
+
+    # Setting ADSC does a conversion straight away
+    def _adc_hook(self, value):
+        adsc = 1 << self.avr._constants["ADSC"]
+        if not value & adsc: return
+        channel = self.read_register("ADMUX") & 0x07
+        if self.avr.is_register("ADCSRB") and "MUX5" in self.avr._constants:
+            if self.read_register("ADCSRB") & (1 << self.avr._constants["MUX5"]): channel += 8
+        self.write_register("ADC", self.analog[channel])
+        self.memory[self._address("ADCSRA")] &= ~adsc & 0xFF
+
+    def _write_packet(self, pipe_id, data):
+        if self.framing == 2: packet = Emulator._frame(pipe_id, bytes(data))
+        else: packet = pack_packet(pipe_id, bytes(data), self.framing)
+        with self._write_lock:
+            self._delay(len(packet))
+            if self._master is None: return
+            os.write(self._master, packet)
+            self.packets_sent += 1
+
+    # Mirrors Piper::writeFrame() in the firmware, rather than using piper.cobs_encode(), so the host is tested against
+    # the firmware's encoder
+    @staticmethod
+    def _frame(pipe_id, data):
+        crc = crc_hqx(bytes([pipe_id]) + data, 0xFFFF)
+        body = bytes([pipe_id]) + data + bytes([crc & 0xFF, crc >> 8])
+        out = bytearray()
+        n = len(body)
+        i = 0
+        while True:
+            j = i
+            while j < n and j - i < 0xFE and body[j] != 0: j += 1
+            out.append(j - i + 1)
+            out += body[i:j]
+            if j >= n: break
+            i = j if j - i == 0xFE else j + 1
+        out.append(Piper.FRAME_DELIMITER)
+        return bytes(out)
+
+    # Mirrors updateBaud() in the firmware
+    def _set_baud(self, rate):
+        self.link_baudrate = rate
+        self._baud_previous = None
+        if self.baudrate: self.baudrate = rate
+
+    # Wait for the time a number of bytes would take on the emulated serial link (8N1, so 10 bits a byte)
+    def _delay(self, num_bytes):
+        if self.baudrate: sleep(num_bytes * 10.0 / self.baudrate)
+
+    def _address(self, name):
+        address, read_token, write_token = self.avr._register(name)
+        if read_token == AVR.READ_IO8 or read_token == AVR.READ_IO16: address += Emulator.SFR_OFFSET
+        return address
+
+    def _width(self, name):
+        address, read_token, write_token = self.avr._register(name)
+        return 2 if read_token == AVR.READ_IO16 or read_token == AVR.READ_MEM16 else 1
+
+
+if __name__ == "__main__":
+    import argparse
+    from leonardo import Leonardo
+
+    parser = argparse.ArgumentParser(description="Emulate the AVR firmware on a pseudo-terminal.")
+    parser.add_argument("--baudrate", type=int, default=None, help="emulate the delays of a serial link at this rate")
+    args = parser.parse_args()
+
+    emulator = Emulator(Leonardo(), args.baudrate)
+    print(emulator.start(), flush=True)
+    try:
+        while True: sleep(1)
+    except KeyboardInterrupt:
+        emulator.stop()
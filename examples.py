@@ -23,33 +23,90 @@ ptr = ard.ptr("DDRD")   # ptr = &DDRD;
 ptr.set(0xF0)           # *ptr = 0xF0;
 print(ptr.get())
 
+#### Write bitfields with one masked write, without reading the register first.
+ard.field("EICRA", "ISC6").set(FALLING)     # ISC60 and ISC61
+ard.update_fields("TCCR1B", CS1=3, WGM1=14) # clock/64 and the high bits of fast PWM mode 14, in one write
+
+#### Send several reads and writes in one packet.
+with ard.batch() as batch:
+    batch.write("OCR1A", 0x0100)
+    batch.sbi("DDRB", ard.DDB5)
+    tccr1a = batch.read("TCCR1A")
+print(tccr1a.value)
+
+#### Wait for a flag on the AVR rather than polling it over the link (needs firmware version 5).
+ard.wait_bits("EECR", 1 << ard.EEPE, 0, timeout=0.1)   # until an EEPROM write has finished
+# An SPI transfer in one packet: send a byte, wait for SPIF, then read the byte received.
+with ard.batch() as batch:
+    batch.write("SPDR", 0x9F)
+    batch.wait_bits("SPSR", 1 << ard.SPIF, 1 << ard.SPIF)
+    spdr = batch.read("SPDR")
+print(spdr.value)
+
+#### Read and write ranges of memory in a few packets (needs firmware version 6).
+sfrs = ard.mem[0x20:0x100]                  # every IO and extended IO register, as bytes
+ard.mem[0x100:0x140] = bytes(64)            # clear the start of SRAM
+ard.read_block_into(0x100, bytearray(64))   # or read into an existing buffer
+
+#### Snapshot every register, see what changed, and put it back.
+before = ard.snapshot()                     # or ard.snapshot("TCCR1*", "OCR1?")
+ard.analogWrite(9, 128)
+print(ard.diff(before))                     # {'OCR1A': (0, 128), 'TCCR1A': (1, 129), ...}
+ard.restore(before)                         # writes only the registers that differ
+
 ##### Turn on the Leonardo's built-in LED (on PC7 a.k.a. Pin 13).
 ard.DDRC  |= (1 << ard.DDD7)
 ard.PORTC |= (1 << ard.PORTD7)
 
+# Or set the bits on the AVR without reading the registers first.
+ard.set_bits("DDRC", 1 << ard.DDD7)
+ard.set_bits("PORTC", 1 << ard.PORTD7)
+
 # Or use the equivalent Arduino code.
 ard.pinMode(ard.LED_BUILTIN, OUTPUT)
 ard.digitalWrite(ard.LED_BUILTIN, HIGH)
 
+#### Cache registers that only the host writes (DDR*, PORT*, OCR*, TCCR*), so reading them doesn't need the AVR and
+# writing the value they already have isn't sent.
+ard.shadow()
+ard.refresh()                               # Read the cached registers; do it again after resetting the AVR.
+ard.digitalWrite(ard.LED_BUILTIN, HIGH)     # Not sent, the pin is already high.
+
 #### Read an ADC pin.
 ard.pinMode(ard.A0, INPUT)
 print(ard.analogRead(ard.A0))
 
+#### Sample analog pins continuously (needs numpy).
+with ard.analogStream([ard.A0, ard.A1], 1000) as stream:
+    samples = stream.read(1000)     # 1000 x 2 array, about a second of samples
+print(samples.mean(axis=0), stream.overruns)
+
+#### Drive a chain of 74HC595 shift registers on pins 2 (data) and 3 (clock); the AVR does the bit-banging.
+ard.pinMode(2, OUTPUT)
+ard.pinMode(3, OUTPUT)
+ard.shiftOutBuffer(2, 3, MSBFIRST, bytes([0xFF, 0x00, 0xAA]))
+print(ard.shiftInBuffer(2, 3, MSBFIRST, 2, halfPeriod=5))   # 100 kHz clock
+
+#### See what the link is doing.
+ard.enable_stats(sample=16)                 # time one request in 16
+print(ard.GPIOR0)
+stats = ard.stats()
+print(stats["pipes"][0], stats["bad_frames"], stats["requests"]["latency"]["READ_IO8"]["p99"])
+
 #### Use interrupts.
 
 # Write a function...
 x = 0
-busy = False
 def cb():
-    global x, busy
-    if busy: return
-    busy = True
+    global x
     x += 10
     if x > 255: x = 0
     print("x=" + str(x))
     ard.analogWrite(ard.LED_BUILTIN, x)
     sleep(0.1)
-    busy = False
+
+# Ignore the interrupt while the callback is still running from the last one.
+ard.setInterruptPolicy("INT6_vect", DROP_IF_BUSY)
 
 # Attach it to INT0 (on PIND0)
 ard.DDRD  &= invert(1 << ard.DDD0)    # Set as input. Use invert() rather than ~operator.
@@ -60,4 +117,39 @@ ard.INT6_vect = cb                    # Attach the callback function to the ISR.
 
 # Or do it the Arduino way - pin 7 is Interrupt 4 (INT0)
 ard.pinMode(7, INPUT_PULLUP)
-ard.attachInterrupt(4, cb, CHANGE)
\ No newline at end of file
+ard.attachInterrupt(4, cb, CHANGE)
+
+#### Run the same operations on many boards at once.
+from fleet import AVRFleet
+with AVRFleet() as fleet:
+    fleet.connect()                         # every USB serial port; returns the ones that failed
+    fleet.write("DDRB", 0xFF)
+    print(fleet.read("PINB"))               # {port: value, ...}
+    print(fleet.run(lambda board: board.analogRead(board.A0)))
+
+#### Use asyncio.
+import asyncio
+from aioavr import AsyncArduino
+
+ard.disconnect()    # a serial port can only be opened by one connection at a time
+
+async def blink():
+    aard = AsyncArduino(Leonardo())
+    await aard.connect()
+    await aard.pinMode(13, OUTPUT)
+    print(await asyncio.gather(aard.avr.read("DDRC"), aard.analogRead(aard.arduino.A0)))  # both in flight at once
+
+    # Turn the LED on and off for the next 10 interrupts, or give up after 10 seconds
+    async def on_interrupts():
+        events = 0
+        async for vector in aard.avr.interruptEvents("INT6_vect"):
+            events += 1
+            await aard.digitalWrite(13, events % 2)
+            if events == 10: break
+    try:
+        await asyncio.wait_for(on_interrupts(), 10)
+    except asyncio.TimeoutError:
+        pass
+    aard.disconnect()
+
+asyncio.run(blink())
@@ -3,6 +3,7 @@
 // Pipe addresses
 #define REGISTER_PIPE   0x00
 #define INTERRUPT_PIPE  0x01
+#define ADC_PIPE        0x02
 
 // Operation tokens
 #define READ_IO8        0x01
@@ -13,10 +14,43 @@
 #define WRITE_IO16      0xF2
 #define WRITE_MEM8      0xF3
 #define WRITE_MEM16     0xF4
+#define READ_BLOCK      0x05    // Followed by the high byte of the data space address and a length. Replies with the bytes.
+#define WRITE_BLOCK     0xF5    // Followed by the high byte of the data space address, a length and the bytes.
+#define REGISTER_BATCH  0x10
+#define REGISTER_SEQ    0x11    // A batch whose first byte is a sequence ID, echoed at the start of the reply
+#define GET_VERSION     0x0F
+#define SET_BAUD        0x12    // Followed by a baud rate (uint32). Replies 1 and switches to it after the reply, or 0.
+#define CONFIRM_BAUD    0x13    // Keeps the new rate. Without it the old rate is restored after BAUD_CONFIRM_MS.
+#define SET_FRAMING     0x14    // Followed by a Piper framing version. Replies 1 and switches to it after the reply, or 0.
+#define ANALOG_READ     0x20    // The address byte is the ADC channel, followed by the reference. Replies with ADC.
+#define SHIFT_OUT       0x21    // The address byte is the bit order. Followed by the data PORT's data space address and
+                                // mask, the clock PORT's address and mask, the half clock period (us), the length and the
+                                // bytes.
+#define SHIFT_IN        0x22    // As SHIFT_OUT, with the data PIN's address and no bytes. Replies with the bytes.
+
+#define FIRMWARE_VERSION 9
+
+// Bit operation tokens. The low nibble is the register's read token, e.g. SET_BITS | READ_IO8.
+#define SET_BITS        0xB0
+#define CLEAR_BITS      0xC0
+#define TOGGLE_BITS     0xD0
+#define UPDATE_BITS     0xE0
+#define WAIT_BITS       0xA0    // Followed by mask, value and timeout (uint16 ms). Replies 1 when (reg & mask) == value.
 
 #define INT_ENABLE      0x01
 #define INT_DISABLE     0x00
 
+// ADC_PIPE commands
+#define ADC_START       0x01    // Followed by the samples per block and the channels to scan
+#define ADC_STOP        0x00
+
+#define BAUD_CONFIRM_MS 500
+uint32_t baudRate = 38400;
+uint32_t previousBaudRate;
+uint32_t pendingBaudRate = 0;   // switched to by loop() once the reply to SET_BAUD has been sent
+uint8_t baudUnconfirmed = 0;
+uint16_t baudSwitchTime;
+
 #define NUM_VECTORS     43
 uint8_t interruptEnabled[NUM_VECTORS];
 
@@ -24,21 +58,52 @@ uint8_t interruptEnabled[NUM_VECTORS];
 volatile uint8_t triggeredInterruptsQueue[MAX_INTERRUPT_QUEUE];
 volatile uint8_t triggeredInterruptsIndex;
 
+// ADC streaming. The host sets up Timer1 to trigger conversions, and the ADC ISR stores each sample and selects the
+// next channel. Samples are collected in two blocks, so one can be filled while loop() sends the other.
+// A block packet is: sequence number, samples dropped since the last block (up to 255), then the samples (uint16).
+#define ADC_BLOCK_MAX       64
+#define ADC_MAX_CHANNELS    16
+volatile uint8_t adcStreaming;
+uint8_t adcChannels[ADC_MAX_CHANNELS];
+uint8_t adcNumChannels;
+uint8_t adcBlockLength;
+volatile uint8_t adcChannelIndex;
+uint8_t adcBlocks[2][2 + 2 * ADC_BLOCK_MAX];
+volatile uint8_t adcBlockCount[2];
+volatile uint8_t adcBlockReady[2];
+volatile uint8_t adcFilling;
+volatile uint8_t adcOverruns;
+uint8_t adcSending;
+uint8_t adcSequence;
+
 Piper piper;
 
 void registerPipeRead(Stream& packet);
+void setBaud(Stream& packet);
+void updateBaud();
+void registerOp(uint8_t *ptr, uint8_t token, Stream& packet);
+void modifyBits(uint8_t *ptr, uint8_t token, Stream& packet);
+void analogReadOp(uint8_t channel, Stream& packet);
+void waitBits(uint8_t *ptr, uint8_t token, Stream& packet);
+void blockOp(uint8_t *ptr, uint8_t token, Stream& packet);
+void shiftOp(uint8_t bitOrder, uint8_t token, Stream& packet);
 void interruptPipeRead(Stream& packet);
+void adcPipeRead(Stream& packet);
+void selectAdcChannel(uint8_t channel);
+void sendAdcBlock();
 void triggerInterrupt(uint8_t vectorNumber);
 
 void setup() {
     for (uint8_t i = 0; i < NUM_VECTORS; i++) {
         interruptEnabled[i] = INT_DISABLE;
     }
-    Serial.begin(38400);
+    Serial.begin(baudRate);
     piper = Piper(Serial);
     triggeredInterruptsIndex = 0;
     piper.setReadCallback(REGISTER_PIPE, registerPipeRead);
     piper.setReadCallback(INTERRUPT_PIPE, interruptPipeRead);
+    piper.setReadCallback(ADC_PIPE, adcPipeRead);
+    adcStreaming = 0;
 }
 
 void loop() {
@@ -51,6 +116,8 @@ void loop() {
         //piper.writePacket(INTERRUPT_PIPE, (uint8_t*)&triggeredInterruptsIndex, 1);
     }
     sei();
+    updateBaud();
+    sendAdcBlock();
     if (Serial.available()) piper.readPacketFromStream();
 }
 
@@ -63,9 +130,81 @@ void triggerInterrupt(uint8_t vectorNumber) {
 
 void registerPipeRead(Stream& packet) {
 
-    uint8_t *ptr = (uint8_t*)packet.read();
+    uint8_t address = packet.read();
+    uint8_t *ptr = (uint8_t*)address;
     uint8_t token = packet.read();
 
+    if (token == REGISTER_BATCH || token == REGISTER_SEQ) {
+      // For REGISTER_SEQ the address byte is the sequence ID, and the reply always starts with it.
+      if (token == REGISTER_SEQ) packet.write(address);
+
+      // The rest of the packet is a list of operations. Read values are all sent back in the one reply.
+      while (packet.available()) {
+        ptr = (uint8_t*)packet.read();
+        token = packet.read();
+        registerOp(ptr, token, packet);
+      }
+    } else if (token == GET_VERSION) {
+      packet.write(FIRMWARE_VERSION);
+    } else if (token == SET_BAUD) {
+      setBaud(packet);
+    } else if (token == CONFIRM_BAUD) {
+      baudUnconfirmed = 0;
+      packet.write(1);
+    } else if (token == SET_FRAMING) {
+      uint8_t version = packet.read();
+      if (version == FRAMING_V1 || version == FRAMING_V2) {
+        piper.setFraming(version);
+        packet.write(1);
+      } else {
+        packet.write(0);
+      }
+    } else {
+      registerOp(ptr, token, packet);
+    }
+}
+
+// Accept a new baud rate if the UART can get within 2% of it. USB CDC (the 32U4's Serial) runs at USB speed whatever
+// the rate, so it accepts any.
+void setBaud(Stream& packet) {
+    uint32_t rate = 0;
+    for (uint8_t i = 0; i < 4; i++) rate |= (uint32_t)packet.read() << (8 * i);
+    if (rate == 0) {
+      packet.write(0);
+      return;
+    }
+#if !defined(USBCON)
+    // With U2X the UART's rate is F_CPU / (8 * (UBRR + 1))
+    uint32_t ubrr = (F_CPU / 4 / rate - 1) / 2;
+    uint32_t actual = F_CPU / (8 * (ubrr + 1));
+    if (ubrr > 4095 || (actual > rate ? actual - rate : rate - actual) * 50 > rate) {
+      packet.write(0);
+      return;
+    }
+#endif
+    packet.write(1);
+    pendingBaudRate = rate;
+}
+
+// Switch to a rate accepted by setBaud(), and go back to the old one if the host doesn't confirm it in time.
+void updateBaud() {
+    if (pendingBaudRate) {
+      Serial.flush();
+      previousBaudRate = baudRate;
+      baudRate = pendingBaudRate;
+      pendingBaudRate = 0;
+      Serial.begin(baudRate);
+      baudSwitchTime = millis();
+      baudUnconfirmed = 1;
+    } else if (baudUnconfirmed && (uint16_t)((uint16_t)millis() - baudSwitchTime) >= BAUD_CONFIRM_MS) {
+      baudRate = previousBaudRate;
+      baudUnconfirmed = 0;
+      Serial.begin(baudRate);
+    }
+}
+
+void registerOp(uint8_t *ptr, uint8_t token, Stream& packet) {
+
     if (token == READ_IO8) {
       packet.write(_SFR_IO8(ptr));
       
@@ -93,14 +232,217 @@ void registerPipeRead(Stream& packet) {
     } else if(token == WRITE_MEM16) {
       _SFR_MEM8(ptr++) = packet.read();
       _SFR_MEM8(ptr) = packet.read();
+
+    } else if (token >= SET_BITS && token < WRITE_IO8) {
+      modifyBits(ptr, token, packet);
+
+    } else if (token > WAIT_BITS && token <= (WAIT_BITS | READ_MEM16)) {
+      waitBits(ptr, token, packet);
+
+    } else if (token == READ_BLOCK || token == WRITE_BLOCK) {
+      blockOp(ptr, token, packet);
+
+    } else if (token == SHIFT_OUT || token == SHIFT_IN) {
+      shiftOp((uint8_t)(uint16_t)ptr, token, packet);
+
+    } else if (token == ANALOG_READ) {
+      analogReadOp((uint8_t)(uint16_t)ptr, packet);
     }
     
 }
 
+// Read-modify-write of a register with interrupts disabled so an ISR can't change it in between.
+void modifyBits(uint8_t *ptr, uint8_t token, Stream& packet) {
+    uint8_t op = token & 0xF0;
+    uint8_t readToken = token & 0x0F;
+    uint8_t width = (readToken == READ_IO16 || readToken == READ_MEM16) ? 2 : 1;
+    volatile uint8_t *reg = (readToken == READ_IO8 || readToken == READ_IO16) ? &_SFR_IO8(ptr) : &_SFR_MEM8(ptr);
+    uint8_t mask[2], value[2], i;
+
+    for (i = 0; i < width; i++) mask[i] = packet.read();
+    for (i = 0; i < width; i++) value[i] = (op == UPDATE_BITS) ? packet.read() : (op == SET_BITS ? mask[i] : 0);
+
+    uint8_t oldSREG = SREG;
+    cli();
+    // 16-bit registers are read low byte first and written high byte first
+    uint8_t regValue[2];
+    for (i = 0; i < width; i++) regValue[i] = reg[i];
+    for (i = width; i > 0; i--) {
+      if (op == TOGGLE_BITS) {
+        reg[i - 1] = regValue[i - 1] ^ mask[i - 1];
+      } else {
+        reg[i - 1] = (regValue[i - 1] & ~mask[i - 1]) | (value[i - 1] & mask[i - 1]);
+      }
+    }
+    SREG = oldSREG;
+}
+
+// Poll a register until the bits in mask match value, so the host doesn't have to poll it over serial.
+// Replies 1 if they matched, or 0 if the timeout expired first. Other packets wait until it finishes.
+void waitBits(uint8_t *ptr, uint8_t token, Stream& packet) {
+    uint8_t readToken = token & 0x0F;
+    uint8_t width = (readToken == READ_IO16 || readToken == READ_MEM16) ? 2 : 1;
+    volatile uint8_t *reg = (readToken == READ_IO8 || readToken == READ_IO16) ? &_SFR_IO8(ptr) : &_SFR_MEM8(ptr);
+    uint8_t mask[2], value[2], i, matched;
+
+    for (i = 0; i < width; i++) mask[i] = packet.read();
+    for (i = 0; i < width; i++) value[i] = packet.read() & mask[i];
+    uint16_t timeout = packet.read();
+    timeout |= (uint16_t)packet.read() << 8;
+
+    uint16_t start = millis();
+    while (true) {
+      matched = 1;
+      for (i = 0; i < width; i++) {
+        if ((reg[i] & mask[i]) != value[i]) matched = 0;
+      }
+      if (matched || (uint16_t)((uint16_t)millis() - start) >= timeout) break;
+    }
+    packet.write(matched);
+}
+
+// Read or write a range of data space. The address byte before the token is the low byte of its address.
+// Bytes are copied in address order, so 16-bit registers that must be written high byte first need WRITE_IO16/MEM16.
+void blockOp(uint8_t *ptr, uint8_t token, Stream& packet) {
+    volatile uint8_t *mem = (volatile uint8_t*)((uint16_t)ptr | ((uint16_t)packet.read() << 8));
+    uint8_t length = packet.read();
+    for (uint8_t i = 0; i < length; i++) {
+      if (token == READ_BLOCK) packet.write(mem[i]);
+      else mem[i] = packet.read();
+    }
+}
+
+// Set or clear bits of a port with interrupts disabled, as digitalWrite() does, so an ISR can't change it in between.
+static inline void writePortBits(volatile uint8_t *port, uint8_t mask, uint8_t high) {
+    uint8_t oldSREG = SREG;
+    cli();
+    if (high) *port |= mask;
+    else *port &= ~mask;
+    SREG = oldSREG;
+}
+
+// shiftOut() and shiftIn() from wiring_shift.c, for a whole buffer. The clock idles low.
+void shiftOp(uint8_t bitOrder, uint8_t token, Stream& packet) {
+    volatile uint8_t *data = (volatile uint8_t*)(uint16_t)packet.read();
+    uint8_t dataMask = packet.read();
+    volatile uint8_t *clock = (volatile uint8_t*)(uint16_t)packet.read();
+    uint8_t clockMask = packet.read();
+    uint8_t halfPeriod = packet.read();
+    uint8_t length = packet.read();
+
+    for (uint8_t n = 0; n < length; n++) {
+      uint8_t value = (token == SHIFT_OUT) ? packet.read() : 0;
+      for (uint8_t i = 0; i < 8; i++) {
+        uint8_t bit = (bitOrder == LSBFIRST) ? (1 << i) : (0x80 >> i);
+        if (token == SHIFT_OUT) writePortBits(data, dataMask, value & bit);
+        writePortBits(clock, clockMask, 1);
+        if (halfPeriod) delayMicroseconds(halfPeriod);
+        if (token == SHIFT_IN && (*data & dataMask)) value |= bit;
+        writePortBits(clock, clockMask, 0);
+        if (halfPeriod) delayMicroseconds(halfPeriod);
+      }
+      if (token == SHIFT_IN) packet.write(value);
+    }
+}
+
+// A whole conversion, as in analogRead() from wiring_analog.c, so the host doesn't have to poll ADSC over serial.
+void analogReadOp(uint8_t channel, Stream& packet) {
+    uint8_t reference = packet.read();
+#if defined(MUX5)
+    // MUX5 selects channels 8 to 15
+    ADCSRB = (ADCSRB & ~(1 << MUX5)) | (((channel >> 3) & 0x01) << MUX5);
+#endif
+    ADMUX = (reference << 6) | (channel & 0x07);
+    ADCSRA |= (1 << ADSC);
+    while (ADCSRA & (1 << ADSC));
+    // ADCL must be read first, it locks ADCH until ADCH is read
+    uint8_t low = ADCL;
+    uint8_t high = ADCH;
+    packet.write(low);
+    packet.write(high);
+}
+
 void interruptPipeRead(Stream& packet) {
     interruptEnabled[packet.read()] = packet.read();
 }
 
+// Any command stops the stream and discards blocks that haven't been sent
+void adcPipeRead(Stream& packet) {
+    adcStreaming = 0;
+    for (uint8_t i = 0; i < 2; i++) {
+        adcBlockCount[i] = 0;
+        adcBlockReady[i] = 0;
+    }
+    if (packet.read() != ADC_START) return;
+
+    adcBlockLength = packet.read();
+    if (adcBlockLength > ADC_BLOCK_MAX) adcBlockLength = ADC_BLOCK_MAX;
+    adcNumChannels = 0;
+    while (packet.available() && adcNumChannels < ADC_MAX_CHANNELS) adcChannels[adcNumChannels++] = packet.read();
+    if (adcNumChannels == 0 || adcBlockLength == 0) return;
+
+    adcFilling = 0;
+    adcSending = 0;
+    adcOverruns = 0;
+    adcSequence = 0;
+    adcChannelIndex = 0;
+    selectAdcChannel(adcChannels[0]);
+    adcStreaming = 1;
+}
+
+// Keeps the reference and ADLAR bits of ADMUX
+void selectAdcChannel(uint8_t channel) {
+#if defined(MUX5)
+    ADCSRB = (ADCSRB & ~(1 << MUX5)) | (((channel >> 3) & 0x01) << MUX5);
+#endif
+    ADMUX = (ADMUX & 0xE0) | (channel & 0x07);
+}
+
+// Send the next filled block, if there is one
+void sendAdcBlock() {
+    if (!adcBlockReady[adcSending]) return;
+    uint8_t *block = adcBlocks[adcSending];
+    block[0] = adcSequence++;
+    cli();
+    block[1] = adcOverruns;
+    adcOverruns = 0;
+    sei();
+    piper.writePacket(ADC_PIPE, block, 2 + 2 * adcBlockLength);
+    adcBlockReady[adcSending] = 0;
+    adcSending ^= 1;
+}
+
+ISR(ADC_vect) {
+    if (!adcStreaming) {
+        triggerInterrupt(29);
+        return;
+    }
+    uint8_t low = ADCL;
+    uint8_t high = ADCH;
+    // Conversions are triggered by the rising edge of OCF1B, so it has to be cleared for the next one
+    TIFR1 = (1 << OCF1B);
+
+    // Blocks start at the first channel, so after an overrun samples are dropped until the scan comes round again
+    uint8_t count = adcBlockCount[adcFilling];
+    if (adcBlockReady[adcFilling] || (count == 0 && adcChannelIndex != 0)) {
+        if (adcOverruns < 0xFF) adcOverruns++;
+    } else {
+        uint8_t *block = adcBlocks[adcFilling];
+        block[2 + 2 * count] = low;
+        block[3 + 2 * count] = high;
+        if (++count == adcBlockLength) {
+            adcBlockCount[adcFilling] = 0;
+            adcBlockReady[adcFilling] = 1;
+            adcFilling ^= 1;
+        } else {
+            adcBlockCount[adcFilling] = count;
+        }
+    }
+
+    if (++adcChannelIndex == adcNumChannels) adcChannelIndex = 0;
+    selectAdcChannel(adcChannels[adcChannelIndex]);
+}
+
 ISR(INT0_vect) { triggerInterrupt(1); }
 ISR(INT1_vect) { triggerInterrupt(2); }
 ISR(INT2_vect) { triggerInterrupt(3); }
@@ -123,7 +465,6 @@ ISR(USART1_RX_vect) { triggerInterrupt(25); }
 ISR(USART1_UDRE_vect) { triggerInterrupt(26); }
 ISR(USART1_TX_vect) { triggerInterrupt(27); }
 ISR(ANALOG_COMP_vect) { triggerInterrupt(28); }
-ISR(ADC_vect) { triggerInterrupt(29); }
 ISR(EE_READY_vect) { triggerInterrupt(30); }
 ISR(TIMER3_CAPT_vect) { triggerInterrupt(31); }
 ISR(TIMER3_COMPA_vect) { triggerInterrupt(32); }
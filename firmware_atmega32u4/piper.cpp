@@ -11,6 +11,8 @@
 Piper::Piper(Stream& stream) {
 	streamp = &stream;
 	writeLength = 0;
+	framingVersion = FRAMING_V1;
+	pendingFraming = 0;
 	
 	for (uint8_t i = 0; i < MAX_READ_CALLBACKS; i++) {
 		callbacks[i] = NULL;
@@ -18,6 +20,10 @@ Piper::Piper(Stream& stream) {
 }
 
 void Piper::writePacket(uint8_t pipeId, uint8_t *data, uint8_t dataLength) {
+	if (framingVersion == FRAMING_V2) {
+		writeFrame(pipeId, data, dataLength);
+		return;
+	}
 	streamp->write(PACKET_BEGIN);
 	streamp->write(pipeId);
 	streamp->write(dataLength);
@@ -26,8 +32,12 @@ void Piper::writePacket(uint8_t pipeId, uint8_t *data, uint8_t dataLength) {
 }
 
 void Piper::writeBegin(uint8_t pipeId) {
-	streamp->write(PACKET_BEGIN);
-	streamp->write(pipeId);
+	// A version 2 frame can't be started until its data is known
+	writePipeId = pipeId;
+	if (framingVersion == FRAMING_V1) {
+		streamp->write(PACKET_BEGIN);
+		streamp->write(pipeId);
+	}
 }
 
 uint8_t Piper::write(uint8_t data) {
@@ -54,12 +64,51 @@ uint8_t Piper::write(uint8_t *data, uint8_t dataLength) {
 }
 
 void Piper::writeEnd() {
-	streamp->write(writeLength);
-	streamp->write(writeBuffer, writeLength);
-	streamp->write(PACKET_END);
+	if (framingVersion == FRAMING_V2) {
+		writeFrame(writePipeId, writeBuffer, writeLength);
+	} else {
+		streamp->write(writeLength);
+		streamp->write(writeBuffer, writeLength);
+		streamp->write(PACKET_END);
+	}
 	writeLength = 0;
 }
 
+void Piper::setFraming(uint8_t version) {
+	pendingFraming = version;
+}
+
+// Byte i of a version 2 frame before encoding: pipe ID, data, CRC
+static inline uint8_t frameByte(uint8_t pipeId, uint8_t *data, uint8_t dataLength, uint16_t crc, uint16_t i) {
+	if (i == 0) return pipeId;
+	if (i <= dataLength) return data[i - 1];
+	return i == dataLength + 1 ? (uint8_t)crc : (uint8_t)(crc >> 8);
+}
+
+void Piper::writeFrame(uint8_t pipeId, uint8_t *data, uint8_t dataLength) {
+	uint16_t crc = _crc_xmodem_update(0xFFFF, pipeId);
+	for (uint8_t i = 0; i < dataLength; i++) {
+		crc = _crc_xmodem_update(crc, data[i]);
+	}
+	
+	// COBS: each run of up to 254 non-zero bytes is sent after a code byte of its length + 1. The code stands for the
+	// zero that ends the run, except after a run of 254 (code 0xFF) or at the end of the frame.
+	uint16_t n = (uint16_t)dataLength + 3;
+	uint16_t i = 0;
+	while (true) {
+		uint16_t j = i;
+		while (j < n && j - i < 0xFE && frameByte(pipeId, data, dataLength, crc, j) != 0) j++;
+		streamp->write((uint8_t)(j - i + 1));
+		for (uint16_t k = i; k < j; k++) {
+			streamp->write(frameByte(pipeId, data, dataLength, crc, k));
+		}
+		if (j >= n) break;
+		// A run stopped by a zero skips it, but a full run's code doesn't stand for the byte after it
+		i = j - i == 0xFE ? j : j + 1;
+	}
+	streamp->write(FRAME_DELIMITER);
+}
+
 void Piper::setReadCallback(uint8_t pipeId, ReadCallback callback) {	
 	if (pipeId < MAX_READ_CALLBACKS) {
 		callbacks[pipeId] = callback;
@@ -69,12 +118,16 @@ void Piper::setReadCallback(uint8_t pipeId, ReadCallback callback) {
 void Piper::readPacketFromStream() {
 	uint8_t pipeId, endByte = 0x00;
 	
-	while (endByte != PACKET_END) {
-		while (readByte() != PACKET_BEGIN) ;	
-		pipeId = readByte();	
-		readLength = readByte();
-		readBytes(readBuffer, readLength);	
-		endByte = readByte();
+	if (framingVersion == FRAMING_V2) {
+		pipeId = readFrame();
+	} else {
+		while (endByte != PACKET_END) {
+			while (readByte() != PACKET_BEGIN) ;	
+			pipeId = readByte();	
+			readLength = readByte();
+			readBytes(readBuffer, readLength);	
+			endByte = readByte();
+		}
 	}
 	
 	if (pipeId < MAX_READ_CALLBACKS && callbacks[pipeId] != NULL) {
@@ -83,6 +136,59 @@ void Piper::readPacketFromStream() {
 		ps.flush();
 	}
 	
+	// Switch only after the reply, which the host reads in the old framing
+	if (pendingFraming) {
+		framingVersion = pendingFraming;
+		pendingFraming = 0;
+	}
+}
+
+// Store byte index of a decoded version 2 frame: the pipe ID, then the data and CRC in buffer
+static inline bool storeFrameByte(uint8_t *pipeId, uint8_t *buffer, uint16_t index, uint8_t b) {
+	if (index == 0) {
+		*pipeId = b;
+	} else if (index <= MAX_DATA_LENGTH + 2) {
+		buffer[index - 1] = b;
+	} else {
+		return false;
+	}
+	return true;
+}
+
+// Read version 2 frames until one is good, decoding COBS as the bytes arrive. A corrupted frame is dropped at its
+// delimiter, so the frame after it is read whole.
+uint8_t Piper::readFrame() {
+	while (true) {
+		uint8_t pipeId = 0;
+		uint16_t length = 0;		// decoded bytes: pipe ID, data and CRC
+		uint8_t remaining = 0;		// bytes left in the current COBS run
+		bool zeroPending = false;	// whether the last run ends in a zero, which is only decoded if another run follows
+		bool valid = true;
+		uint8_t b;
+		
+		while ((b = readByte()) != FRAME_DELIMITER) {
+			if (remaining == 0) {
+				// A code byte, starting the next run
+				if (zeroPending) valid &= storeFrameByte(&pipeId, readBuffer, length++, 0);
+				remaining = b - 1;
+				zeroPending = b < 0xFF;
+			} else {
+				valid &= storeFrameByte(&pipeId, readBuffer, length++, b);
+				remaining--;
+			}
+		}
+		
+		// A delimiter in the middle of a run means bytes were lost
+		if (!valid || remaining != 0 || length < 3) continue;
+		readLength = length - 3;
+		uint16_t crc = _crc_xmodem_update(0xFFFF, pipeId);
+		for (uint8_t i = 0; i < readLength; i++) {
+			crc = _crc_xmodem_update(crc, readBuffer[i]);
+		}
+		if (readBuffer[readLength] == (uint8_t)crc && readBuffer[readLength + 1] == (uint8_t)(crc >> 8)) {
+			return pipeId;
+		}
+	}
 }
 
 void Piper::start() {
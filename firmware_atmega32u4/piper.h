@@ -8,13 +8,20 @@
 #define ROBOT_PIPER_H
 
 #include <Arduino.h>
+#include <util/crc16.h>
 
 #define PACKET_BEGIN 		0xBE
 #define PACKET_END 			0xEF
 #define MAX_PIPE_ID 		0xFF
 #define MAX_DATA_LENGTH		0xFF
 
-#define MAX_READ_CALLBACKS	2
+/* Framing versions. Version 1 is PACKET_BEGIN, pipe ID, length, data, PACKET_END. Version 2 is the COBS encoding of
+** pipe ID, data and CRC-16/CCITT-FALSE (little endian), ended by FRAME_DELIMITER, which can't appear in the encoding. */
+#define FRAMING_V1			1
+#define FRAMING_V2			2
+#define FRAME_DELIMITER		0x00
+
+#define MAX_READ_CALLBACKS	3
 
 /******************************************************************************
 ** Piper - pseudo-asynchronous only.
@@ -41,6 +48,12 @@ class Piper {
 		
 		/* Send the write-buffer's length and contents, and the PACKET_END token. */
 		void writeEnd();
+		
+		/* Change the framing version once the reply to the packet being read has been sent. */
+		void setFraming(uint8_t version);
+		
+		/* The framing version in use. */
+		uint8_t framing() { return framingVersion; }
 
 		typedef void (*ReadCallback)(Stream&);
 		
@@ -65,11 +78,18 @@ class Piper {
 		
 		uint8_t writeBuffer[MAX_DATA_LENGTH];
 		uint8_t writeLength;
+		uint8_t writePipeId;
 		
-		uint8_t readBuffer[MAX_DATA_LENGTH];
+		// Version 2 frames are decoded with their CRC on the end
+		uint8_t readBuffer[MAX_DATA_LENGTH + 2];
 		uint8_t readLength;
 		ReadCallback callbacks[MAX_READ_CALLBACKS];
 		
+		uint8_t framingVersion;
+		uint8_t pendingFraming;
+		
+		void writeFrame(uint8_t pipeId, uint8_t *data, uint8_t dataLength);
+		uint8_t readFrame();
 		void readBytes(uint8_t *buffer, uint8_t length);
 		uint8_t readByte();
 		volatile bool stopped;
@@ -0,0 +1,164 @@
+"""
+fleet.py
+Many boards attached to one host, connected and operated on together. The boards share their chip definitions (see
+AVR.load()), their serial ports are read by one thread where the platform allows it, and operations on every board are
+all sent before any of the replies are waited for.
+
+    fleet = AVRFleet()
+    fleet.connect()                     # every USB serial port
+    print(fleet.read("PINB"))           # {'/dev/ttyACM0': 0x12, '/dev/ttyACM1': 0x34, ...}
+    fleet.write("PORTB", 0xFF)
+
+Samuel Brian
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from avr import AVR, Batch
+from piper import PiperReader
+
+
+class AVRFleet:
+
+    ## Construct an AVRFleet. Boards are created and connected by connect().
+    # @param board_class The class of the boards, e.g. Leonardo. It is constructed with no arguments.
+    # @param workers [int] Number of threads for connect() and run().
+    def __init__(self, board_class=None, workers=8):
+        if board_class is None:
+            from leonardo import Leonardo
+            board_class = Leonardo
+        self.board_class = board_class
+        self.boards = {}            # port name -> connected board, in the order they were connected
+        self._pool = ThreadPoolExecutor(workers)
+        # select() doesn't work on serial ports on Windows, so there each board keeps its own read thread
+        self._reader = PiperReader() if os.name == "posix" else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __getitem__(self, port):
+        return self.boards[port]
+
+    def __iter__(self):
+        return iter(self.boards.values())
+
+    def __len__(self):
+        return len(self.boards)
+
+    ## Find serial ports that could be boards.
+    # @param match A function taking a port's ListPortInfo and returning whether to use it. Defaults to every USB port.
+    # @return [list] Port names.
+    def discover(self, match=None):
+        if match is None: match = lambda info: info.vid is not None
+        return [info.device for info in AVR.list_ports() if match(info)]
+
+    ## Connect to boards, all at once.
+    # @param ports Port names, or None for discover().
+    # @return [dict] port name -> Exception for the ports that couldn't be connected. The others are in boards.
+    def connect(self, ports=None, baudrate=38400):
+        ports = [port for port in (self.discover() if ports is None else ports) if port not in self.boards]
+        futures = [(port, self._pool.submit(self._connect, port, baudrate)) for port in ports]
+        failed = {}
+        for port, future in futures:
+            try:
+                self.boards[port] = future.result()
+            except Exception as e:
+                failed[port] = e
+        return failed
+
+    ## Disconnect from every board.
+    def disconnect(self):
+        boards, self.boards = self.boards, {}
+        for board in boards.values(): board.disconnect()
+
+    ## Disconnect from every board and stop the fleet's threads.
+    def close(self):
+        self.disconnect()
+        self._pool.shutdown()
+        if self._reader is not None: self._reader.close()
+
+    ## Call a function with every board, on the fleet's threads.
+    # @param function A function taking a board and then args.
+    # @param return_exceptions [bool] Whether an exception is returned as the port's result, rather than raised once
+    #                          every call has finished.
+    # @return [dict] port name -> the function's result.
+    def run(self, function, *args, return_exceptions=False):
+        futures = [(port, self._pool.submit(function, board, *args)) for port, board in self.boards.items()]
+        results, failed = {}, []
+        for port, future in futures:
+            try:
+                results[port] = future.result()
+            except Exception as e:
+                results[port] = e
+                failed.append(port)
+        if failed and not return_exceptions:
+            raise Exception("Failed on {0} of {1} boards: {2}".format(
+                len(failed), len(futures), ", ".join("{0}: {1!r}".format(port, results[port]) for port in failed)))
+        return results
+
+    ## Start a batch of register operations that is done on every board, see FleetBatch.
+    def batch(self):
+        return FleetBatch(self)
+
+    ## Read a register of every board.
+    # @return [dict] port name -> value.
+    def read(self, register_name):
+        with self.batch() as batch:
+            results = batch.read(register_name)
+        return dict((port, result.value) for port, result in results.items())
+
+    ## Read several registers of every board.
+    # @return [dict] port name -> list of values, in the same order as the names.
+    def read_many(self, *register_names):
+        with self.batch() as batch:
+            for name in register_names: batch.read(name)
+        return batch.results
+
+    ## Write a register of every board.
+    def write(self, register_name, value):
+        with self.batch() as batch:
+            batch.write(register_name, value)
+
+    """ Private functions """
+
+    def _connect(self, port, baudrate):
+        board = self.board_class()
+        board._reader = self._reader
+        board.connect(port, baudrate)
+        return board
+
+
+class FleetBatch:
+
+    ## Construct a FleetBatch, which queues each operation on a Batch for every board. It has the methods of Batch,
+    # returning a dict of port name -> what the Batch method returned (e.g. a BatchResult for read()).
+    #   with fleet.batch() as batch:
+    #       batch.write("DDRB", 0xFF)
+    #       pinb = batch.read("PINB")
+    #   print(dict((port, result.value) for port, result in pinb.items()))
+    def __init__(self, fleet):
+        self.batches = dict((port, Batch(board)) for port, board in fleet.boards.items())
+        self.results = {}   # port name -> read values, filled in by send()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def __getattr__(self, name):
+        methods = dict((port, getattr(batch, name)) for port, batch in self.batches.items())
+        def queue(*args, **kwargs):
+            return dict((port, method(*args, **kwargs)) for port, method in methods.items())
+        return queue
+
+    ## Send the queued operations to every board. Every board's packets are sent before waiting for any replies.
+    # @return [dict] port name -> the read values, in the order the reads were queued.
+    def send(self):
+        started = [(port, batch, batch._start()) for port, batch in self.batches.items()]
+        self.results = dict((port, batch._finish(pending)) for port, batch, pending in started)
+        return self.results
@@ -0,0 +1,102 @@
+"""
+linkstats.py
+Statistics of the requests an AVR sends over its link: how many of each operation, and how long their replies take, in
+histograms with a bucket per power of two microseconds. Timing is sampled, one request in every `sample`, so it can be
+left on. Turned on with AVR.enable_stats() and read with AVR.stats(), along with the Piper's packet counters.
+
+    avr.enable_stats(sample=16)
+    ...
+    print(avr.stats()["requests"]["latency"]["READ_IO8"]["p99"])
+
+Samuel Brian
+"""
+
+from threading import Lock
+
+
+class LatencyHistogram:
+
+    BUCKETS = 28    # bucket i counts latencies under 2**i microseconds (and at least half that), up to about 2 minutes
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.buckets = [0] * LatencyHistogram.BUCKETS
+
+    ## Add a latency.
+    # @param seconds [float]
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min: self.min = seconds
+        if self.max is None or seconds > self.max: self.max = seconds
+        self.buckets[min(int(seconds * 1e6).bit_length(), LatencyHistogram.BUCKETS - 1)] += 1
+
+    ## Estimate a percentile, as the top of the bucket it falls in, so it is high by less than a factor of 2.
+    # @param percent [float] 0 to 100.
+    # @return [float] Seconds, or None if nothing has been recorded.
+    def percentile(self, percent):
+        if self.count == 0: return None
+        rank = percent / 100.0 * self.count
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count > 0 and seen >= rank:
+                return min((1 << i) / 1e6, self.max)
+        return self.max
+
+    ## Get the histogram as a dict.
+    # @return [dict] count, and mean, min, max, p50, p90 and p99 in seconds (None if count is 0), and buckets.
+    def summary(self):
+        return {"count": self.count, "mean": self.total / self.count if self.count else None,
+                "min": self.min, "max": self.max, "p50": self.percentile(50), "p90": self.percentile(90),
+                "p99": self.percentile(99), "buckets": list(self.buckets)}
+
+
+class RequestStats:
+
+    ## Construct the statistics of an AVR's requests.
+    # @param sample [int] Time one request in this many. Every request is counted.
+    def __init__(self, sample=1):
+        if sample < 1: raise Exception("The sample rate must be at least 1.")
+        self.sample = sample
+        self.requests = {}      # operation name -> number of requests
+        self.latency = {}       # operation name -> LatencyHistogram of the timed requests
+        self.all = LatencyHistogram()
+        self.failed = 0         # timed requests that got no reply
+        self._countdown = 0
+        self._lock = Lock()
+
+    ## Count a request.
+    # @param name [str] The operation, e.g. "READ_IO8".
+    # @return [bool] Whether to time it, see record().
+    def count(self, name):
+        with self._lock:
+            self.requests[name] = self.requests.get(name, 0) + 1
+            self._countdown -= 1
+            if self._countdown > 0: return False
+            self._countdown = self.sample
+            return True
+
+    ## Record the latency of a timed request, or that it failed.
+    # @param reply The reply data, or None if there wasn't one.
+    def record(self, name, reply, seconds):
+        with self._lock:
+            if reply is None:
+                self.failed += 1
+                return
+            histogram = self.latency.get(name)
+            if histogram is None: histogram = self.latency[name] = LatencyHistogram()
+            histogram.record(seconds)
+            self.all.record(seconds)
+
+    ## Get the statistics as a dict.
+    # @return [dict] sample, requests (name -> count), failed, latency (name -> LatencyHistogram.summary()) and all
+    #         (the latency of every timed request).
+    def summary(self):
+        with self._lock:
+            return {"sample": self.sample, "requests": dict(self.requests), "failed": self.failed,
+                    "latency": dict((name, histogram.summary()) for name, histogram in self.latency.items()),
+                    "all": self.all.summary()}
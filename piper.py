@@ -2,12 +2,25 @@
 Piper - a simple multi-pipe communication protocol
 Allows finite sized packets over multiple pipes in a single file-like read/write stream.
 
+Packets are framed in one of two versions:
+  1: PACKET_BEGIN, pipe ID, length, data, PACKET_END. What every firmware starts with.
+  2: COBS encoding of pipe ID, data and CRC-16/CCITT-FALSE (little endian), then FRAME_DELIMITER. COBS removes every
+     zero from the frame, so the delimiter can't appear in the data: a corrupted frame is dropped at the next delimiter
+     without losing the frame after it, and the CRC stops corrupted data being delivered. Agreed with the firmware when
+     connecting, see AVR.connect().
+
 @author Samuel Brian
 """
 
-from threading import Lock, Thread
+from threading import Condition, Lock, Thread
+from collections import deque
 from struct import pack, unpack
-from time import sleep
+from binascii import crc_hqx
+import logging
+import os
+import selectors
+
+_log = logging.getLogger(__name__)
 
 class Piper():
 
@@ -15,21 +28,33 @@ class Piper():
     PACKET_END      = 0xEF
     MAX_PIPE_ID	    = 0xFF
     MAX_DATA_LENGTH	= 0xFF
+    FRAME_DELIMITER = 0x00  # ends a version 2 frame
+    # Longest version 2 frame without its delimiter: pipe ID, data and CRC, plus a COBS code byte per 254 bytes
+    MAX_FRAME_LENGTH = 1 + MAX_DATA_LENGTH + 2 + 2
 
     ## Construct a Piper.
     # @param file A file or file-like object that has read, write, flush, and close methods.
     # @param max_queue_len The maximum number of read packets to keep in memory for each pipe.
-    def __init__(self, file, max_queue_len=100):
+    # @param reader [PiperReader] Reads the file along with other Pipers' files, or None for a read thread of its own.
+    def __init__(self, file, max_queue_len=100, reader=None):
         self.file = file
         self.max_queue_len = max_queue_len
 
-        # Number of discarded bytes to read before an exception is thrown
-        self.max_discarded_bytes = 512
-        self.begin_byte  = Piper.PACKET_BEGIN.to_bytes(1, byteorder="big")
-        self.end_byte    = Piper.PACKET_END.to_bytes(1, byteorder="big")
+        # Maximum number of bytes to read from the file at once
+        self.read_size = 4096
+        self.parser = FrameParser()
+        self.framing = 1            # framing version of written packets, see set_framing()
 
         # Synchronous
-        self.read_queue = {}
+        self.read_queue = {}        # pipe_id -> deque of packets, oldest first
+        self.read_conditions = {}   # pipe_id -> Condition notified when a packet is added to the pipe's queue
+        self.queue_lock = Lock()    # guards creating the per-pipe queues and conditions
+        self.closed = False
+
+        # Counters, see stats()
+        self.bytes_received = 0     # bytes read from the file, including framing
+        self.bytes_sent = 0         # bytes written to the file, including framing
+        self.pipe_stats = {}        # pipe_id -> PipeStats
 
         # Asynchronous
         self.async_callbacks = {}
@@ -39,32 +64,52 @@ class Piper():
         self.write_lock = Lock()
 
         # Start read thread
-        Thread(target=self._read_thread).start()
+        self.reader = reader
+        if reader is None:
+            self.read_thread = Thread(target=self._read_thread)
+            self.read_thread.start()
+        else:
+            self.read_thread = None
+            self.async_start = True
+            reader.add(self)
 
     ## Close the file and stop the read thread.
     def close(self):
         self.async_start = False
+        if self.reader is not None:
+            self.reader.remove(self)
         if self.file is not None:
             self.file.close()
+        self._set_closed()
 
     ## Write a packet to a pipe.
     # @param pipe_id [int] The ID of the pipe to write the packet to.
     # @param data [string] The packet's payload data.
     # @throws Exception If the length of the data is greater than MAX_DATA_LENGTH or pipe_id is not between 0 and MAX_PIPE_ID.
     def write_packet(self, pipe_id, data):
+        packet = pack_packet(pipe_id, data, self.framing)
         with self.write_lock:
-            if data.__class__ == str:
-                data = bytes(data, "utf-8")
-
-            if len(data) > Piper.MAX_DATA_LENGTH:
-                raise Exception("Data length ({0}) is greater than maximum of {1} bytes.".format(len(data), Piper.MAX_DATA_LENGTH))
-            if pipe_id < 0 or pipe_id > Piper.MAX_PIPE_ID:
-                raise Exception("Pipe ID ({0}) is not in valid range (between 0 and {1}.".format(pipe_id, Piper.MAX_PIPE_ID))
-            packet = uint8(Piper.PACKET_BEGIN) + uint8(pipe_id) + uint8(len(data)) + data + uint8(Piper.PACKET_END)
             self.file.write(packet)
             self.file.flush()
+            stats = self.pipe_stats.get(pipe_id) or self._new_pipe_stats(pipe_id)
+            stats.packets_written += 1
+            stats.bytes_written += len(data)
+            self.bytes_sent += len(packet)
+
+    ## Change the framing version of both written and read packets. Nothing should be in flight while it changes; to
+    # switch on a reply, see FrameParser.upgrade.
+    # @param version [int] 1 or 2.
+    def set_framing(self, version):
+        self.framing = version
+        self.parser.set_version(version)
+        if version == 2:
+            # End whatever the other end has received so far, so it doesn't join the first frame
+            with self.write_lock:
+                self.file.write(uint8(Piper.FRAME_DELIMITER))
+                self.file.flush()
 
     ## Set the function to execute when a packet arrives with a particular pipe ID.
+    # The function is called from the read thread, so it should return quickly and must not wait for another packet.
     # @param pipe_id The ID of the pipe endpoint.
     # @param callback_function A function that expects the payload data as first argument.
     def set_read_callback(self, pipe_id, callback_function):
@@ -74,85 +119,401 @@ class Piper():
     # Blocks until a packet arrives in the pipe, or returns immediately if already in the queue.
     # The queue won't be filled if a read callback is set for the pipe.
     # @param pipe_id [int] The number of the pipe to be read from.
-    # @return [string|bytes] The packet's payload data.
-    def read_packet(self, pipe_id):
+    # @param timeout [float] Maximum number of seconds to wait, or None to wait forever.
+    # @return [string|bytes] The packet's payload data, or None if the timeout expired.
+    # @throws Exception If the Piper is closed while waiting.
+    def read_packet(self, pipe_id, timeout=None):
         if pipe_id < 0 or pipe_id > Piper.MAX_PIPE_ID:
             raise Exception("Pipe ID ({0}) is not in valid range (between 0 and {1}.".format(pipe_id, Piper.MAX_PIPE_ID))
-        while not (pipe_id in self.read_queue and len(self.read_queue[pipe_id]) > 0):
-            sleep(0)
-        return self.read_queue[pipe_id].pop(0)
+        queue, condition = self._get_queue(pipe_id)
+        with condition:
+            if not condition.wait_for(lambda: len(queue) > 0 or self.closed, timeout):
+                return None
+            if len(queue) == 0:
+                raise Exception("Piper closed while waiting for a packet.")
+            return queue.popleft()
 
-    """ Private functions """
+    ## Get the next packet from a pipe without blocking.
+    # @param pipe_id [int] The number of the pipe to be read from.
+    # @return [string|bytes] The packet's payload data, or None if there is no packet in the queue.
+    def poll_packet(self, pipe_id):
+        return self.read_packet(pipe_id, 0)
 
-    ## Reads a packet from the file.
-    # Blocks until a packet is read, the file ends or is closed, or max_discarded_bytes number of bytes are discarded.
-    # @return (pipe_id, data) The pipe ID of the read packet and the byte data.
-    def _read_packet_from_file(self):
-        pipe_id = None
-        data = None
-        discarded_bytes = 0
-
-        while True:
-            # Discard bytes until PACKET_BEGIN
-            ch = self._read_byte()
-            while ch != uint8(Piper.PACKET_BEGIN):
-                discarded_bytes += 1
-                print("Discarding one byte waiting for PACKET_BEGIN. {0} bytes so far.".format(discarded_bytes)) ### :(
-                if discarded_bytes >= self.max_discarded_bytes:
-                    raise Exception("Discarded {0} bytes. File probably isn't a Piper transmitter.".format(discarded_bytes))
-                ch = self._read_byte()
-
-            # Read pipe_id
-            pipe_id = uint8R(self._read_byte())
-
-            # Read data_length
-            data_length = uint8R(self._read_byte())
-
-            # Read data
-            #data = self.file.read(data_length)
-            data = b''
-            while len(data) < data_length:
-                data += self._read_byte()
-
-            ch = self._read_byte()
-            if ch != uint8(Piper.PACKET_END):
-                discarded_bytes += len(data) + 2
-                print("Packet discarded while expecting PACKET_END. {0} bytes so far.".format(discarded_bytes)) ### :(
-            else:
-                break
+    ## Get the link's counters. They count from when the Piper was constructed.
+    # @return [dict] framing, bytes_received and bytes_sent (including framing), bad_frames and dropped_bytes (see
+    #         FrameParser), and pipes: pipe_id -> dict of packets_read, bytes_read, packets_written, bytes_written (of
+    #         payload), queued (packets waiting for read_packet()) and queue_drops (packets dropped from a full queue).
+    def stats(self):
+        with self.queue_lock:
+            queued = dict((pipe_id, len(queue)) for pipe_id, queue in self.read_queue.items())
+        pipes = {}
+        for pipe_id, stats in list(self.pipe_stats.items()):
+            pipes[pipe_id] = stats.as_dict()
+            pipes[pipe_id]["queued"] = queued.get(pipe_id, 0)
+        return {"framing": self.framing, "bytes_received": self.bytes_received, "bytes_sent": self.bytes_sent,
+                "bad_frames": self.parser.bad_frames, "dropped_bytes": self.parser.dropped_bytes, "pipes": pipes}
+
+    """ Private functions """
 
-        return pipe_id, data
+    ## Reads whatever is available from the file and parses it.
+    # Blocks until at least one byte is read or the file ends or is closed.
+    # @return [list] (pipe_id, data) for each packet completed by the read.
+    def _read_packets_from_file(self):
+        # Serial ports report how much is already waiting, so read all of it (or one byte to block until data arrives).
+        # Other file-likes are read with read1() if they have it, which returns without waiting for a full buffer.
+        waiting = getattr(self.file, "in_waiting", None)
+        if waiting is not None:
+            chunk = self.file.read(min(max(waiting, 1), self.read_size))
+        elif hasattr(self.file, "read1"):
+            chunk = self.file.read1(self.read_size)
+        else:
+            chunk = self.file.read(1)
+        if len(chunk) == 0:
+            raise Exception("File closed.")
+        self.bytes_received += len(chunk)
+        return self.parser.feed(chunk)
 
     ## Private read processing function. Called by start().
     def _read_thread(self):
         self.async_start = True
         try:
             while self.async_start:
-                id, data = self._read_packet_from_file()
-                if id in self.async_callbacks and self.async_callbacks[id] is not None:
-                    Thread(target=self.async_callbacks[id], args=(data,)).start()
-                else:
-                    self._add_packet_to_queue(id, data)
+                self._read_available()
         except Exception as e:
             if self.async_start: # Exception is expected when close() closes the file during a read, else reraise
                 raise e
+        finally:
+            self._set_closed()
+
+    # Read what is available from the file and pass the completed packets to their callbacks or queues
+    def _read_available(self):
+        for id, data in self._read_packets_from_file():
+            stats = self.pipe_stats.get(id) or self._new_pipe_stats(id)
+            stats.packets_read += 1
+            stats.bytes_read += len(data)
+            if id in self.async_callbacks and self.async_callbacks[id] is not None:
+                self.async_callbacks[id](data)
+            else:
+                self._add_packet_to_queue(id, data)
 
     # Add a read packet to the read queue for reading by read_packet()
     def _add_packet_to_queue(self, pipe_id, data):
-        if pipe_id in self.read_queue:
-            if len(self.read_queue[pipe_id]) >= self.max_queue_len:
-                # Remove oldest if queue too long
-                self.read_queue[pipe_id].pop(0)
-            self.read_queue[pipe_id].append(data)
-        else:
-            self.read_queue[pipe_id] = [ data ]
+        queue, condition = self._get_queue(pipe_id)
+        with condition:
+            # The deque's maxlen removes the oldest packet if the queue is too long
+            if len(queue) == queue.maxlen:
+                self.pipe_stats[pipe_id].queue_drops += 1
+                _log.debug("Pipe %d's read queue is full, dropped its oldest packet.", pipe_id)
+            queue.append(data)
+            condition.notify()
 
-    ## Read a single byte.
-    def _read_byte(self):
-        ch = self.file.read(1)
-        if len(ch) == 0:
-            raise Exception("File closed.")
-        return ch
+    # Mark the Piper closed and wake up anything waiting in read_packet()
+    def _set_closed(self):
+        self.closed = True
+        with self.queue_lock:
+            conditions = list(self.read_conditions.values())
+        for condition in conditions:
+            with condition:
+                condition.notify_all()
+
+    # Add the counters of a pipe that hasn't been used before
+    def _new_pipe_stats(self, pipe_id):
+        return self.pipe_stats.setdefault(pipe_id, PipeStats())
+
+    # Get the read queue and condition for a pipe, creating them if this is the first use of the pipe
+    def _get_queue(self, pipe_id):
+        with self.queue_lock:
+            if pipe_id not in self.read_queue:
+                self.read_queue[pipe_id] = deque(maxlen=self.max_queue_len)
+                self.read_conditions[pipe_id] = Condition()
+            return self.read_queue[pipe_id], self.read_conditions[pipe_id]
+
+
+class PiperReader():
+
+    ## Construct a PiperReader, which reads the files of many Pipers on one thread rather than a thread for each.
+    # The files need a fileno() that works with select(): serial ports on Linux and macOS, but not on Windows.
+    # The thread is started when the first Piper is added.
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self.lock = Lock()
+        self.running = False
+        self.read_thread = None
+        # Writing to the wake pipe makes select() return, so changes to the Pipers are seen
+        self._wake_read, self._wake_write = os.pipe()
+        self.selector.register(self._wake_read, selectors.EVENT_READ, None)
+
+    ## Start reading a Piper's file. Called by Piper's constructor.
+    def add(self, piper):
+        with self.lock:
+            self.selector.register(piper.file.fileno(), selectors.EVENT_READ, piper)
+            if self.read_thread is None:
+                self.running = True
+                self.read_thread = Thread(target=self._read_thread, daemon=True)
+                self.read_thread.start()
+        self._wake()
+
+    ## Stop reading a Piper's file. Called by Piper's close().
+    def remove(self, piper):
+        with self.lock:
+            for key in list(self.selector.get_map().values()):
+                if key.data is piper: self.selector.unregister(key.fileobj)
+        self._wake()
+
+    ## Stop the read thread. The Pipers should be closed first.
+    def close(self):
+        with self.lock:
+            self.running = False
+            thread, self.read_thread = self.read_thread, None
+        self._wake()
+        if thread is not None: thread.join()
+        self.selector.close()
+        os.close(self._wake_read)
+        os.close(self._wake_write)
+
+    """ Private functions """
+
+    def _wake(self):
+        os.write(self._wake_write, b"\0")
+
+    def _read_thread(self):
+        while self.running:
+            for key, events in self.selector.select():
+                if key.data is None:
+                    os.read(self._wake_read, 512)
+                    continue
+                piper = key.data
+                try:
+                    piper._read_available()
+                except Exception as e:
+                    # One Piper failing shouldn't stop the others. Exceptions are expected when close() closes the file.
+                    self.remove(piper)
+                    if piper.async_start: _log.error("Piper read failed: %r", e)
+                    piper._set_closed()
+
+
+class PipeStats():
+
+    __slots__ = ("packets_read", "bytes_read", "packets_written", "bytes_written", "queue_drops")
+
+    ## Construct the counters of one pipe, see Piper.stats().
+    def __init__(self):
+        self.packets_read = 0
+        self.bytes_read = 0
+        self.packets_written = 0
+        self.bytes_written = 0
+        self.queue_drops = 0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in PipeStats.__slots__)
+
+
+class FrameParser():
+
+    # Version 1 parser states
+    BEGIN   = 0
+    PIPE_ID = 1
+    LENGTH  = 2
+    DATA    = 3
+    END     = 4
+
+    ## Construct a parser for a stream of Piper packets. Bytes are fed in as they arrive, in chunks of any size.
+    # @param version [int] Framing version, see set_version().
+    def __init__(self, version=1):
+        self.version = version
+        # (pipe_id, data, version) to switch to a framing version straight after a packet, in the middle of a chunk if
+        # need be, because the other end switches as soon as it has sent that packet
+        self.upgrade = None
+
+        # Number of bytes discarded since the last good packet before an exception is thrown (version 1 only; a
+        # version 2 parser can always find the next frame)
+        self.max_discarded_bytes = 512
+        self.discarded_bytes = 0
+
+        # Counters of link errors
+        self.bad_frames = 0         # version 2 frames dropped for a bad CRC or encoding
+        self.dropped_bytes = 0      # bytes that weren't part of a good packet
+
+        self.state = FrameParser.BEGIN
+        self.pipe_id = 0
+        self.data_length = 0
+        self.data = bytearray(Piper.MAX_DATA_LENGTH)   # reused for every packet
+        self.data_view = memoryview(self.data)
+        self.data_index = 0
+        self.frame = bytearray()    # version 2 frame so far
+
+    ## Change the framing version, dropping any partly received packet.
+    # @param version [int] 1 or 2.
+    def set_version(self, version):
+        if version not in (1, 2): raise Exception("Unknown Piper framing version {0}.".format(version))
+        self.version = version
+        self.state = FrameParser.BEGIN
+        self.frame = bytearray()
+        self.discarded_bytes = 0
+
+    ## Parse a chunk of bytes.
+    # @param chunk [bytes] The next bytes from the stream.
+    # @return [list] (pipe_id, data) for each packet completed by this chunk.
+    # @throws Exception If max_discarded_bytes bytes are discarded without a good version 1 packet.
+    def feed(self, chunk):
+        packets = []
+        i = 0
+        while i < len(chunk):
+            if self.version == 1:
+                i = self._feed_v1(chunk, i, packets)
+            else:
+                i = self._feed_v2(chunk, i, packets)
+        return packets
+
+    """ Private functions """
+
+    # Parse version 1 packets from chunk[i:]
+    # @return [int] Where parsing stopped: the end of the chunk, or after a packet that changed the version.
+    def _feed_v1(self, chunk, i, packets):
+        n = len(chunk)
+        while i < n:
+            state = self.state
+            if state == FrameParser.BEGIN:
+                # Skip straight to the next PACKET_BEGIN
+                begin = chunk.find(Piper.PACKET_BEGIN, i)
+                if begin < 0:
+                    self._discard(n - i)
+                    break
+                if begin > i:
+                    self._discard(begin - i)
+                self.state = FrameParser.PIPE_ID
+                i = begin + 1
+            elif state == FrameParser.PIPE_ID:
+                self.pipe_id = chunk[i]
+                self.state = FrameParser.LENGTH
+                i += 1
+            elif state == FrameParser.LENGTH:
+                self.data_length = chunk[i]
+                self.data_index = 0
+                self.state = FrameParser.DATA if self.data_length > 0 else FrameParser.END
+                i += 1
+            elif state == FrameParser.DATA:
+                # Copy as much of the payload as this chunk holds
+                count = min(self.data_length - self.data_index, n - i)
+                self.data_view[self.data_index:self.data_index + count] = chunk[i:i + count]
+                self.data_index += count
+                i += count
+                if self.data_index == self.data_length:
+                    self.state = FrameParser.END
+            else:
+                self.state = FrameParser.BEGIN
+                if chunk[i] == Piper.PACKET_END:
+                    self.discarded_bytes = 0
+                    i += 1
+                    if self._deliver(self.pipe_id, bytes(self.data_view[:self.data_length]), packets): return i
+                else:
+                    # Resume looking for PACKET_BEGIN from this byte
+                    self._discard(self.data_length + 3)
+        return n
+
+    # Parse version 2 frames from chunk[i:]. Each delimiter ends a frame, so resynchronising is just waiting for the
+    # next one, however the frame before it was corrupted.
+    # @return [int] As _feed_v1().
+    def _feed_v2(self, chunk, i, packets):
+        n = len(chunk)
+        while i < n:
+            end = chunk.find(Piper.FRAME_DELIMITER, i)
+            if end < 0:
+                self._add_to_frame(chunk[i:])
+                break
+            self._add_to_frame(chunk[i:end])
+            i = end + 1
+            frame, self.frame = self.frame, bytearray()
+            if len(frame) == 0: continue    # delimiters with nothing between them are only padding
+            packet = _unpack_frame(frame) if len(frame) <= Piper.MAX_FRAME_LENGTH else None
+            if packet is None:
+                self.bad_frames += 1
+                self.dropped_bytes += len(frame) + 1
+                _log.debug("Dropped a corrupt frame of %d bytes.", len(frame) + 1)
+            elif self._deliver(packet[0], packet[1], packets):
+                return i
+        return n
+
+    # Add bytes to the frame, keeping no more than enough to tell that it is too long
+    def _add_to_frame(self, data):
+        room = Piper.MAX_FRAME_LENGTH + 1 - len(self.frame)
+        if len(data) > room:
+            self.dropped_bytes += len(data) - max(room, 0)
+            data = data[:max(room, 0)]
+        self.frame += data
+
+    # Add a packet, and switch version if it is the upgrade packet
+    # @return [bool] Whether the version changed.
+    def _deliver(self, pipe_id, data, packets):
+        packets.append((pipe_id, data))
+        upgrade = self.upgrade
+        if upgrade is not None and upgrade[0] == pipe_id and upgrade[1] == data:
+            self.upgrade = None
+            self.set_version(upgrade[2])
+            return True
+        return False
+
+    def _discard(self, count):
+        self.discarded_bytes += count
+        self.dropped_bytes += count
+        _log.debug("Discarded %d bytes, %d since the last good packet.", count, self.discarded_bytes)
+        if self.discarded_bytes >= self.max_discarded_bytes:
+            raise Exception("Discarded {0} bytes. File probably isn't a Piper transmitter.".format(self.discarded_bytes))
+
+## Build a complete packet.
+# @param version [int] Framing version.
+# @throws Exception If the length of the data is greater than MAX_DATA_LENGTH or pipe_id is not between 0 and MAX_PIPE_ID.
+def pack_packet(pipe_id, data, version=1):
+    if data.__class__ == str:
+        data = bytes(data, "utf-8")
+
+    if len(data) > Piper.MAX_DATA_LENGTH:
+        raise Exception("Data length ({0}) is greater than maximum of {1} bytes.".format(len(data), Piper.MAX_DATA_LENGTH))
+    if pipe_id < 0 or pipe_id > Piper.MAX_PIPE_ID:
+        raise Exception("Pipe ID ({0}) is not in valid range (between 0 and {1}.".format(pipe_id, Piper.MAX_PIPE_ID))
+    if version == 1:
+        return uint8(Piper.PACKET_BEGIN) + uint8(pipe_id) + uint8(len(data)) + bytes(data) + uint8(Piper.PACKET_END)
+    body = uint8(pipe_id) + bytes(data)
+    return cobs_encode(body + pack("<H", crc_hqx(body, 0xFFFF))) + uint8(Piper.FRAME_DELIMITER)
+
+## COBS encode data, so it has no zero bytes. Each zero is replaced by a code byte at the start of the run of bytes
+# before it, holding the run's length + 1. Runs of 254 bytes with no zero after them have the code 0xFF.
+def cobs_encode(data):
+    out = bytearray()
+    for run in bytes(data).split(b"\0"):
+        while len(run) >= 0xFE:
+            out.append(0xFF)
+            out += run[:0xFE]
+            run = run[0xFE:]
+        out.append(len(run) + 1)
+        out += run
+    return bytes(out)
+
+## Decode COBS encoded data.
+# @return [bytearray] The data, or None if it isn't valid COBS.
+def cobs_decode(data):
+    # Each code but the first becomes the zero it stands for, except after a 0xFF code
+    out = bytearray(data)
+    n = len(out)
+    no_zero = []
+    i = 0
+    while i < n:
+        code = out[i]
+        if code == 0: return None
+        out[i] = 0
+        i += code
+        if code == 0xFF and i < n: no_zero.append(i)
+    if i != n: return None
+    for i in reversed(no_zero): del out[i]
+    del out[0]
+    return out
+
+# The (pipe_id, data) of a version 2 frame, without its delimiter, or None if it is corrupt
+def _unpack_frame(frame):
+    body = cobs_decode(frame)
+    if body is None or len(body) < 3: return None
+    if crc_hqx(body[:-2], 0xFFFF) != body[-2] | (body[-1] << 8): return None
+    return body[0], bytes(body[1:-2])
 
 ## Pack an integer number into a uint8 (1 byte string).
 def uint8(num):
@@ -162,3 +523,11 @@ def uint8(num):
 ## Unpack a uint8 (1 byte string) into an int.
 def uint8R(num):
     return unpack("<B", num)[0]
+
+
+# AsyncPiper is in aiopiper.py so that importing piper doesn't import asyncio
+def __getattr__(name):
+    if name == "AsyncPiper":
+        from aiopiper import AsyncPiper
+        return AsyncPiper
+    raise AttributeError("module 'piper' has no attribute '{0}'".format(name))